@@ -9,10 +9,31 @@
 import argparse  # Import argparse module for parsing command-line arguments
 import csv  # Import csv module for reading CSV files
 import re  # Import re module for regular expressions
+import socket  # Import socket module for the default name of the vantage point
 import os  # Import os module for operating system related functionalities
+import time  # Import time module for measuring the duration of the run
 from datetime import datetime  # Import datetime class from datetime module
-from module_get import start_analyze  # Import start_analyze module for starting the analysis
-from utils import save_to_JSON, send_file, load_config  # Import necessary functions from utils module
+from module_get import start_analyze, worker_pool  # Import start_analyze module for starting the analysis
+from module_get.pacing import PacingScheduler  # Import pacing scheduler for limiting the request rate
+from module_get.http_transport import HttpTransport, default_pool_size, default_max_body_size  # Import shared
+# HTTP transport
+from module_get.dns_cache import DnsCache, dns_query_folder, default_prefetch_concurrency  # Import shared DNS cache
+# for resolving the domains
+from module_get.icmp_engine import IcmpEngine, default_echo_count  # Import shared ICMP engine for the ping probes
+from module_get.path_cache import PathCache, path_cache_folder  # Import persistent cache of the traced paths
+from module_get.probe_memo import ProbeMemo, default_freshness  # Import probe memo for sharing the IP level
+# probe results
+from module_get.search_cache import SearchCache, search_cache_folder, default_search_ttl  # Import search cache
+# for sharing the search results of the keywords
+from module_get.search_backends import create_search_backend, set_search_backend, default_search_url, \
+    default_search_qps, default_search_concurrency  # Import search backends for the search probe
+from module_get.retry_queue import RetryQueue  # Import retry queue for deferring rate limited URLs
+from module_get.anomaly import anomaly_reasons, load_control_results, median_content_length  # Import anomaly
+# detection for the two-phase run
+from utils import save_to_JSON, send_file, journal, reformat_url  # Import necessary functions from utils
+# module
+from utils.content_store import ContentStore, content_store_folder  # Import content store for saving HTML content
+from utils.result_log import SegmentedResultLog, to_record  # Import result log for the streaming output format
 from module_process import process_data  # Import process function from module_process module
 
 
@@ -34,11 +55,120 @@ def parse_arguments():
                         help='Specify the preferred IP version to use. Choose "ipv4" or "ipv6".')
     parser.add_argument('-s', '--start', type=int,
                         help='Specify the index from which to start analyze. The value represents the number of cycles'
-                             '(each cycle corresponds to a group of 10 URLs) to be skipped before testing begins.')
+                             '(each cycle corresponds to a group of 10 URLs) to be skipped before testing begins. '
+                             'An interrupted run is resumed automatically, so this option is usually not needed.')
+    parser.add_argument('-r', '--run', type=str,
+                        help='Specify the name of the run. Runs with different names of the same input file keep '
+                             'separate journals of finished URLs.')
     parser.add_argument('-n', '--not_sending', action='store_true',  help='Specify if the results should not be sent '
                                                                           'to the server.')
-
-    return parser.parse_args()
+    parser.add_argument('--upload-wait', type=float, default=60,
+                        help='Specify the maximum number of seconds to wait at the end of the run for sending '
+                             'the queued result files. Files which were not sent are sent by the next run. '
+                             'Defaults to 60.')
+    parser.add_argument('-c', '--concurrency', type=int,
+                        help='Specify the number of URLs tested at the same time. Without this option the URLs are '
+                             'tested one after another.')
+    parser.add_argument('-o', '--output-format', type=str, choices=['json', 'log'], default='json',
+                        help='Specify the format of the results. "json" saves one JSON file per group of 10 URLs, '
+                             '"log" appends one compact record per URL to segments of a result log. '
+                             'Defaults to "json".')
+    parser.add_argument('--segment-size', type=int, default=64,
+                        help='Specify the size of one result log segment in MB. Defaults to 64.')
+    parser.add_argument('--compress', action='store_true',
+                        help='Specify if the records of the result log should be compressed.')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='Specify the number of worker processes. The groups of 10 URLs are split between the '
+                             'workers. Without this option all URLs are tested in this process.')
+    parser.add_argument('--qps', type=float, default=1.0,
+                        help='Specify the number of URL tests started per second in total, 0 disables the limit. '
+                             'Defaults to 1.')
+    parser.add_argument('--host-qps', type=float, default=0.2,
+                        help='Specify the number of URL tests started per second for one destination host, '
+                             '0 disables the limit. Defaults to 0.2.')
+    parser.add_argument('--ip-qps', type=float, default=0.5,
+                        help='Specify the number of URL tests started per second for one destination IP address, '
+                             '0 disables the limit. Defaults to 0.5.')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Specify the maximum random number of seconds added to every wait between tests. '
+                             'Defaults to 0.')
+    parser.add_argument('--url-budget', type=float, default=start_analyze.default_url_budget,
+                        help='Specify the maximum number of seconds of the test of one URL. Probes still running '
+                             'when the time is up give up with a timeout. Defaults to 300.')
+    parser.add_argument('--http-pool-size', type=int, default=default_pool_size,
+                        help='Specify the maximum number of HTTP connections kept alive to one host and shared by '
+                             'the HTTP probes. Defaults to 10.')
+    parser.add_argument('--max-body-size', type=int, default=default_max_body_size // 1024,
+                        help='Specify the maximum size of the stored body of a response in KB. Longer bodies are '
+                             'truncated, their length and hash are still computed from the whole body. '
+                             'Defaults to 2048.')
+    parser.add_argument('--prefetch-dns', type=int, nargs='?', const=0, default=None, metavar='GROUPS',
+                        help='Resolve the domains of the URLs with asynchronous DNS queries before they are tested. '
+                             'Without a value all URLs of the input file are resolved up front, otherwise the given '
+                             'number of groups of 10 URLs ahead of the tested group. With workers or concurrency '
+                             'all URLs are always resolved up front.')
+    parser.add_argument('--prefetch-concurrency', type=int, default=default_prefetch_concurrency,
+                        help='Specify the maximum number of DNS queries sent at once when resolving the domains '
+                             'in advance. Defaults to 100.')
+    parser.add_argument('--ping-count', type=int, default=default_echo_count,
+                        help='Specify the number of ICMP echo requests sent to every IP address. The packet loss '
+                             'and the round trip times of the replies are recorded. Defaults to 3.')
+    parser.add_argument('--probe-freshness', type=float, default=default_freshness,
+                        help='Specify the number of seconds for which the TCP, ping, trace and certificate results '
+                             'of an IP address are shared with other URLs resolving to the same IP address. '
+                             '0 disables the sharing. Defaults to 300.')
+    parser.add_argument('--vantage', type=str, default=socket.gethostname(),
+                        help='Specify the name of the vantage point of the run. Traced paths are cached across runs '
+                             'of the same vantage point and only their tails are traced again. Defaults to the host '
+                             'name.')
+    parser.add_argument('--search-ttl', type=float, default=default_search_ttl,
+                        help='Specify the number of seconds for which the search results of a keyword are cached '
+                             'across runs of the same vantage point. Results are searched again every day at the '
+                             'latest. 0 disables the cache. Defaults to 86400.')
+    parser.add_argument('--search-backend', choices=['google', 'http'], default='google',
+                        help='Specify the search engine backend of the search probe. "google" uses the googlesearch '
+                             'package, "http" requests the result pages of --search-url directly, several at once. '
+                             'Defaults to google.')
+    parser.add_argument('--search-url', type=str, default=default_search_url,
+                        help='Specify the search page of the http search backend, the query is sent in the q '
+                             'parameter (e.g. the local stand-in server http://127.0.0.1:8089/search). Defaults to '
+                             'the Google search page.')
+    parser.add_argument('--search-qps', type=float, default=default_search_qps,
+                        help='Specify the number of searches sent per second by the http search backend. '
+                             '0 disables the limit. Defaults to 0.5.')
+    parser.add_argument('--search-concurrency', type=int, default=default_search_concurrency,
+                        help='Specify the maximum number of searches sent at the same time by the http search '
+                             'backend. Defaults to 4.')
+    parser.add_argument('--profile', choices=list(start_analyze.PROBE_PROFILES), default=start_analyze.default_profile,
+                        help='Specify the set of probes performed for every URL: "fast" (DNS, TCP and HTTP) for '
+                             'a quick connectivity recheck, "network" (also ping, trace and certificate) or "full" '
+                             '(all probes). Probes which are not run are recorded as "Not run". Defaults to full.')
+    parser.add_argument('--probes', type=str,
+                        help='Specify a comma separated list of the probes performed for every URL, it overrides '
+                             f'--profile. Known probes: {", ".join(start_analyze.PROBE_REGISTRY)}.')
+    parser.add_argument('--two-phase', action='store_true',
+                        help='Test all URLs with the fast profile first and only the URLs with anomalous results '
+                             '(DNS or TCP failure, HTTP status other than 200, redirect, content length outlier or '
+                             'a difference from --control) with the selected probes which are not in the fast '
+                             'profile. The DNS, TCP and HTTP results of the first phase are kept.')
+    parser.add_argument('--control', type=str,
+                        help='Specify a folder with the results of a control run (e.g. from the other vantage '
+                             'point). With --two-phase, URLs whose first phase results differ from the control '
+                             'results are anomalous.')
+
+    args = parser.parse_args()
+
+    # Names of the tests performed for every URL
+    if args.probes is not None:
+        args.tests = [test.strip() for test in args.probes.split(',') if test.strip()]
+    else:
+        args.tests = start_analyze.PROBE_PROFILES[args.profile]
+    try:
+        start_analyze.select_website_probes(args.tests)
+    except ValueError as e:
+        parser.error(str(e))
+
+    return args
 
 
 def extract_and_clean_filename(file_path):
@@ -61,6 +191,316 @@ def extract_and_clean_filename(file_path):
     return clean_name
 
 
+def save_batch_results(results, batch_index, output_filepath, args, uploader=None):
+    """
+    Saves the results of one group of URLs to a JSON file and sends it to the server.
+
+    Args:
+        results (list): List of test results of the group.
+        batch_index (int): Index of the first URL of the group in the input file.
+        output_filepath (str): Folder where the JSON file will be saved.
+        args (argparse.Namespace): Parsed arguments.
+        uploader (SftpUploader, optional): Uploader of the result files, or None if sending is disabled.
+
+    Returns:
+        str: Name of the output file.
+    """
+    date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+
+    # Print the name of the first input file again
+    print(args.files[0])
+    name = extract_and_clean_filename(args.files[0])
+
+    # Construct output filename
+    output_filename = "results_" + name + "_" + str(batch_index) + "_" + date_time + ".json"
+
+    # Print message indicating saving to JSON file
+    print("Saving to JSON file: " + output_filename)
+
+    # Save test results to JSON file
+    save_to_JSON.save_test_results(results, output_filepath + output_filename)
+
+    send_result_file(output_filepath + output_filename, uploader)
+
+    return output_filename
+
+
+def send_result_file(local_path, uploader):
+    """
+    Queues a file with results for sending to the server, unless sending is disabled. The file is sent
+    in the background, the tests do not wait for it.
+
+    Args:
+        local_path (str): Local path of the file.
+        uploader (SftpUploader): Uploader of the result files, or None if sending is disabled.
+    """
+    # If sending is not disabled, send the file to the server
+    if uploader is not None:
+        uploader.enqueue(local_path)
+
+
+def assemble_batch_results(batch, run_journal, tested_results=None):
+    """
+    Puts together the results of a group of URLs in the order of the input file. The results are taken from
+    the tests just finished or from the journal of the run.
+
+    Args:
+        batch (list): List of URLs of the group.
+        run_journal (RunJournal): Journal of the run.
+        tested_results (list, optional): Results of the tests just finished, if they are not in the journal
+            of this process (e.g. results from worker processes).
+
+    Returns:
+        list: A list of dictionaries containing test results.
+    """
+    tested_url_results = {}
+    for result in tested_results or []:
+        tested_url_results.setdefault(result['URL'], []).append(result)
+
+    results = []
+    for website in dict.fromkeys(str(website) for website in batch):
+        url_results = tested_url_results.get(website) or run_journal.get_url_results(website)
+        results.extend(url_results or [])
+    return results
+
+
+def get_data(input_file, args, pacer, uploader=None):
+    """
+    Tests all URLs of the input file and saves the results of every group of 10 URLs.
+
+    The results of every finished URL are recorded in the journal of the run. If the previous run of the input
+    file was interrupted, the saved groups and finished URLs are skipped.
+
+    Args:
+        input_file (str): Path of the CSV file with the URLs.
+        args (argparse.Namespace): Parsed arguments.
+        pacer (PacingScheduler): Scheduler limiting the request rate.
+        uploader (SftpUploader, optional): Uploader of the result files, or None if sending is disabled.
+    """
+    # Print the name of the input file being processed
+    print("Processing " + input_file + "...")
+
+    # Read website URLs from the input file
+    with open(input_file, 'r') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)
+        website_list = [row[0] for row in reader]
+
+    output_filepath = 'data/output_data/'
+
+    start_index = 0
+    if args.start:
+        start_index = args.start * 10
+
+    if not args.address:
+        args.address = "ipv4"
+
+    # Open the journal of the run, the journal of an interrupted run is continued
+    journal_name = extract_and_clean_filename(input_file) + ("_" + args.run if args.run else "")
+    journal_path = os.path.join(journal.journal_folder, journal_name)
+    run_journal = journal.RunJournal(journal_path)
+    content_store = ContentStore(content_store_folder, run_journal.run_id)
+
+    # One HTTP transport, DNS cache, ICMP engine and probe memo for the run, every query sent by the cache is logged
+    dns_cache = DnsCache(args.address.lower(), os.path.join(dns_query_folder, run_journal.run_id))
+    transport = HttpTransport(args.http_pool_size, max_body_size=args.max_body_size * 1024, dns_cache=dns_cache)
+    path_cache = PathCache(path_cache_folder, args.vantage)
+    path_cache.compact()
+    icmp_engine = IcmpEngine(args.ping_count, path_cache=path_cache)
+    probe_memo = ProbeMemo(args.probe_freshness)
+    search_cache = SearchCache(search_cache_folder, args.vantage, args.search_ttl)
+    search_cache.compact()
+    search_backend = create_search_backend(args.search_backend, args.search_url, args.search_qps,
+                                           args.search_concurrency)
+    set_search_backend(search_backend)
+
+    if run_journal.saved_batches or run_journal.url_results:
+        print(f"Resuming interrupted run: {len(run_journal.saved_batches)} groups saved, "
+              f"{len(run_journal.url_results)} URLs finished.")
+
+    # Split the list of URLs into groups of 10, skip the saved groups and the finished URLs
+    batches = {i: website_list[i:i + 10] for i in range(start_index, len(website_list), 10)
+               if not run_journal.is_batch_saved(i)}
+    remaining = {i: [website for website in batch if run_journal.get_url_results(website) is None]
+                 for i, batch in batches.items()}
+
+    result_log = None
+    if args.output_format == 'log':
+        result_log = SegmentedResultLog(output_filepath, extract_and_clean_filename(input_file),
+                                        args.segment_size * 1024 * 1024, args.compress,
+                                        lambda segment_path: send_result_file(segment_path, uploader))
+
+    def finish_batch(batch_index, tested_results=None):
+        results = assemble_batch_results(batches[batch_index], run_journal, tested_results)
+
+        if result_log is not None:
+            # Append one record per URL, the placeholder and the result of a URL are merged into one record
+            url_results = {}
+            output_filename = None
+            for result in results:
+                url_results.setdefault(result['URL'], []).append(result)
+            for results_of_url in url_results.values():
+                output_filename = result_log.append(to_record(results_of_url))
+        else:
+            output_filename = save_batch_results(results, batch_index, output_filepath, args, uploader)
+
+        run_journal.record_batch(batch_index, output_filename)
+
+    # Save the groups which were finished, but not saved, before the previous run was interrupted
+    for i in batches:
+        if not remaining[i]:
+            finish_batch(i)
+
+    def prefetch_batches(batch_indexes):
+        domains = [reformat_url.extract_domain(website) for i in batch_indexes for website in remaining[i]]
+        dns_cache.prefetch(domains, args.prefetch_concurrency)
+
+    def run_first_phase():
+        # Test the remaining URLs with the fast profile, the results are kept in a journal of their own
+        first_phase_path = os.path.join(journal_path, 'first_phase')
+        first_phase_journal = journal.RunJournal(first_phase_path)
+        fast_tests = start_analyze.PROBE_PROFILES['fast']
+        urls_to_test = [website for batch in remaining.values() for website in batch
+                        if first_phase_journal.get_url_results(website) is None]
+
+        if urls_to_test and args.workers:
+            batches_to_test = [(i, urls_to_test[i:i + 10]) for i in range(0, len(urls_to_test), 10)]
+            pacing = (args.qps, args.host_qps, args.ip_qps, args.jitter)
+            for _, _, worker_pid, summary in worker_pool.run_batches_in_workers(
+                    batches_to_test, args.workers, content_store, args.address.lower(), pacing,
+                    args.concurrency, first_phase_path, args.url_budget, transport, icmp_engine, probe_memo,
+                    search_cache, search_backend, fast_tests):
+                first_phase_summaries[worker_pid] = summary
+            # The results were recorded by the worker processes
+            first_phase_journal = journal.RunJournal(first_phase_path)
+        elif urls_to_test:
+            tester = start_analyze.WebConnectivityTester(urls_to_test, content_store, args.address.lower(), pacer,
+                                                         retry_queue, first_phase_journal, args.url_budget,
+                                                         transport, icmp_engine, probe_memo, search_cache,
+                                                         fast_tests)
+            if args.concurrency:
+                tester.run_tests_concurrently(args.concurrency)
+            else:
+                tester.run_tests()
+
+        # URLs with normal results are finished with the results of the first phase
+        records = {website: to_record(first_phase_journal.get_url_results(website) or [{'URL': website}])
+                   for batch in remaining.values() for website in batch}
+        median_length = median_content_length(records.values())
+        control_results = load_control_results(args.control) if args.control else None
+        anomalous_count = 0
+        for website, record in records.items():
+            control_record = control_results.get(website) if control_results is not None else None
+            if anomaly_reasons(record, median_length, control_record):
+                anomalous_count += 1
+            else:
+                run_journal.record_url(website, first_phase_journal.get_url_results(website))
+
+        print(f"First phase: {anomalous_count} of {len(records)} URLs with anomalous results are tested "
+              f"with the selected probes which the first phase did not run.")
+
+        # Save the groups which have no anomalous URL
+        for i in remaining:
+            if remaining[i]:
+                remaining[i] = [website for website in remaining[i] if run_journal.get_url_results(website) is None]
+                if not remaining[i]:
+                    finish_batch(i)
+
+        return first_phase_journal
+
+    url_count = sum(len(batch) for batch in remaining.values())
+    run_start_time = time.time()
+    retry_queue = RetryQueue()
+    first_phase_summaries = {}  # Statistics of the worker processes of the first phase keyed by process ID
+
+    # Resolve the domains of all remaining URLs up front, the worker processes get a copy of the answers
+    if args.prefetch_dns is not None and (args.prefetch_dns <= 0 or args.workers or args.concurrency
+                                          or args.two_phase):
+        prefetch_batches(list(remaining))
+
+    # In a two-phase run the anomalous URLs are only tested with the probes which the first phase did not run, the
+    # results of the first phase are merged into their records
+    tests = args.tests
+    first_phase_journal = None
+    if args.two_phase:
+        first_phase_journal = run_first_phase()
+        tests = [test for test in args.tests if test not in start_analyze.PROBE_PROFILES['fast']]
+    first_phase_path = first_phase_journal.journal_path if first_phase_journal is not None else None
+
+    if args.workers:
+        # Test the groups of 10 URLs in worker processes and save every group as soon as it is finished
+        batches_to_test = [(i, batch) for i, batch in remaining.items() if batch]
+        pacing = (args.qps, args.host_qps, args.ip_qps, args.jitter)
+        worker_summaries = {}
+        for worker_pid, summary in first_phase_summaries.items():
+            worker_summaries[('first_phase', worker_pid)] = summary
+
+        for i, results, worker_pid, summary in worker_pool.run_batches_in_workers(
+                batches_to_test, args.workers, content_store, args.address.lower(), pacing,
+                args.concurrency, journal_path, args.url_budget, transport, icmp_engine, probe_memo,
+                search_cache, search_backend, tests, first_phase_path):
+            finish_batch(i, results)
+            worker_summaries[worker_pid] = summary
+
+        for summary in worker_summaries.values():
+            retry_queue.add_summary(summary)
+            dns_cache.add_summary(summary)
+            probe_memo.add_summary(summary)
+            search_cache.add_summary(summary)
+
+        start_analyze.print_run_summary(url_count, time.time() - run_start_time)
+        retry_queue.print_summary()
+
+    else:
+        # Test all remaining URLs with one tester and save every group of 10 URLs as soon as it is complete. URLs
+        # deferred because of 429 errors wait in the retry queue while the following groups are tested.
+        batches_to_test = [i for i, batch in remaining.items() if batch]
+        urls_to_test = [(i, website) for i in batches_to_test for website in remaining[i]]
+        urls_left = {i: len(remaining[i]) for i in batches_to_test}
+        finished_batches = []
+
+        def prefetch_following_batches():
+            # Resolve the domains of the following groups, before the answers of the earlier groups expire
+            position = len(finished_batches)
+            if not args.concurrency and args.prefetch_dns and args.prefetch_dns > 0 and \
+                    position % args.prefetch_dns == 0:
+                prefetch_batches(batches_to_test[position:position + args.prefetch_dns])
+
+        def collect_results(position, url_results):
+            batch_index = urls_to_test[position][0]
+            urls_left[batch_index] -= 1
+            if urls_left[batch_index] == 0:
+                finish_batch(batch_index)
+                finished_batches.append(batch_index)
+                prefetch_following_batches()
+
+        tester = start_analyze.WebConnectivityTester([website for _, website in urls_to_test],
+                                                     content_store, args.address.lower(), pacer,
+                                                     retry_queue, run_journal, args.url_budget, transport,
+                                                     icmp_engine, probe_memo, search_cache, tests,
+                                                     first_phase_journal)
+        if args.concurrency:
+            tester.run_tests_concurrently(args.concurrency, collect_results)
+        else:
+            prefetch_following_batches()
+            tester.run_tests(collect_results)
+
+            start_analyze.print_run_summary(url_count, time.time() - run_start_time)
+            retry_queue.print_summary()
+
+    dns_cache.print_summary()
+    probe_memo.print_summary()
+    search_cache.print_summary()
+    transport.close()
+    icmp_engine.close()
+
+    if result_log is not None:
+        result_log.close()
+
+    # All groups are saved, the next run of the input file starts from the beginning
+    run_journal.complete()
+
+
 def main():
     """
     Main function to execute the script.
@@ -81,53 +521,21 @@ def main():
     if args.get:
         # Check if input files are provided
         if args.files:
-            for input_file in args.files:
-                # Print the name of the input file being processed
-                print("Processing " + input_file + "...")
-
-                # Read website URLs from the input file
-                with open(input_file, 'r') as csvfile:
-                    reader = csv.reader(csvfile)
-                    next(reader)
-                    website_list = [row[0] for row in reader]
-
-                output_filepath = 'data/output_data/'
-                output_content_folder = 'data/output_data/content_folder'
-
-                start_index = 0
-                if args.start:
-                    start_index = args.start * 10
-
-                # Split the list of URLs into groups of 10
-                for index, i in enumerate(range(start_index, len(website_list), 10), start=1):
-                    batch = website_list[i:i + 10]
+            # One scheduler for the whole run, so the limits hold across groups of URLs and input files
+            pacer = PacingScheduler(args.qps, args.host_qps, args.ip_qps, args.jitter)
 
-                    if not args.address:
-                        args.address = "ipv4"
+            # One SSH connection for all result files, the files left by an interrupted run are sent first
+            uploader = None
+            if not args.not_sending:
+                uploader = send_file.SftpUploader.from_config()
+                uploader.start()
 
-                    # Initialize WebConnectivityTester and run tests
-                    tester = start_analyze.WebConnectivityTester(batch, output_content_folder, args.address.lower())
-                    results = tester.run_tests()
-
-                    date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
-
-                    # Print the name of the first input file again
-                    print(args.files[0])
-                    name = extract_and_clean_filename(args.files[0])
-
-                    # Construct output filename
-                    output_filename = "results_" + name + "_" + str(i) + "_" + date_time + ".json"
-
-                    # Print message indicating saving to JSON file
-                    print("Saving to JSON file: " + output_filename)
-
-                    # Save test results to JSON file
-                    save_to_JSON.save_test_results(results, output_filepath + output_filename)
+            for input_file in args.files:
+                get_data(input_file, args, pacer, uploader)
 
-                    # If sending is not disabled, send the file to the server
-                    if not args.not_sending:
-                        remote_file_path = load_config.load_credentials("server_path_for_files") + output_filename
-                        send_file.send_file_via_ssh(output_filepath + output_filename, remote_file_path)
+            if uploader is not None:
+                uploader.close(args.upload_wait)
+                uploader.print_summary()
 
         else:
             # Print a message indicating no input files specified
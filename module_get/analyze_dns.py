@@ -7,36 +7,39 @@
 
 # Import necessary libraries
 import dns.resolver  # Import the DNS resolver module for DNS resolution
+from module_get.dns_cache import get_dns_cache  # Import get_dns_cache function for the shared DNS cache
 from utils import reformat_url  # Import the reformat_url function from the utils module
-from timeout_decorator import timeout  # Import the timeout decorator for setting execution timeout
+from utils.deadline import probe_deadline  # Import probe_deadline function for limiting the time of the probes
 
-function_timeout = 60  # Timeout value for function execution in seconds
+function_timeout = 60  # Maximum time of one probe in seconds
 
 
-@timeout(function_timeout)
-def detect_dns_repeated_query(address):
+def detect_dns_repeated_query(address, dns_cache=None, deadline=None):
     """
     Detects repeated DNS queries to identify potential DNS manipulation.
 
     Args:
         address (str): The URL address to be checked.
+        dns_cache (DnsCache, optional): Shared DNS cache of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
         str: The result of the detection - "Manipulate" if DNS attack is detected, otherwise "No manipulation".
     """
     domain = reformat_url.extract_domain(address)
+    deadline = probe_deadline(deadline, function_timeout)
 
     try:
-        resolver = dns.resolver.Resolver()  # Create a resolver object for DNS resolution
+        dns_cache = get_dns_cache(dns_cache)
 
-        # First query for a non-existent hostname
-        resolver.resolve(domain, 'A')
+        # First query for a non-existent hostname, both queries of this test always go to the network
+        dns_cache.resolve(domain, 'A', deadline.timeout(), use_cache=False)
         return "No manipulation"  # If no error is raised, no attack is detected
 
     except dns.resolver.NXDOMAIN:
         try:
             # Repeated query for the same non-existent hostname
-            resolver.resolve(domain, 'A')
+            dns_cache.resolve(domain, 'A', deadline.timeout(), use_cache=False)
             return "Manipulate"  # If NXDOMAIN is returned, an attack is detected
         except dns.resolver.NXDOMAIN:
             return "No manipulation"  # If NXDOMAIN is returned again, no attack is detected
@@ -44,7 +47,7 @@ def detect_dns_repeated_query(address):
             print("Error during the second query:", e)
             return "No manipulation"  # In case of any other exception, assume no attack
 
-    except TimeoutError:
+    except (TimeoutError, dns.exception.Timeout):
         print("Resolver identification test exceeded timeout.")
         return "N/A"
 
@@ -53,24 +56,24 @@ def detect_dns_repeated_query(address):
         return "No manipulation"
 
 
-@timeout(function_timeout)
-def detect_dns_hijacking(address):
+def detect_dns_hijacking(address, dns_cache=None, deadline=None):
     """
     Detects DNS hijacking by querying an existing hostname.
 
     Args:
         address (str): The URL address to be checked.
+        dns_cache (DnsCache, optional): Shared DNS cache of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
         str: The result of the detection - "Manipulate" if DNS hijacking is detected, otherwise "No manipulation".
     """
     domain = reformat_url.extract_domain(address)
+    deadline = probe_deadline(deadline, function_timeout)
 
     try:
-        resolver = dns.resolver.Resolver()  # Create a resolver object for DNS resolution
-
         # Query an existing hostname, censored DNS server should return an unexpected or no response
-        answers = resolver.resolve(domain, 'A')
+        answers = get_dns_cache(dns_cache).resolve(domain, 'A', deadline.timeout())
         if answers:
             return "No manipulation"  # If a valid response is received, no attack is detected
         else:
@@ -78,7 +81,7 @@ def detect_dns_hijacking(address):
     except dns.resolver.NoAnswer:
         return True  # If no response is received, a possible attack is detected
 
-    except TimeoutError:
+    except (TimeoutError, dns.exception.Timeout):
         print("Resolver identification test exceeded timeout.")
         return "N/A"
 
@@ -5,47 +5,53 @@
 # Python Version: 3.12.3
 
 
-from googlesearch import search  # Import the googlesearch package for searching on Google
+from module_get.search_backends import get_search_backend  # Import get_search_backend for the search engine
 from utils import reformat_url  # Import reformat_url function from the utils module
-from timeout_decorator import timeout  # Import the timeout decorator for setting execution timeout
+from utils.deadline import probe_deadline  # Import probe_deadline function for limiting the time of the probes
 
-function_timeout = 60  # Timeout value for function execution in seconds
+function_timeout = 60  # Maximum time of one probe in seconds
 
 
-def get_search_results(query):
+def get_search_results(query, deadline):
     """
-    Get search results from Google for a given query.
+    Get search results for a given query from the search backend of the run (Google by default).
 
     Args:
         query (str): The search query.
+        deadline (Deadline): Deadline of the search.
 
     Returns:
         list: List of search results.
-    """
-    results = []
-
-    for result in search(query, num=10, stop=10, pause=2):
-        results.append(result)
 
-    return results
+    Raises:
+        TimeoutError: If the deadline passes before the search is finished.
+    """
+    return get_search_backend().search(query, deadline)
 
 
-@timeout(function_timeout)
-def is_domain_in_results(address):
+def is_domain_in_results(address, search_cache=None, deadline=None):
     """
-    Check if a domain is present in the search results on Google.
+    Check if a domain is present in the search results on Google. The results of the keyword are taken from
+    the search cache if it has them.
 
     Args:
         address (str): The URL address to be checked.
+        search_cache (SearchCache, optional): Shared search cache of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
         str: The result of the check - "Match" if the domain is found in the results, otherwise "No match".
     """
+    deadline = probe_deadline(deadline, function_timeout)
     try:
         domain = reformat_url.extract_domain(address)  # Extract the domain from the given URL
         keyword = reformat_url.get_keyword(domain)  # Get the keyword from the domain
 
-        results = get_search_results(keyword)  # Get search results for the keyword
+        # Get search results for the keyword
+        if search_cache is not None:
+            results = search_cache.get(keyword, lambda: get_search_results(keyword, deadline), deadline.remaining())
+        else:
+            results = get_search_results(keyword, deadline)
 
         if any(address in result for result in results):
             return "Match"
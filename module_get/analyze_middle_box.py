@@ -6,88 +6,152 @@
 
 
 # Import necessary libraries
-import requests  # Import requests module for making HTTP requests
+from urllib.parse import urlparse, quote  # Import URL functions for the request target of the URL
+from module_get.middle_box_engine import PipelinedRequest, pipeline, http_port, https_port  # Import raw TCP engine
+# for pipelining the crafted requests
 from utils import reformat_url  # Import reformat_url function from the utils module
-from timeout_decorator import timeout  # Import the timeout decorator for setting execution timeout
+from utils.deadline import probe_deadline  # Import probe_deadline function for limiting the time of the probes
 
-function_timeout = 60  # Timeout value for function execution in seconds
+function_timeout = 60  # Maximum time of one probe in seconds
 
+invalid_methods = ['FOO', 'BAR', 'BAZ', 'QUX']  # List of invalid HTTP methods
+target_safe_characters = "/?=&%:@!$'()*+,;~"  # Characters left unquoted in the request target
 
-@timeout(function_timeout)
-def http_header_manipulation(url):
+# Header with a mixed case name and value, a middle box normalizing or rewriting the headers changes them
+crafted_header = ("UsEr-AgEnT", "MoZiLLa/5.0 (WinDoWW NT 10.0; Win64; x64) AppleWEbKIT/537.36 (KHTML, like GeCko) "
+                                "ChROmE/58.0.3029.110 SaFAri/537.3")
+
+
+def parse_target(url):
     """
-    Check for HTTP header manipulation by sending a request with modified headers.
+    Splits the URL into the parts of the crafted requests.
 
     Args:
-        url (str): The URL to test.
+        url (str): The URL to test, the scheme may be missing.
 
     Returns:
-        str: "Manipulated" if HTTP header manipulation is detected, otherwise "No manipulation".
+        tuple: Scheme, host name, Host header value, port and request target (path and query) of the URL.
     """
-    detector = "Manipulated"  # Default value for the manipulation detector
+    parsed_url = urlparse(reformat_url.add_http(url))
+    scheme = parsed_url.scheme.lower()
+    port = parsed_url.port or (https_port if scheme == 'https' else http_port)
 
-    # Define custom headers for the HTTP request
-    headers = {
-        "UsEr-AgEnT": "MoZiLLa/5.0 (WinDoWW NT 10.0; Win64; x64) AppleWEbKIT/537.36 (KHTML, like GeCko) "
-                      "ChROmE/58.0.3029.110 SaFAri/537.3"
-    }
+    target = parsed_url.path or '/'
+    if parsed_url.query:
+        target += '?' + parsed_url.query
 
-    try:
-        # Send a GET request with custom headers to the specified URL
-        response = requests.get(reformat_url.add_http(url), headers=headers)
+    # The Host header is the network location without the user information, with the port if the URL has it
+    host = parsed_url.netloc.rpartition('@')[2]
+    return scheme, parsed_url.hostname, host, port, quote(target, safe=target_safe_characters)
 
-        # TODO: je to dobře?
-        # Convert original and received headers to lowercase for comparison
-        original_headers = {key.lower(): value for key, value in headers.items()}
-        received_headers = {key.lower(): value for key, value in response.request.headers.items()}
 
-        # Iterate through sent headers and compare with received ones
-        for key, value in original_headers.items():
-            if key in received_headers and received_headers[key] == value:
-                detector = "No manipulation"  # If the received header matches the sent one, no manipulation is detected
+def crafted_requests(host, target='/'):
+    """
+    Builds the requests of the middle box probes: a GET request with the crafted header followed by requests
+    with invalid methods. The last request closes the connection.
 
-        return detector
+    Args:
+        host (str): Host name sent in the Host header.
+        target (str, optional): Path and query of the requests. Defaults to '/'.
 
-    except TimeoutError:
-        print("Resolver identification test exceeded timeout.")
-        return "N/A"
+    Returns:
+        list: PipelinedRequest objects.
+    """
+    crafted_line = f"{crafted_header[0]}: {crafted_header[1]}\r\n"
+    pipelined = [PipelinedRequest('GET', f"GET {target} HTTP/1.1\r\nHost: {host}\r\n{crafted_line}"
+                                         f"AcCePt: */*\r\n\r\n")]
+    for position, method in enumerate(invalid_methods):
+        connection = "Connection: close\r\n" if position == len(invalid_methods) - 1 else ""
+        pipelined.append(PipelinedRequest(method, f"{method} {target} HTTP/1.1\r\nHost: {host}\r\n{connection}\r\n"))
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred during HTTP header manipulation test.")
-        return "N/A"
+    for request in pipelined:
+        request.data = request.data.encode('iso-8859-1')
+    return pipelined
 
 
-@timeout(function_timeout)
-def invalid_request_line(url):
+def pipelined_exchange(url, ip_address, deadline=None):
     """
-    Check for invalid request line by sending requests with invalid HTTP methods.
+    Sends the crafted requests of the middle box probes to the IP address of the URL, pipelined over one raw TCP
+    connection, and captures the exact bytes and timings of the responses. The requests go to the port of the URL
+    and ask for its path and query, over TLS for HTTPS URLs, so filtering by the path or its keywords shows too.
 
     Args:
         url (str): The URL to test.
+        ip_address (str): IP address of the host of the URL.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
-        float: The manipulation score indicating the proportion of requests resulting in 400 Bad Request status.
+        list: PipelinedResponse objects in the order of the requests, "N/A" if the exchange ran out of time,
+        or "Fail" if the connection failed.
     """
-    invalid_methods = ['FOO', 'BAR', 'BAZ', 'QUX']  # List of invalid HTTP methods
-    manipulation_score = 0  # Initialize manipulation score counter
+    deadline = probe_deadline(deadline, function_timeout)
 
     try:
-        # Iterate through invalid methods and send requests with each method
-        for method in invalid_methods:
-            response = requests.request(method, reformat_url.add_http(url))
-
-            # If the response status code is 400 Bad Request, increment manipulation score
-            if response.status_code == 400:
-                manipulation_score += 1
-
-        # Calculate manipulation score as the proportion of requests resulting in 400 status code
-        score = manipulation_score / len(invalid_methods)
-        return score
+        scheme, hostname, host, port, target = parse_target(url)
+        return pipeline(ip_address, crafted_requests(host, target), deadline, port,
+                        server_hostname=hostname if scheme == 'https' else None)
 
     except TimeoutError:
-        print("Resolver identification test exceeded timeout.")
+        print("Middle box test exceeded timeout.")
         return "N/A"
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error occurred during invalid request line test.")
+    except (OSError, ValueError):
+        # ValueError comes from an invalid port in the URL
+        print(f"Error occurred during middle box test.")
         return "Fail"
+
+
+def http_header_manipulation(responses):
+    """
+    Check for HTTP header manipulation by looking for the crafted header in the response to the GET request.
+    Only servers and error pages reflecting the request headers show what reached the server: the header received
+    unchanged means no manipulation, the header received with a different case means manipulation. Most servers
+    do not reflect the headers, the test is then inconclusive rather than reporting no manipulation.
+
+    Args:
+        responses (list): Responses of the pipelined exchange.
+
+    Returns:
+        str: "Manipulated" if HTTP header manipulation is detected, "No manipulation" if the header came back
+        unchanged, or "Inconclusive" if the response does not contain the header.
+    """
+    if not isinstance(responses, list):
+        return "N/A"
+
+    response = next((response for response in responses if response.label == 'GET'), None)
+    if response is None:
+        return "N/A"
+
+    # Only the value is looked for, servers are free to change the case of the header names
+    content = response.data.decode('iso-8859-1')
+    if crafted_header[1] in content:
+        return "No manipulation"
+    if crafted_header[1].lower() in content.lower():
+        return "Manipulated"
+
+    return "Inconclusive"
+
+
+def invalid_request_line(responses):
+    """
+    Check for invalid request line by looking at the responses to the requests with invalid HTTP methods.
+
+    Args:
+        responses (list): Responses of the pipelined exchange.
+
+    Returns:
+        float: The manipulation score indicating the proportion of requests resulting in 400 Bad Request status.
+    """
+    if not isinstance(responses, list):
+        return responses
+    if not responses:
+        # The server accepted the connection but did not answer
+        return "N/A"
+
+    # Requests left unanswered count as not resulting in 400 Bad Request
+    manipulation_score = sum(1 for response in responses if response.label in invalid_methods
+                             and response.status == 400)
+
+    # Calculate manipulation score as the proportion of requests resulting in 400 status code
+    score = manipulation_score / len(invalid_methods)
+    return score
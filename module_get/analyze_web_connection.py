@@ -6,18 +6,22 @@
 
 
 # Import necessary libraries
+import dns.exception  # Import DNS exceptions
 import requests  # Import requests module for making HTTP requests
 import ssl  # Import ssl module for SSL-related functionalities
 from scapy.all import *  # Import all from scapy.all module for packet manipulation
-from timeout_decorator import timeout  # Import timeout decorator for setting execution timeout
 
+from module_get.dns_cache import get_dns_cache  # Import get_dns_cache function for the shared DNS cache
+from module_get.http_transport import get_transport  # Import get_transport function for the shared HTTP transport
+from module_get.icmp_engine import get_icmp_engine  # Import get_icmp_engine function for the shared ICMP engine
 from utils import reformat_url, ip_address_operations  # Import reformat_url function from utils module
+from utils.deadline import probe_deadline  # Import probe_deadline function for limiting the time of the probes
 
-function_timeout = 60  # Timeout value for function execution in seconds
+function_timeout = 60  # Maximum time of one probe in seconds
+max_redirects = 30  # Maximum number of followed redirects
 
 
-@timeout(function_timeout)
-def dns_lookup(address, ip_type):
+def dns_lookup(address, ip_type, dns_cache=None, deadline=None):
     """
     Performs DNS lookup for a given website.
 
@@ -27,25 +31,22 @@ def dns_lookup(address, ip_type):
     Args:
         address (str): Website to perform DNS lookup for.
         ip_type (str): Type of the ip (IPv4 or IPv6)
+        dns_cache (DnsCache, optional): Shared DNS cache of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
         tuple: A tuple containing the status ('OK' or 'N/A') and a list of IP addresses (both IPv4 and IPv6).
     """
+    deadline = probe_deadline(deadline, function_timeout)
     try:
         domain = reformat_url.extract_domain(address)
 
-        # Retrieve IPv4 addresses
-        ip_addresses_ipv4 = socket.gethostbyname_ex(domain)[2]
+        # An IP address needs no resolution
+        if ip_address_operations.check_ip_address_type(domain) != "Unknown":
+            return 'OK', [domain]
 
-        # Attempt to retrieve IPv6 addresses
-        if ip_type == "ipv6":
-            ip_addresses_ipv6 = socket.getaddrinfo(domain, None, socket.AF_INET6)
-            ipv6_addresses = [addr[4][0] for addr in ip_addresses_ipv6]
-
-            # Combine both IPv4 and IPv6 addresses
-            all_addresses = ip_addresses_ipv4 + ipv6_addresses
-        else:
-            all_addresses = ip_addresses_ipv4
+        # Retrieve IPv4 addresses, and IPv6 addresses too if IPv6 is preferred
+        all_addresses = get_dns_cache(dns_cache).lookup(domain, ip_type, deadline.timeout())
 
         # If any addresses are available, return 'OK'
         if all_addresses:
@@ -53,32 +54,42 @@ def dns_lookup(address, ip_type):
         else:
             return 'N/A', 'N/A'
 
+    except (TimeoutError, dns.exception.Timeout):
+        print("DNS lookup test exceeded timeout.")
+        return "N/A", "N/A"
+
     except Exception as e:
         # Print an error message if there is an issue with DNS lookup
         print("DNS lookup error:" + str(e))
         return "N/A", "N/A"
 
-    except TimeoutError:
-        print("DNS lookup test exceeded timeout.")
-        return "N/A", "N/A"
 
-
-@timeout(function_timeout)
-def get_https_certificate(ip_address, address, port=443):
+def get_https_certificate(ip_address, address, transport=None, deadline=None, port=443):
     """
-    Retrieves the HTTPS certificate for a given IP address and domain.
+    Retrieves the HTTPS certificate for a given IP address and domain. The certificate captured by the HTTPS
+    connection of the HTTP probe is used if there is one, otherwise a new TLS handshake is made.
 
     Args:
         ip_address (str): The IP address to check (IPv4).
         address (str): The domain associated with the IP address.
+        transport (HttpTransport, optional): Shared HTTP transport of the run with the certificate store.
+        deadline (Deadline, optional): Deadline of the test of the URL.
         port (int, optional): The port number to connect to. Defaults to 443 for HTTPS.
 
     Returns:
-        tuple: A tuple containing the status ('OK', 'Failed', or 'N/A') and the certificate or error message.
+        tuple: A tuple containing the status ('OK', 'Failed', or 'N/A') and the fingerprint of the certificate
+        in the certificate store or error message.
     """
+    deadline = probe_deadline(deadline, function_timeout)
     try:
         # Extract IPv4 address from a mapped IPv6 address if necessary
         ip_address = ip_address_operations.extract_ipv4_from_mapped_ipv6(ip_address)
+        server_name = reformat_url.extract_domain(address)
+
+        certificate_store = get_transport(transport).certificate_store
+        fingerprint = certificate_store.lookup(ip_address, server_name)
+        if fingerprint is not None:
+            return "OK", fingerprint
 
         # Determine the IP address type
         ip_type = ip_address_operations.check_ip_address_type(ip_address)
@@ -95,31 +106,29 @@ def get_https_certificate(ip_address, address, port=443):
         with socket.socket(sock_type, socket.SOCK_STREAM) as sock:
             # If the port is 443 (default for HTTPS), attempt to retrieve the certificate
             if port == 443:
-                sock.settimeout(10)
+                sock.settimeout(deadline.timeout(10))
 
                 sock.connect((ip_address, port))
 
-                with context.wrap_socket(sock, server_hostname=reformat_url.extract_domain(address)) as ssock:
-                    # Obtain the certificate from the socket
-                    cert = ssock.getpeercert()
-                    return "OK", cert
+                with context.wrap_socket(sock, server_hostname=server_name) as ssock:
+                    # Store the certificate from the socket
+                    return "OK", certificate_store.capture(ip_address, server_name, ssock)
             else:
                 # If the port is not 443, the site does not use HTTPS and no certificate is available
                 print("The site does not use HTTPS, no certificate available.")
                 return "Failed", "N/A"
 
+    except TimeoutError:
+        print("Retrieving certificate exceeded timeout.")
+        return "N/A", "N/A"
+
     except Exception as e:
         # Print an error message if there is an issue retrieving the certificate
         print("Error retrieving certificate" + str(e))
         return "N/A", "N/A"
 
-    except TimeoutError:
-        print("Retrieving certificate exceeded timeout.")
-        return "N/A", "N/A"
 
-
-@timeout(function_timeout)
-def tcp_handshake(destination_ip, destination_port=80):
+def tcp_handshake(destination_ip, destination_port=80, deadline=None):
     """
     Performs a TCP handshake with the specified IP address and port.
 
@@ -127,11 +136,13 @@ def tcp_handshake(destination_ip, destination_port=80):
         destination_ip (str): The IP address to connect to.
         destination_port (int, optional): The port number to connect to.
         Defaults to 80.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
         tuple: A tuple containing the status ('Established', 'N/A', or 'Failed')
         and the remote IP address.
     """
+    deadline = probe_deadline(deadline, function_timeout)
     try:
         if ip_address_operations.check_ip_address_type(destination_ip) == "ipv6":
             socket_type = socket.AF_INET6
@@ -142,7 +153,7 @@ def tcp_handshake(destination_ip, destination_port=80):
         tcp_socket = socket.socket(socket_type, socket.SOCK_STREAM)
 
         # Set a timeout in case the connection is not successful
-        tcp_socket.settimeout(20)
+        tcp_socket.settimeout(deadline.timeout(20))
 
         # Initiate a connection to the specified IP address and port
         tcp_socket.connect((destination_ip, destination_port))
@@ -155,29 +166,68 @@ def tcp_handshake(destination_ip, destination_port=80):
 
         return "Established", remote_ip
 
+    except TimeoutError:
+        print("TCP connection test exceeded timeout.")
+        return "N/A", "N/A"
+
     except Exception as e:
         # Print an error message if there is an issue during the handshake
         print("TCP handshake error: " + str(e))
         return "Failed", "N/A"
 
-    except TimeoutError:
-        print("TCP connection test exceeded timeout.")
-        return "N/A", "N/A"
 
+def describe_redirect_hop(response, ip_type, dns_cache, deadline):
+    """
+    Describes one response of a redirect chain.
+
+    Args:
+        response (requests.Response): The response.
+        ip_type (str): Type of the ip (IPv4 or IPv6)
+        dns_cache (DnsCache): Shared DNS cache of the run.
+        deadline (Deadline): Deadline of the test of the URL.
 
-@timeout(function_timeout)
-def http_get_request(url):
+    Returns:
+        dict: URL, status code, redirection target and its IP addresses, time until the response was received
+        and the timing of the connection of the response.
+    """
+    location = response.headers.get('Location', 'N/A') if response.is_redirect else 'N/A'
+    location_ips = 'N/A'
+    if response.next is not None:
+        # The prepared next request has the absolute URL even if the Location header is relative
+        location_ips = dns_lookup(response.next.url, ip_type, dns_cache, deadline)
+
+    return {
+        'URL': response.url,
+        'Status': response.status_code,
+        'Location': location,
+        'Location IPs': location_ips,
+        'Time': round(response.elapsed.total_seconds(), 4),
+        'HTTP Connection': response.connection_info
+    }
+
+
+def http_get_request(url, ip_type, transport=None, deadline=None):
     """
-    Performs an HTTP GET request to the specified URL.
+    Performs an HTTP GET request to the specified URL and follows the redirects hop by hop. The redirect test,
+    the final response and the redirect chain all come from this one chain of requests. The body of the final
+    response is read as a stream and only its beginning (up to the body size limit of the transport) is kept.
 
     Args:
         url (str): The URL to send the HTTP GET request to.
+        ip_type (str): Type of the ip (IPv4 or IPv6), used for resolving the redirection targets.
+        transport (HttpTransport, optional): Shared HTTP transport of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
-        tuple: A tuple containing the HTTP status code, content length,
-        response headers, and response text.
-        If an error occurs, it returns the error message followed by three 'N/A' strings.
+        tuple: A tuple containing the redirect result, the HTTP result, the body and the redirect chain.
+        The redirect result contains the status ('Redirected' or 'Not redirected'), the first redirection target
+        URL and its IP addresses. The HTTP result contains the HTTP status code, response headers and the timing
+        of the connection of the final response. The body contains the kept bytes of the body, the length
+        and SHA-256 hash of the whole body, its charset and whether the kept body is truncated. The redirect chain
+        is a list with the description of every response.
+        If an error occurs, the HTTP status code is the error message and the other values are 'N/A'.
     """
+    deadline = probe_deadline(deadline, function_timeout)
     try:
         # Define headers for the HTTP request
         headers = {
@@ -185,189 +235,102 @@ def http_get_request(url):
                           'Chrome/97.0.4692.99 Safari/537.36'
         }
 
-        session = requests.Session()
-        # Send a GET request to the formatted URL with the defined headers
-        response = session.get(reformat_url.add_http(url),
-                               headers=headers)
+        transport = get_transport(transport)
+        # Send a GET request to the formatted URL with the defined headers, the redirects are followed below
+        response = transport.get(reformat_url.add_http(url), headers=headers, allow_redirects=False,
+                                 stream=True, timeout=deadline.timeout())
+        responses = [response]
 
-        return (response.status_code, len(response.content),
-                response.headers, response.text)
+        while response.next is not None:
+            if len(responses) > max_redirects:
+                raise requests.exceptions.TooManyRedirects(f"Exceeded {max_redirects} redirects.")
+            response = transport.send(response.next, allow_redirects=False, stream=True,
+                                      timeout=deadline.timeout())
+            responses.append(response)
 
-    except requests.exceptions.RequestException as e:
-        print("HTTP GET request failed: " + str(e))
-        return str(e), "N/A", "N/A", "N/A"
+        body = transport.read_body(response, deadline)
 
-    except TimeoutError:
-        print("HTTP GET request exceeded timeout.")
-        return "N/A", "N/A", "N/A", "N/A"
+        redirect_chain = [describe_redirect_hop(hop, ip_type, transport.dns_cache, deadline) for hop in responses]
 
-
-@timeout(function_timeout)
-def detect_redirect(url, ip_type):
-    """
-    Detects whether an HTTP request to the specified URL results in a redirect.
-
-    Args:
-        url (str): The URL to test for redirection.
-        ip_type (str):
-
-    Returns: tuple: A tuple containing the status ('Redirected' or 'Not redirected') and the redirection target URL
-    and IP address. If an error occurs, it returns three 'N/A' strings.
-    """
-    try:
-        # Perform an HTTP GET request without following redirects
-        response = requests.get(reformat_url.add_http(url), allow_redirects=False, timeout=function_timeout)
-
-        # Check if the request was redirected
-        if response.is_redirect:
-            ip_redirection = dns_lookup(response.headers['Location'], ip_type)
-            return "Redirected", response.headers['Location'], ip_redirection
+        if len(responses) > 1:
+            redirect = "Redirected", redirect_chain[0]['Location'], redirect_chain[0]['Location IPs']
         else:
-            return "Not redirected", "N/A", "N/A"
+            redirect = "Not redirected", "N/A", "N/A"
 
-    except Exception as e:
-        print("Redirect test error: " + str(e))
-        return "N/A", "N/A", "N/A"
+        return (redirect, (response.status_code, response.headers, response.connection_info), body,
+                redirect_chain)
 
-    except TimeoutError:
-        print("Redirect test exceeded timeout.")
-        return "N/A", "N/A", "N/A"
+    except (TimeoutError, requests.exceptions.Timeout):
+        print("HTTP GET request exceeded timeout.")
+        return ("N/A", "N/A", "N/A"), ("N/A", "N/A", "N/A"), ("N/A", "N/A", "N/A", "N/A", "N/A"), "N/A"
 
+    except requests.exceptions.RequestException as e:
+        print("HTTP GET request failed: " + str(e))
+        return ("N/A", "N/A", "N/A"), (str(e), "N/A", "N/A"), ("N/A", "N/A", "N/A", "N/A", "N/A"), "N/A"
 
-@timeout(function_timeout)
-def ping_test(ip_address):
+
+def ping_test(ip_address, icmp_engine=None, deadline=None):
     """
     Performs a ping test to the specified IP address.
 
     Args:
         ip_address (str): The IP address to ping.
+        icmp_engine (IcmpEngine, optional): Shared ICMP engine of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
-        tuple: A tuple containing the status ('OK', 'Fail', or 'N/A') and the source IP address.
-        If an error occurs, it returns the error message followed by 'N/A'.
+        tuple: A tuple containing the status ('OK', 'Fail', or 'N/A'), the source IP address of the replies
+        and the statistics of the echo requests (packet loss and round trip times).
+        If an error occurs, it returns 'N/A' for all three.
     """
+    deadline = probe_deadline(deadline, function_timeout)
     try:
         # Extract IPv4 address from a mapped IPv6 address if necessary
         ip_address = ip_address_operations.extract_ipv4_from_mapped_ipv6(ip_address)
 
-        # Determine the IP address type
-        ip_type = ip_address_operations.check_ip_address_type(ip_address)
-
-        # Set socket parameters based on IP address type
-        socket_type = socket.AF_INET6 if ip_type == "ipv6" else socket.AF_INET
-        socket_proto = socket.getprotobyname('ipv6-icmp') if ip_type == "ipv6" else socket.IPPROTO_ICMP
+        source_address, statistics = get_icmp_engine(icmp_engine).ping(ip_address, deadline)
+        if statistics['Received'] > 0:
+            return 'OK', source_address, statistics
+        if deadline.expired():
+            # The replies may still have been on their way, the ping ran out of time rather than failed
+            print("Ping test exceeded timeout.")
+            return "N/A", "N/A", statistics
+        return 'Fail', "N/A", statistics
 
-        # Create a socket for sending ICMP packets
-        with (socket.socket(socket_type, socket.SOCK_RAW, socket_proto) as sock):
-            # Set a timeout
-            sock.settimeout(3)
-
-            # Create and send the ICMP packet based on IP address type
-            if ip_type == "ipv6":
-                icmp_packet = ip_address_operations.create_icmp6_echo_request()
-            else:
-                ip_address_operations.create_icmp4_echo_request()
-
-            sock.sendto(icmp_packet, (ip_address, 0) if ip_type == "ipv6" else (ip_address, 1))
-
-            # Wait for a response
-            read_sockets, _, _ = select.select([sock], [], [], 1)
-            if read_sockets:
-                response, addr = sock.recvfrom(1024)
-
-                # Process the response based on IP address type
-                if ip_type == "ipv4":
-                    icmp_type = response[20]
-                    if icmp_type == 0:  # ICMP Echo Reply
-                        ip_header = response[:20]
-                        ip_header_fields = struct.unpack("!BBHHHBBH4s4s", ip_header)
-                        ip_source_address = socket.inet_ntoa(ip_header_fields[8])
-                        return 'OK', ip_source_address
-                else:
-                    icmp_header = response[:8]
-                    icmp_type, _, _, icmp_id, _ = struct.unpack('!BBHHH', icmp_header)
-                    if icmp_type == 129 and icmp_id == os.getpid() & 0xFFFF:  # Echo Reply
-                        return 'OK', addr[0]
-
-                return 'Fail', "N/A"
-            else:
-                return 'Fail', "N/A"
-
-    except socket.timeout:
+    except TimeoutError:
         print("Ping test exceeded timeout.")
-        return "N/A", "N/A"
+        return "N/A", "N/A", "N/A"
 
     except Exception as e:
         print("PING TEST ERROR: " + str(e))
-        return "N/A", "N/A"
+        return "N/A", "N/A", "N/A"
 
 
-def perform_trace(ip_address):
+def perform_trace(ip_address, icmp_engine=None, deadline=None):
     """
-    Performs a traceroute to the specified IPv4 or IPv6 address.
+    Performs a traceroute to the specified IPv4 or IPv6 address. The probes of all hops are sent at once,
+    the trace stops early when the deadline passes.
 
     Args:
         ip_address (str): The IPv6 or IPv4 address to trace the route to.
+        icmp_engine (IcmpEngine, optional): Shared ICMP engine of the run.
+        deadline (Deadline, optional): Deadline of the test of the URL.
 
     Returns:
         list: A list of tuples containing the IP address of each hop and the round-trip time.
+        If an error occurs, it returns 'N/A'.
     """
-    max_hops = 30
-    port = 33434
-    trace_result = []
-
-    # Extract IPv4 address from a mapped IPv6 address if necessary
-    ip_address = ip_address_operations.extract_ipv4_from_mapped_ipv6(ip_address)
-
-    # Determine the IP address type
-    ip_type = ip_address_operations.check_ip_address_type(ip_address)
-
-    # Define settings based on IP type
-    settings = {
-        "ipv4": {
-            "socket_type": socket.AF_INET,
-            "socket_proto": socket.IPPROTO_IP,
-            "socket_uni": socket.IP_TTL,
-            "icmp_echo_request": b'\x08\x00' + struct.pack('!HH', os.getpid() & 0xFFFF, 1),
-            "sock_sock": socket.IPPROTO_ICMP
-        },
-        "ipv6": {
-            "socket_type": socket.AF_INET6,
-            "socket_proto": socket.IPPROTO_IPV6,
-            "socket_uni": socket.IPV6_UNICAST_HOPS,
-            "icmp_echo_request": b'',
-            "sock_sock": socket.getprotobyname('ipv6-icmp')
-        }
-    }
+    deadline = probe_deadline(deadline, function_timeout)
+    try:
+        # Extract IPv4 address from a mapped IPv6 address if necessary
+        ip_address = ip_address_operations.extract_ipv4_from_mapped_ipv6(ip_address)
 
-    # Get the correct settings for the current IP type
-    current_settings = settings[ip_type]
-
-    for ttl in range(1, max_hops + 1):
-        with socket.socket(current_settings["socket_type"], socket.SOCK_DGRAM, socket.IPPROTO_UDP) as send_socket:
-            # Set the time-to-live for the packet
-            send_socket.setsockopt(current_settings["socket_proto"], current_settings["socket_uni"], ttl)
-            # Send an empty packet to the address and port
-            send_socket.sendto(current_settings["icmp_echo_request"], (ip_address, port))
-
-        with socket.socket(current_settings["socket_type"], socket.SOCK_RAW,
-                           current_settings["sock_sock"]) as recv_socket:
-            # Set a timeout for the receive operation
-            recv_socket.settimeout(1)
-            try:
-                start_time = time.time()
-                # Receive the packet
-                pkt, addr = recv_socket.recvfrom(512)
-                end_time = time.time()
-                # Append the address and round-trip time to the result
-                trace_result.append((addr[0], end_time - start_time))
-
-                # Check if we have reached the destination server
-                if addr[0] == ip_address:
-                    break  # Exit the loop upon reaching the destination
-
-            except socket.timeout:
-                # If no response is received, continue to the next hop
-                pass
-
-    return trace_result
+        return get_icmp_engine(icmp_engine).trace(ip_address, deadline)
+
+    except TimeoutError:
+        print("Trace exceeded timeout.")
+        return "N/A"
+
+    except Exception as e:
+        print("TRACE ERROR: " + str(e))
+        return "N/A"
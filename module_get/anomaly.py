@@ -0,0 +1,99 @@
+# Name: anomaly.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 26, 2024
+# Description: Detection of anomalous results of the first phase of a two-phase run.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import json  # Import JSON module for reading the JSON result files
+import os  # Import os module for operating system related functionalities
+import statistics  # Import statistics module for the median content length
+from utils.result_values import NOT_RUN  # Import value recorded for probes which were not run
+from utils import result_log  # Import result_log module for reading the result log of the control run
+
+size_outlier_factor = 10  # Content length differing from the median (or the control) by this factor is anomalous
+control_keys = ['DNS Status', 'TCP Status', 'HTTP Status', 'Redirected Status']  # Results compared with the control
+
+
+def load_control_results(folder):
+    """
+    Loads the results of a control run (e.g. of the other vantage point), either a result log or JSON result files.
+
+    Args:
+        folder (str): Folder with the results of the control run.
+
+    Returns:
+        dict or ResultLogReader: Records keyed by URL, both support get(url).
+    """
+    if result_log.has_segments(folder):
+        return result_log.ResultLogReader(folder)
+
+    control_results = {}
+    for filename in sorted(os.listdir(folder)):
+        if filename.startswith('results_') and filename.endswith('.json'):
+            with open(os.path.join(folder, filename), 'r', encoding='utf-8', errors='replace') as results_file:
+                control_results.update(json.load(results_file))
+    return control_results
+
+
+def median_content_length(records):
+    """
+    Returns the median length of the received content.
+
+    Args:
+        records (iterable): Records of the tested URLs.
+
+    Returns:
+        float: The median, or None if no content was received.
+    """
+    lengths = [record.get('Content Length') for record in records]
+    lengths = [length for length in lengths if isinstance(length, int) and length > 0]
+    return statistics.median(lengths) if lengths else None
+
+
+def is_size_outlier(length, reference):
+    """
+    Checks if a content length differs from the reference length by more than `size_outlier_factor`.
+    """
+    if not isinstance(length, int) or not reference:
+        return False
+    return length * size_outlier_factor < reference or length > reference * size_outlier_factor
+
+
+def anomaly_reasons(record, median_length=None, control_record=None):
+    """
+    Returns the reasons why the first phase result of a URL looks anomalous.
+
+    Args:
+        record (dict): Record of the URL, or None if the test gave no result.
+        median_length (float, optional): Median content length of all tested URLs.
+        control_record (dict, optional): Record of the URL from the control run.
+
+    Returns:
+        list: The reasons, empty if the result looks normal.
+    """
+    if record is None or 'DNS Status' not in record:
+        # The DNS lookup failed or the test did not give a result
+        return [record.get('Error', "No result") if record is not None else "No result"]
+
+    reasons = []
+    if record['DNS Status'] != "OK":
+        reasons.append("DNS failure")
+    if record.get('TCP Status') != "Established":
+        reasons.append("TCP failure")
+    if record.get('HTTP Status') != 200:
+        reasons.append("HTTP status")
+    if record.get('Redirected Status') != "Not redirected":
+        reasons.append("Redirect")
+    if is_size_outlier(record.get('Content Length'), median_length):
+        reasons.append("Content length outlier")
+
+    if control_record is not None:
+        for key in control_keys:
+            if control_record.get(key, NOT_RUN) != NOT_RUN and control_record.get(key) != record.get(key):
+                reasons.append(f"Differs from control: {key}")
+        if is_size_outlier(record.get('Content Length'), control_record.get('Content Length')):
+            reasons.append("Differs from control: Content Length")
+
+    return reasons
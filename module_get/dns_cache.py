@@ -0,0 +1,356 @@
+# Name: dns_cache.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 17, 2024
+# Description: DNS answer cache of a run shared by all probes, with a log of the queries sent to the network.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import asyncio  # Import asyncio module for resolving many names at once
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import threading  # Import threading module for locking the shared cache
+import time  # Import time module for time-related operations
+from datetime import datetime  # Import datetime class from datetime module
+import dns.asyncresolver  # Import the asynchronous DNS resolver for resolving the names in advance
+import dns.exception  # Import DNS exceptions
+import dns.rcode  # Import DNS response codes
+import dns.rdatatype  # Import DNS record types
+import dns.resolver  # Import the DNS resolver module for DNS resolution
+from utils import ip_address_operations  # Import ip_address_operations for selecting the IP address
+
+dns_query_folder = 'data/output_data/dns_queries'  # Folder with the logs of the DNS queries of the runs
+negative_ttl = 60  # Number of seconds for which NXDOMAIN and empty answers are cached
+default_prefetch_concurrency = 100  # Maximum number of queries sent at once when resolving names in advance
+prefetch_lifetime = 10  # Maximum time of one query sent when resolving names in advance in seconds
+
+
+def cname_chain(response):
+    """
+    Returns the CNAME chain of an answer.
+
+    Args:
+        response (dns.resolver.Answer): The answer.
+
+    Returns:
+        list: Targets of the CNAME records followed from the queried name to the canonical name.
+    """
+    return [rrset[0].target.to_text(omit_final_dot=True) for rrset in response.response.answer
+            if rrset.rdtype == dns.rdatatype.CNAME]
+
+
+class DnsCache:
+    def __init__(self, ip_type='ipv4', log_folder=None):
+        """
+        Initializes the DnsCache.
+
+        Answers are cached for their TTL, NXDOMAIN and empty answers for `negative_ttl` seconds. When several
+        probes ask for the same name at once, only one query is sent and the others wait for its answer.
+        Every query sent to the network is recorded.
+
+        Args:
+            ip_type (str, optional): Preferred Ip address (IPv4 or IPv6) of the connections using the cache.
+                Defaults to 'ipv4'.
+            log_folder (str, optional): Folder where every process of the run appends the sent queries
+                to its own part file. Without the folder the queries are only counted.
+        """
+        self.ip_type = ip_type
+        self.log_path = os.path.join(log_folder, f"part_{os.getpid()}.jsonl") if log_folder is not None else None
+        if log_folder is not None:
+            os.makedirs(log_folder, exist_ok=True)
+
+        self.resolver = dns.resolver.Resolver()
+        self.entries = {}  # Expiration time and answer (or the negative answer exception class) keyed by (name, type)
+        self.in_flight = {}  # Events of the queries being sent keyed by (name, type)
+
+        self.queries_sent = 0
+        self.cache_hits = 0
+
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Every worker process gets a cache of its own with a copy of the fresh answers (e.g. the answers resolved
+        # in advance) and its own part file of the log
+        now = time.monotonic()
+        with self.lock:
+            entries = {key: entry for key, entry in self.entries.items() if entry[0] > now}
+        return {'ip_type': self.ip_type, 'log_folder': os.path.dirname(self.log_path) if self.log_path else None,
+                'entries': entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['ip_type'], state['log_folder'])
+        self.entries.update(state.get('entries', {}))
+
+    def resolve(self, name, rdtype, lifetime=None, use_cache=True):
+        """
+        Resolves a name, from the cache if there is a fresh answer.
+
+        Args:
+            name (str): The domain name.
+            rdtype (str): Type of the record (e.g. 'A' or 'AAAA').
+            lifetime (float, optional): Maximum time of the query in seconds.
+            use_cache (bool, optional): False sends the query to the network even if a fresh answer is cached,
+                for tests which must repeat the query. The answer still updates the cache. Defaults to True.
+
+        Returns:
+            list: The records of the answer as text (the addresses for 'A' and 'AAAA').
+
+        Raises:
+            dns.resolver.NXDOMAIN: If the name does not exist.
+            dns.resolver.NoAnswer: If there is no record of the type.
+            dns.exception.DNSException: If the query failed (e.g. timed out).
+        """
+        key = (name.lower().rstrip('.'), rdtype)
+
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if use_cache and entry is not None and entry[0] > time.monotonic():
+                    self.cache_hits += 1
+                    answer = entry[1]
+                    break
+
+                event = self.in_flight.get(key)
+                if event is None:
+                    event = self.in_flight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if not owner:
+                # The same query is being sent by another probe, wait for its answer
+                event.wait(lifetime)
+                continue
+
+            try:
+                answer = self.query(key[0], rdtype, lifetime)
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+                event.set()
+            break
+
+        if isinstance(answer, type):
+            raise answer()
+        return answer
+
+    def query(self, name, rdtype, lifetime):
+        """
+        Sends a query to the network, records it and caches its answer.
+
+        Args:
+            name (str): The domain name.
+            rdtype (str): Type of the record.
+            lifetime (float): Maximum time of the query in seconds.
+
+        Returns:
+            list or type: The records of the answer as text, or the exception class of a negative answer.
+
+        Raises:
+            dns.exception.DNSException: If the query failed without a negative answer (e.g. timed out).
+        """
+        start_time = time.monotonic()
+        record = {'Name': name, 'Type': rdtype, 'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+        try:
+            response = self.resolver.resolve(name, rdtype, lifetime=lifetime)
+        except dns.exception.DNSException as e:
+            answer = self.store_answer(record, start_time, error=e)
+            if answer is None:
+                raise
+            return answer
+
+        return self.store_answer(record, start_time, response)
+
+    def store_answer(self, record, start_time, response=None, error=None):
+        """
+        Records a query sent to the network and caches its answer. NXDOMAIN and empty answers are cached
+        as the class of their exception, failed queries are not cached.
+
+        Args:
+            record (dict): Name, type and timestamp of the query.
+            start_time (float): Monotonic time when the query was sent.
+            response (dns.resolver.Answer, optional): The answer of the query.
+            error (dns.exception.DNSException, optional): The exception of a query without an answer.
+
+        Returns:
+            list or type: The records of the answer as text, the exception class of a negative answer,
+            or None if the query failed.
+        """
+        if error is None:
+            answer = [rdata.to_text() for rdata in response]
+            ttl = response.rrset.ttl
+            record.update({'Result': 'NOERROR', 'Rcode': dns.rcode.to_text(response.response.rcode()),
+                           'Answer': answer, 'CNAME chain': cname_chain(response), 'TTL': ttl})
+        elif isinstance(error, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+            answer = type(error)
+            ttl = negative_ttl
+            record.update({'Result': 'NXDOMAIN' if isinstance(error, dns.resolver.NXDOMAIN) else 'NoAnswer',
+                           'Rcode': 'NXDOMAIN' if isinstance(error, dns.resolver.NXDOMAIN) else 'NOERROR'})
+        else:
+            answer = None
+            record['Result'] = type(error).__name__
+
+        record['Duration'] = round(time.monotonic() - start_time, 4)
+        self.log_query(record)
+
+        if answer is not None:
+            with self.lock:
+                self.entries[(record['Name'], record['Type'])] = (time.monotonic() + ttl, answer)
+        return answer
+
+    def prefetch(self, names, concurrency=default_prefetch_concurrency, lifetime=prefetch_lifetime):
+        """
+        Resolves many names in advance with asynchronous queries, so the probes of the names find their answers
+        in the cache. Names with a fresh answer and IP addresses are skipped.
+
+        Args:
+            names (list): The domain names.
+            concurrency (int, optional): Maximum number of queries sent at once. Defaults to 100.
+            lifetime (float, optional): Maximum time of every query in seconds. Defaults to 10.
+
+        Returns:
+            tuple: Number of resolved names and number of names with a failed query.
+        """
+        rdtypes = ['A', 'AAAA'] if self.ip_type == 'ipv6' else ['A']
+        now = time.monotonic()
+        keys = []
+        for name in dict.fromkeys(name.lower().rstrip('.') for name in names if name):
+            if ip_address_operations.check_ip_address_type(name) != "Unknown":
+                continue
+            for rdtype in rdtypes:
+                entry = self.entries.get((name, rdtype))
+                if entry is None or entry[0] <= now:
+                    keys.append((name, rdtype))
+
+        if not keys:
+            return 0, 0
+
+        start_time = time.monotonic()
+        answers = asyncio.run(self.prefetch_async(keys, concurrency, lifetime))
+        failed = {name for (name, _), answer in zip(keys, answers) if answer is None}
+        resolved = len({name for name, _ in keys}) - len(failed)
+
+        print(f"DNS prefetch: {resolved} names resolved, {len(failed)} failed in "
+              f"{round(time.monotonic() - start_time, 2)} s.")
+        return resolved, len(failed)
+
+    async def prefetch_async(self, keys, concurrency, lifetime):
+        """
+        Sends the queries of the prefetch, at most `concurrency` of them at once.
+
+        Args:
+            keys (list): Names and types of the queries.
+            concurrency (int): Maximum number of queries sent at once.
+            lifetime (float): Maximum time of every query in seconds.
+
+        Returns:
+            list: Answers of the queries in the order of the keys (see DnsCache.store_answer).
+        """
+        resolver = dns.asyncresolver.Resolver()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def prefetch_one(name, rdtype):
+            async with semaphore:
+                start_time = time.monotonic()
+                record = {'Name': name, 'Type': rdtype, 'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                          'Prefetch': True}
+                try:
+                    response = await resolver.resolve(name, rdtype, lifetime=lifetime)
+                except dns.exception.DNSException as e:
+                    return self.store_answer(record, start_time, error=e)
+                return self.store_answer(record, start_time, response)
+
+        return await asyncio.gather(*(prefetch_one(name, rdtype) for name, rdtype in keys))
+
+    def log_query(self, record):
+        """
+        Records a query sent to the network.
+
+        Args:
+            record (dict): Name, type, result and duration of the query.
+        """
+        with self.lock:
+            self.queries_sent += 1
+
+        if self.log_path is not None:
+            # One short line is appended with one write, so the threads of the process can share the part file
+            with open(self.log_path, 'a', encoding='utf-8') as log_file:
+                log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def lookup(self, name, ip_type, lifetime=None):
+        """
+        Resolves the IPv4 addresses of a name, and the IPv6 addresses too if IPv6 is preferred.
+
+        Args:
+            name (str): The domain name.
+            ip_type (str): Preferred Ip address (IPv4 or IPv6)
+            lifetime (float, optional): Maximum time of every query in seconds.
+
+        Returns:
+            list: IPv4 addresses followed by IPv6 addresses.
+        """
+        addresses = self.resolve(name, 'A', lifetime)
+        if ip_type == "ipv6":
+            addresses = addresses + self.resolve(name, 'AAAA', lifetime)
+        return addresses
+
+    def select_ip_address(self, name, lifetime=None):
+        """
+        Selects the IP address used for connecting to a name, an address of the preferred type if there is one.
+
+        Args:
+            name (str): The domain name or an IP address.
+            lifetime (float, optional): Maximum time of every query in seconds.
+
+        Returns:
+            str: The IP address.
+        """
+        if ip_address_operations.check_ip_address_type(name) != "Unknown":
+            return name
+
+        addresses = self.lookup(name, self.ip_type, lifetime)
+        ip_address = ip_address_operations.get_ip_address(addresses, self.ip_type)
+        return ip_address if ip_address != 'No match' else addresses[0]
+
+    def summary(self):
+        """
+        Returns the statistics of the cache.
+
+        Returns:
+            dict: Number of queries sent to the network and number of answers taken from the cache.
+        """
+        with self.lock:
+            return {'DNS queries': self.queries_sent, 'DNS cache hits': self.cache_hits}
+
+    def add_summary(self, summary):
+        """
+        Adds statistics of another cache (e.g. of a worker process) to the statistics of this cache.
+
+        Args:
+            summary (dict): Statistics returned by DnsCache.summary().
+        """
+        with self.lock:
+            self.queries_sent += summary['DNS queries']
+            self.cache_hits += summary['DNS cache hits']
+
+    def print_summary(self):
+        """
+        Prints the number of sent queries and answers taken from the cache.
+        """
+        summary = self.summary()
+        print(f"DNS summary: {summary['DNS queries']} queries sent, {summary['DNS cache hits']} answers "
+              f"taken from the cache.")
+
+
+def get_dns_cache(dns_cache=None):
+    """
+    Returns the cache used by a probe.
+
+    Args:
+        dns_cache (DnsCache, optional): Cache of the run.
+
+    Returns:
+        DnsCache: The cache of the run, or a new cache for a probe called without one.
+    """
+    return dns_cache if dns_cache is not None else DnsCache()
@@ -0,0 +1,331 @@
+# Name: http_transport.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 15, 2024
+# Description: Shared connection pooled HTTP transport for the HTTP based probes.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import functools  # Import functools module for binding the DNS cache to the connection pools
+import hashlib  # Import hashlib module for hashing the response body
+from http.cookiejar import DefaultCookiePolicy  # Import cookie policy for disabling shared cookies
+import re  # Import re module for regular expressions
+import threading  # Import threading module for creating the default transport only once
+import time  # Import time module for time-related operations
+import requests  # Import requests module for making HTTP requests
+from requests.adapters import HTTPAdapter  # Import HTTPAdapter for using own connection pools
+from requests.compat import chardet  # Import charset detection used by requests
+from requests.utils import get_encoding_from_headers  # Import function for reading the charset from headers
+import dns.exception  # Import DNS exceptions
+from urllib3.connection import HTTPConnection, HTTPSConnection  # Import connection classes of urllib3
+from urllib3.exceptions import NewConnectionError  # Import exception of a failed connection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool  # Import connection pools of urllib3
+from module_get.dns_cache import DnsCache  # Import DNS cache for resolving the hosts of the connections
+from utils.certificate_store import CertificateStore, certificate_store_folder  # Import certificate store for
+# capturing the certificates of the HTTPS connections
+
+default_pool_size = 10  # Maximum number of kept connections to one host
+default_host_pools = 100  # Maximum number of hosts with kept connections
+default_max_body_size = 2 * 1024 * 1024  # Maximum number of stored bytes of a response body
+body_chunk_size = 64 * 1024  # Number of bytes read from the response body at once
+
+meta_charset_pattern = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+default_transport = None  # Transport used by probes called without a transport
+default_transport_lock = threading.Lock()
+
+
+class TimedConnectionMixin:
+    """
+    Records the time of establishing the connection (TCP and TLS handshake) and whether a request was sent
+    on a connection established earlier. The host is resolved by the DNS cache of the run, the TLS server name
+    and the Host header still use the host name.
+    """
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+        self.connect_time = None  # Duration of the last connect in seconds
+        self.used = False  # True after a request was sent on the established connection
+        self.request_count = 0  # Number of requests sent since the connection was established
+        self.reused = False  # True if the last request was sent on a connection used before
+
+    def connect(self):
+        start_time = time.monotonic()
+        super().connect()
+        self.connect_time = time.monotonic() - start_time
+        self.used = False
+
+    def _new_conn(self):
+        if self.dns_cache is None:
+            return super()._new_conn()
+
+        host_name = self._dns_host
+        try:
+            lifetime = self.timeout if isinstance(self.timeout, (int, float)) else None
+            self._dns_host = self.dns_cache.select_ip_address(host_name, lifetime)
+        except dns.exception.DNSException as e:
+            # Report the failure as a failed connection, in the same way as a failed system resolution
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host_name
+
+    def mark_request(self):
+        """
+        Marks that a request is being sent on the connection. A plain HTTP connection is established only while
+        sending the first request, so a connection without a socket is always new.
+        """
+        self.reused = self.sock is not None and self.used
+        self.request_count = self.request_count + 1 if self.reused else 1
+
+    def request(self, *args, **kwargs):
+        self.mark_request()
+        result = super().request(*args, **kwargs)
+        self.used = True
+        return result
+
+    def request_chunked(self, *args, **kwargs):
+        self.mark_request()
+        result = super().request_chunked(*args, **kwargs)
+        self.used = True
+        return result
+
+    def timing(self):
+        """
+        Returns the timing of the connection of the last request.
+
+        Returns:
+            dict: Whether the connection was reused, the handshake time ('N/A' for a reused connection,
+            the handshake did not belong to this request) and the number of requests sent on the connection.
+        """
+        return {
+            'Reused': self.reused,
+            'Connect time': round(self.connect_time, 4) if not self.reused and self.connect_time is not None
+            else 'N/A',
+            'Requests on connection': self.request_count
+        }
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    """
+    HTTPS connection capturing the certificate of the server in the certificate store of the run.
+    """
+    def __init__(self, *args, certificate_store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.certificate_store = certificate_store
+
+    def connect(self):
+        super().connect()
+        if self.certificate_store is None:
+            return
+
+        try:
+            self.certificate_store.capture(self.sock.getpeername()[0], self.server_hostname or self.host, self.sock)
+        except (OSError, ValueError) as e:
+            # The request does not fail because of the certificate capture, the certificate probe tries again
+            print("Error capturing certificate: " + str(e))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter using connections with recorded timing. Every response gets the `connection_info`
+    attribute with the timing of the connection it was received on.
+    """
+    def __init__(self, dns_cache, certificate_store, *args, **kwargs):
+        self.dns_cache = dns_cache
+        self.certificate_store = certificate_store
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': functools.partial(TimedHTTPConnectionPool, dns_cache=self.dns_cache),
+            'https': functools.partial(TimedHTTPSConnectionPool, dns_cache=self.dns_cache,
+                                       certificate_store=self.certificate_store)
+        }
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        # The body is not read yet, so the response still holds its connection
+        connection = getattr(resp, 'connection', None)
+        response.connection_info = connection.timing() if isinstance(connection, TimedConnectionMixin) else 'N/A'
+        return response
+
+
+def detect_charset(headers, head):
+    """
+    Detects the charset of a response body. The charset from the Content-Type header goes first, then the charset
+    from the meta tag of the page, then the default charset of the content type and at last the detected one.
+
+    Args:
+        headers (dict): Headers of the response.
+        head (bytes): Beginning of the body.
+
+    Returns:
+        str: The charset, or 'N/A' if it is not known.
+    """
+    if 'charset' in headers.get('Content-Type', '').lower():
+        return get_encoding_from_headers(headers)
+
+    match = meta_charset_pattern.search(head)
+    if match:
+        return match.group(1).decode('ascii')
+
+    return get_encoding_from_headers(headers) or chardet.detect(head)['encoding'] or 'N/A'
+
+
+class HttpTransport:
+    def __init__(self, pool_size=default_pool_size, host_pools=default_host_pools,
+                 max_body_size=default_max_body_size, dns_cache=None, certificate_store=None):
+        """
+        Initializes the HttpTransport. One transport is shared by all HTTP probes of a run, so the connections
+        to a host are kept alive and reused by the following probes.
+
+        Cookies are not kept between requests, every request behaves like a request of a new session.
+
+        Args:
+            pool_size (int, optional): Maximum number of kept connections to one host. Defaults to 10.
+            host_pools (int, optional): Maximum number of hosts with kept connections. Defaults to 100.
+            max_body_size (int, optional): Maximum number of stored bytes of a response body. Defaults to 2 MB.
+            dns_cache (DnsCache, optional): DNS cache of the run used for resolving the hosts, otherwise
+                a cache of the transport is created.
+            certificate_store (CertificateStore, optional): Store where the certificates of the HTTPS connections
+                are captured, otherwise a store in the default folder is created.
+        """
+        self.pool_size = pool_size
+        self.host_pools = host_pools
+        self.max_body_size = max_body_size
+        self.dns_cache = dns_cache if dns_cache is not None else DnsCache()
+        self.certificate_store = certificate_store if certificate_store is not None \
+            else CertificateStore(certificate_store_folder)
+
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        adapter = TimedHTTPAdapter(self.dns_cache, self.certificate_store, pool_connections=host_pools,
+                                   pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __getstate__(self):
+        # Every worker process gets a transport of its own with the same settings
+        return {'pool_size': self.pool_size, 'host_pools': self.host_pools, 'max_body_size': self.max_body_size,
+                'dns_cache': self.dns_cache, 'certificate_store': self.certificate_store}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, url, **kwargs):
+        """
+        Sends a GET request.
+
+        Args:
+            url (str): The URL.
+            **kwargs: Arguments of requests.Session.get.
+
+        Returns:
+            requests.Response: The response with the `connection_info` attribute.
+        """
+        return self.session.get(url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request with any method.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL.
+            **kwargs: Arguments of requests.Session.request.
+
+        Returns:
+            requests.Response: The response with the `connection_info` attribute.
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def send(self, prepared_request, **kwargs):
+        """
+        Sends a prepared request, e.g. the next request of a redirect chain.
+
+        Args:
+            prepared_request (requests.PreparedRequest): The request.
+            **kwargs: Arguments of requests.Session.send.
+
+        Returns:
+            requests.Response: The response with the `connection_info` attribute.
+        """
+        return self.session.send(prepared_request, **kwargs)
+
+    def read_body(self, response, deadline):
+        """
+        Reads the body of a response sent with `stream=True` chunk by chunk. Only the first `max_body_size` bytes
+        are kept, but the whole body is read, so its length and hash are computed from the whole body.
+
+        Args:
+            response (requests.Response): The response.
+            deadline (Deadline): Deadline of the reading.
+
+        Returns:
+            tuple: A tuple containing the stored (possibly truncated) body, the length of the whole body,
+            the SHA-256 hash of the whole body, the charset and whether the stored body was truncated.
+
+        Raises:
+            TimeoutError: If the deadline passes before the whole body is read.
+        """
+        body = bytearray()
+        length = 0
+        body_hash = hashlib.sha256()
+
+        try:
+            for chunk in response.raw.stream(body_chunk_size, decode_content=True):
+                deadline.timeout()
+                length += len(chunk)
+                body_hash.update(chunk)
+                if len(body) < self.max_body_size:
+                    body += chunk[:self.max_body_size - len(body)]
+        finally:
+            response.close()
+
+        body = bytes(body)
+        charset = detect_charset(response.headers, body[:body_chunk_size])
+        return body, length, body_hash.hexdigest(), charset, length > len(body)
+
+    def close(self):
+        """
+        Closes all kept connections.
+        """
+        self.session.close()
+
+
+def get_transport(transport=None):
+    """
+    Returns the transport used by a probe.
+
+    Args:
+        transport (HttpTransport, optional): Transport of the run.
+
+    Returns:
+        HttpTransport: The transport of the run, or the default transport shared by probes called without one.
+    """
+    global default_transport
+
+    if transport is not None:
+        return transport
+
+    with default_transport_lock:
+        if default_transport is None:
+            default_transport = HttpTransport()
+        return default_transport
@@ -0,0 +1,466 @@
+# Name: icmp_engine.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 18, 2024
+# Description: Long-lived ICMP engine sharing one raw socket per address family between all ping and trace probes.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import itertools  # Import itertools module for numbering the echo requests
+import select  # Import select module for waiting for the replies
+import socket  # Import socket module for the raw ICMP sockets
+import struct  # Import struct module for parsing the replies
+import threading  # Import threading module for the receiving threads
+import time  # Import time module for time-related operations
+from module_get import path_cache  # Import path cache functions for confirming the cached paths
+from utils import ip_address_operations  # Import ip_address_operations for creating the echo requests
+
+default_echo_count = 3  # Number of echo requests sent to one IP address
+echo_interval = 0.2  # Number of seconds between the echo requests to one IP address
+reply_timeout = 1  # Number of seconds to wait for the replies after the last echo request
+receive_buffer_size = 2048  # Size of the buffer of the received packets
+default_max_hops = 30  # Maximum TTL of the trace probes
+default_trace_probes = 2  # Number of trace probes sent with every TTL
+trace_base_port = 33434  # Destination port of the first trace probe, every probe gets its own port
+trace_reply_timeout = 2  # Number of seconds to wait for the replies of the trace probes
+trace_payload = b'\x00' * 32  # Payload of the trace probes
+
+# ICMP types of the echo replies and of the errors answering the trace probes (time exceeded, unreachable)
+echo_reply_types = {socket.AF_INET: 0, socket.AF_INET6: 129}
+error_types = {socket.AF_INET: (11, 3), socket.AF_INET6: (3, 1)}
+
+default_engine = None  # Engine used by ping probes called without an engine
+default_engine_lock = threading.Lock()
+
+
+class EchoProbe:
+    """
+    Echo requests sent to one IP address by one ping probe and the round trip times of their replies.
+    """
+    def __init__(self, ip_address, identifier):
+        self.ip_address = ip_address
+        self.identifier = identifier
+        self.send_times = {}  # Send times of the echo requests keyed by sequence number
+        self.rtts = []  # Round trip times of the received replies in seconds
+        self.source_address = "N/A"  # Address the replies came from
+        self.all_received = threading.Event()
+
+    def statistics(self):
+        """
+        Returns the statistics of the probe.
+
+        Returns:
+            dict: Number of sent echo requests and received replies, the packet loss in percent and the minimum,
+            average and maximum round trip time in milliseconds ('N/A' without replies).
+        """
+        sent = len(self.send_times)
+        received = len(self.rtts)
+        rtts = [rtt * 1000 for rtt in self.rtts]
+        return {
+            'Sent': sent,
+            'Received': received,
+            'Loss': round(100 * (sent - received) / sent, 1) if sent else 'N/A',
+            'RTT min': round(min(rtts), 3) if rtts else 'N/A',
+            'RTT avg': round(sum(rtts) / len(rtts), 3) if rtts else 'N/A',
+            'RTT max': round(max(rtts), 3) if rtts else 'N/A'
+        }
+
+
+class TraceProbe:
+    """
+    UDP probes sent with a range of TTLs to one IP address by one trace and the ICMP errors answering them.
+    """
+    def __init__(self, ip_address, ttls):
+        self.ip_address = ip_address
+        self.ttls = list(ttls)  # Probed TTLs
+        self.send_times = {}  # TTL and send time of the probes keyed by destination port
+        self.replies = {}  # Addresses and round trip times of the replies keyed by TTL
+        self.destination_ttl = None  # Lowest TTL answered by the destination
+        self.sent_all = False  # True after all probes were sent
+        self.complete = threading.Event()
+
+    def add_reply(self, ttl, address, rtt):
+        """
+        Records a reply. The trace is complete when every probe was answered, or when the destination answered
+        and every lower probed TTL has a reply.
+
+        Args:
+            ttl (int): TTL of the answered probe.
+            address (str): Address the reply came from.
+            rtt (float): Round trip time in seconds.
+        """
+        self.replies.setdefault(ttl, []).append((address, rtt))
+        if address == self.ip_address and (self.destination_ttl is None or ttl < self.destination_ttl):
+            self.destination_ttl = ttl
+        self.check_complete()
+
+    def check_complete(self):
+        """
+        Marks the trace complete if the probes need no more replies.
+        """
+        if self.sent_all and sum(len(replies) for replies in self.replies.values()) == len(self.send_times):
+            self.complete.set()
+        elif self.destination_ttl is not None and \
+                all(hop in self.replies for hop in self.ttls if hop <= self.destination_ttl):
+            self.complete.set()
+
+    def hops(self):
+        """
+        Returns the hops of the trace up to the destination. A hop answered from several addresses (e.g. by load
+        balanced routers) is listed once for each address, hops without a reply are left out.
+
+        Returns:
+            list: Tuples with the IP address of the hop and the lowest round trip time of its replies in seconds.
+        """
+        last_ttl = self.destination_ttl if self.destination_ttl is not None else max(self.replies, default=0)
+        hops = []
+        for ttl in range(self.ttls[0], last_ttl + 1):
+            rtts = {}
+            for address, rtt in self.replies.get(ttl, []):
+                rtts[address] = min(rtt, rtts.get(address, rtt))
+            hops.extend(rtts.items())
+        return hops
+
+    def routers(self):
+        """
+        Returns the addresses of the routers answering the probes, without the destination.
+
+        Returns:
+            dict: Addresses of the routers keyed by TTL.
+        """
+        routers = {}
+        for ttl, replies in self.replies.items():
+            addresses = list(dict.fromkeys(address for address, _ in replies if address != self.ip_address))
+            if addresses:
+                routers[ttl] = addresses
+        return routers
+
+
+class IcmpEngine:
+    def __init__(self, echo_count=default_echo_count, trace_probes=default_trace_probes, path_cache=None):
+        """
+        Initializes the IcmpEngine.
+
+        One raw socket per address family is opened with the first ping of the family and kept open for the whole
+        run. A receiving thread of every socket matches the replies to the probes by the identifier and sequence
+        number of the echo request, so any number of probes can ping at the same time. The identifiers are taken
+        from the ICMP identifier range of the process, the sequence numbers are unique within the engine.
+
+        The same sockets receive the ICMP errors answering the UDP probes of the traces. All probes of a trace are
+        sent at once, each to its own destination port, and the errors are matched to the probes by the source
+        and destination port of the UDP header they quote.
+
+        Args:
+            echo_count (int, optional): Number of echo requests sent to one IP address. Defaults to 3.
+            trace_probes (int, optional): Number of trace probes sent with every TTL. Defaults to 2.
+            path_cache (PathCache, optional): Persistent cache of the traced paths. With the cache only the tail
+                of a known path is probed, the whole path is traced again only if the tail changed.
+        """
+        self.echo_count = max(1, echo_count)
+        self.trace_probes = max(1, trace_probes)
+        self.path_cache = path_cache
+
+        self.sockets = {}  # Raw sockets keyed by address family
+        self.receivers = []
+        self.pending = {}  # Probes waiting for a reply keyed by (address family, identifier, sequence number)
+        self.trace_pending = {}  # Traces waiting for a reply keyed by (address family, source port, destination port)
+        self.sequence = itertools.count(1)
+        self.next_identifier = itertools.count()
+        self.closed = False
+
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Every worker process gets an engine of its own with its own sockets
+        return {'echo_count': self.echo_count, 'trace_probes': self.trace_probes, 'path_cache': self.path_cache}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get_socket(self, family):
+        """
+        Returns the raw socket of the address family, the socket and its receiving thread are created
+        with the first ping of the family.
+
+        Args:
+            family (int): socket.AF_INET or socket.AF_INET6.
+
+        Returns:
+            socket.socket: The raw socket.
+        """
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("ICMP engine is closed.")
+
+            sock = self.sockets.get(family)
+            if sock is None:
+                proto = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.getprotobyname('ipv6-icmp')
+                sock = self.sockets[family] = socket.socket(family, socket.SOCK_RAW, proto)
+                receiver = threading.Thread(target=self.receive, args=(family, sock), daemon=True)
+                receiver.start()
+                self.receivers.append(receiver)
+            return sock
+
+    def receive(self, family, sock):
+        """
+        Receives the replies of a socket until the engine is closed. Every packet is read into one buffer
+        allocated in advance.
+
+        Args:
+            family (int): Address family of the socket.
+            sock (socket.socket): The raw socket.
+        """
+        buffer = bytearray(receive_buffer_size)
+
+        while not self.closed:
+            try:
+                read_sockets, _, _ = select.select([sock], [], [], 0.5)
+                if not read_sockets:
+                    continue
+                length, addr = sock.recvfrom_into(buffer)
+            except (OSError, ValueError):
+                # The socket was closed
+                break
+            receive_time = time.monotonic()
+
+            # A raw IPv4 socket receives the IP header too, a raw IPv6 socket only the ICMPv6 message
+            offset = (buffer[0] & 0x0F) * 4 if family == socket.AF_INET else 0
+            if length < offset + 8:
+                continue
+
+            if buffer[offset] == echo_reply_types[family]:
+                self.match_echo_reply(family, buffer, offset, addr[0], receive_time)
+            elif buffer[offset] in error_types[family]:
+                self.match_trace_reply(family, buffer, offset, length, addr[0], receive_time)
+
+    def match_echo_reply(self, family, buffer, offset, address, receive_time):
+        """
+        Passes an echo reply to the ping probe waiting for it.
+
+        Args:
+            family (int): Address family of the reply.
+            buffer (bytearray): Buffer with the received packet.
+            offset (int): Offset of the ICMP message in the buffer.
+            address (str): Address the reply came from.
+            receive_time (float): Monotonic time when the reply was received.
+        """
+        identifier, sequence = struct.unpack_from('!HH', buffer, offset + 4)
+
+        with self.lock:
+            probe = self.pending.pop((family, identifier, sequence), None)
+            if probe is None:
+                # A reply of another process or a late reply of a finished probe
+                return
+            probe.rtts.append(receive_time - probe.send_times[sequence])
+            probe.source_address = address
+            if len(probe.rtts) == self.echo_count:
+                probe.all_received.set()
+
+    def match_trace_reply(self, family, buffer, offset, length, address, receive_time):
+        """
+        Passes an ICMP error quoting a UDP trace probe to the trace waiting for it.
+
+        Args:
+            family (int): Address family of the reply.
+            buffer (bytearray): Buffer with the received packet.
+            offset (int): Offset of the ICMP message in the buffer.
+            length (int): Length of the received packet.
+            address (str): Address the reply came from.
+            receive_time (float): Monotonic time when the reply was received.
+        """
+        # The error quotes the IP header of the probe and at least the first 8 bytes of its UDP datagram
+        quoted = offset + 8
+        if family == socket.AF_INET:
+            if length < quoted + 20 or buffer[quoted + 9] != socket.IPPROTO_UDP:
+                return
+            udp_offset = quoted + (buffer[quoted] & 0x0F) * 4
+        else:
+            if length < quoted + 40 or buffer[quoted + 6] != socket.IPPROTO_UDP:
+                return
+            udp_offset = quoted + 40
+        if length < udp_offset + 4:
+            return
+        source_port, destination_port = struct.unpack_from('!HH', buffer, udp_offset)
+
+        with self.lock:
+            probe = self.trace_pending.pop((family, source_port, destination_port), None)
+            if probe is None:
+                return
+            ttl, send_time = probe.send_times[destination_port]
+            probe.add_reply(ttl, address, receive_time - send_time)
+
+    def ping(self, ip_address, deadline):
+        """
+        Sends the echo requests to an IP address and waits for their replies.
+
+        Args:
+            ip_address (str): The IPv4 or IPv6 address.
+            deadline (Deadline): Deadline of the ping.
+
+        Returns:
+            tuple: The address the replies came from ('N/A' without replies) and the statistics of the probe
+            (see EchoProbe.statistics).
+        """
+        ip_type = ip_address_operations.check_ip_address_type(ip_address)
+        family = socket.AF_INET6 if ip_type == "ipv6" else socket.AF_INET
+        sock = self.get_socket(family)
+
+        start, count = ip_address_operations.get_icmp_identifier_space()
+        probe = EchoProbe(ip_address, (start + next(self.next_identifier) % count) & 0xFFFF)
+
+        try:
+            for i in range(self.echo_count):
+                if i > 0:
+                    time.sleep(min(echo_interval, deadline.remaining()))
+                    if deadline.expired():
+                        break
+
+                sequence = next(self.sequence) & 0xFFFF
+                if ip_type == "ipv6":
+                    packet = ip_address_operations.create_icmp6_echo_request(probe.identifier, sequence)
+                else:
+                    packet = ip_address_operations.create_icmp4_echo_request(probe.identifier, sequence)
+
+                with self.lock:
+                    probe.send_times[sequence] = time.monotonic()
+                    self.pending[(family, probe.identifier, sequence)] = probe
+                sock.sendto(packet, (ip_address, 0))
+
+            # Wait for the replies of all sent echo requests
+            with self.lock:
+                if len(probe.rtts) == len(probe.send_times):
+                    probe.all_received.set()
+            if not probe.all_received.is_set() and not deadline.expired():
+                probe.all_received.wait(deadline.timeout(reply_timeout))
+        finally:
+            # Replies coming after the end of the probe are ignored
+            with self.lock:
+                for sequence in probe.send_times:
+                    self.pending.pop((family, probe.identifier, sequence), None)
+
+        with self.lock:
+            return probe.source_address, probe.statistics()
+
+    def trace(self, ip_address, deadline, max_hops=default_max_hops):
+        """
+        Traces the route to an IP address. The UDP probes with all TTLs are sent at once, so the whole trace takes
+        about one reply timeout instead of one timeout per hop.
+
+        If the path towards the prefix of the address is cached, only its tail is probed. When the tail did not
+        change, the cached hops below the tail are used, otherwise the whole path is traced and cached again.
+
+        Args:
+            ip_address (str): The IPv4 or IPv6 address.
+            deadline (Deadline): Deadline of the trace.
+            max_hops (int, optional): Maximum TTL of the probes. Defaults to 30.
+
+        Returns:
+            list: Tuples with the IP address of every answering hop and its round trip time (see TraceProbe.hops),
+            the round trip time of the cached hops is 'N/A'.
+        """
+        cached_path = self.path_cache.get(ip_address) if self.path_cache is not None else None
+        if cached_path is not None:
+            ttls = path_cache.tail_ttls(cached_path)
+            probe = self.sweep(ip_address, deadline, ttls)
+            with self.lock:
+                routers, destination_ttl = probe.routers(), probe.destination_ttl
+                hops = path_cache.hops_below(cached_path, ttls[0]) + probe.hops()
+
+            if path_cache.is_confirmed(cached_path, routers, destination_ttl):
+                return hops
+
+        probe = self.sweep(ip_address, deadline, range(1, max_hops + 1))
+        with self.lock:
+            routers, destination_ttl = probe.routers(), probe.destination_ttl
+            hops = probe.hops()
+
+        if self.path_cache is not None and hops:
+            self.path_cache.put(ip_address, routers, destination_ttl)
+        return hops
+
+    def sweep(self, ip_address, deadline, ttls):
+        """
+        Sends the UDP probes with all TTLs at once and waits for the ICMP errors answering them.
+
+        Args:
+            ip_address (str): The IPv4 or IPv6 address.
+            deadline (Deadline): Deadline of the trace.
+            ttls (iterable): The probed TTLs in ascending order.
+
+        Returns:
+            TraceProbe: The probes and their replies.
+        """
+        ip_type = ip_address_operations.check_ip_address_type(ip_address)
+        family = socket.AF_INET6 if ip_type == "ipv6" else socket.AF_INET
+        self.get_socket(family)
+
+        probe = TraceProbe(ip_address, ttls)
+        if family == socket.AF_INET6:
+            level, option = socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS
+        else:
+            level, option = socket.IPPROTO_IP, socket.IP_TTL
+
+        # The bound source port tells the probes of this trace apart from the probes of other traces
+        with socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_UDP) as send_socket:
+            send_socket.bind(('::' if family == socket.AF_INET6 else '0.0.0.0', 0))
+            source_port = send_socket.getsockname()[1]
+
+            try:
+                for ttl in probe.ttls:
+                    send_socket.setsockopt(level, option, ttl)
+                    for i in range(self.trace_probes):
+                        destination_port = trace_base_port + (ttl - 1) * self.trace_probes + i
+                        with self.lock:
+                            probe.send_times[destination_port] = (ttl, time.monotonic())
+                            self.trace_pending[(family, source_port, destination_port)] = probe
+                        send_socket.sendto(trace_payload, (ip_address, destination_port))
+
+                with self.lock:
+                    probe.sent_all = True
+                    probe.check_complete()
+
+                if not deadline.expired():
+                    probe.complete.wait(deadline.timeout(trace_reply_timeout))
+            finally:
+                # Replies coming after the end of the trace are ignored
+                with self.lock:
+                    for destination_port in probe.send_times:
+                        self.trace_pending.pop((family, source_port, destination_port), None)
+
+        return probe
+
+    def close(self):
+        """
+        Stops the receiving threads and closes the sockets.
+        """
+        with self.lock:
+            self.closed = True
+            sockets = list(self.sockets.values())
+            self.sockets = {}
+
+        for receiver in self.receivers:
+            receiver.join()
+        self.receivers = []
+        for sock in sockets:
+            sock.close()
+
+
+def get_icmp_engine(icmp_engine=None):
+    """
+    Returns the engine used by a ping probe.
+
+    Args:
+        icmp_engine (IcmpEngine, optional): Engine of the run.
+
+    Returns:
+        IcmpEngine: The engine of the run, or the default engine shared by probes called without one.
+    """
+    global default_engine
+
+    if icmp_engine is not None:
+        return icmp_engine
+
+    with default_engine_lock:
+        if default_engine is None:
+            default_engine = IcmpEngine()
+        return default_engine
@@ -0,0 +1,277 @@
+# Name: middle_box_engine.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 24, 2024
+# Description: Raw TCP engine pipelining crafted HTTP requests of the middle box probes over one connection.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import socket  # Import socket module for the raw TCP connections
+import ssl  # Import ssl module for the TLS connections of HTTPS URLs
+import time  # Import time module for the timings of the responses
+from module_get.http_transport import default_max_body_size  # Import maximum size of the stored response bytes
+
+http_port = 80  # Port of the tested HTTP server
+https_port = 443  # Port of the tested HTTPS server
+receive_size = 64 * 1024  # Number of bytes received at once
+idle_timeout = 10  # Maximum time of waiting for the next bytes of the responses in seconds
+no_body_statuses = (204, 304)  # Status codes of responses without a body
+
+
+class PipelinedRequest:
+    def __init__(self, label, data):
+        """
+        Initializes the PipelinedRequest.
+
+        Args:
+            label (str): Name of the request in the results (e.g. the method).
+            data (bytes): Exact bytes of the request.
+        """
+        self.label = label
+        self.data = data
+
+
+class PipelinedResponse:
+    def __init__(self, label, connection, status, data, elapsed):
+        """
+        Initializes the PipelinedResponse.
+
+        Args:
+            label (str): Name of the request the response belongs to.
+            connection (int): Number of the connection the response was received on, starting with 1.
+            status (int): Status code of the response, or 'N/A' if the response is not an HTTP response.
+            data (bytes): Exact bytes of the response (status line, headers and body).
+            elapsed (float): Time from sending the requests until the response was complete in seconds.
+        """
+        self.label = label
+        self.connection = connection
+        self.status = status
+        self.data = data
+        self.elapsed = elapsed
+
+    def to_record(self):
+        """
+        Returns the response as a record of the results, without its bytes.
+
+        Returns:
+            dict: The request, the connection, the status code, the length and the time of the response in ms.
+        """
+        return {'Request': self.label, 'Connection': self.connection, 'Status': self.status,
+                'Length': len(self.data), 'Time': round(self.elapsed * 1000, 2)}
+
+
+def header_end(data, start):
+    """
+    Returns the position after the empty line ending the headers, or None if the headers are incomplete.
+    """
+    position = data.find(b'\r\n\r\n', start)
+    return position + 4 if position >= 0 else None
+
+
+def chunked_body_end(data, start):
+    """
+    Returns the position after the last chunk and the trailers of a chunked body, or None if it is incomplete.
+    """
+    position = start
+    while True:
+        line_end = data.find(b'\r\n', position)
+        if line_end < 0:
+            return None
+        try:
+            chunk_size = int(data[position:line_end].split(b';')[0].strip(), 16)
+        except ValueError:
+            # Not a chunked body, the rest of the data is taken as the body
+            return len(data)
+
+        position = line_end + 2
+        if chunk_size == 0:
+            break
+        position += chunk_size + 2
+        if position > len(data):
+            return None
+
+    # Skip the trailers up to the empty line
+    while True:
+        line_end = data.find(b'\r\n', position)
+        if line_end < 0:
+            return None
+        if line_end == position:
+            return position + 2
+        position = line_end + 2
+
+
+def parse_response(data, start, closed):
+    """
+    Finds the end of one HTTP/1.x response in the received bytes.
+
+    Args:
+        data (bytes): Bytes received on the connection.
+        start (int): Position of the response.
+        closed (bool): True if the server closed the connection, the response may then end with the data.
+
+    Returns:
+        tuple: Status code ('N/A' for bytes which are not an HTTP response) and the position after the response,
+        or None if the response is not complete yet.
+    """
+    if not data.startswith(b'HTTP/', start):
+        # Not an HTTP response (e.g. bytes injected on the path) or only its beginning, the rest of the data
+        # is taken as one response when the connection is closed
+        return ("N/A", len(data)) if closed else None
+
+    body_start = header_end(data, start)
+    if body_start is None:
+        return ("N/A", len(data)) if closed else None
+
+    head = data[start:body_start].decode('iso-8859-1').split('\r\n')
+    try:
+        status = int(head[0].split(' ')[1])
+    except (IndexError, ValueError):
+        status = "N/A"
+
+    headers = {}
+    for line in head[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if status in no_body_statuses or (isinstance(status, int) and status < 200):
+        end = body_start
+    elif 'chunked' in headers.get('transfer-encoding', '').lower():
+        end = chunked_body_end(data, body_start)
+    elif headers.get('content-length', '').isdigit():
+        end = body_start + int(headers['content-length'])
+        if end > len(data):
+            end = None
+    else:
+        # The body ends when the server closes the connection
+        end = len(data) if closed else None
+
+    if end is None:
+        return (status, len(data)) if closed else None
+    return status, end
+
+
+def open_connection(ip_address, port, deadline, server_hostname=None):
+    """
+    Opens the TCP connection of the exchange, with TLS if the server host name is given.
+
+    Args:
+        ip_address (str): IP address of the server.
+        port (int): Port of the server.
+        deadline (Deadline): Deadline of the exchange.
+        server_hostname (str, optional): Host name of the server sent in the TLS handshake, None for plain TCP.
+
+    Returns:
+        socket.socket: The connected socket.
+    """
+    tcp_socket = socket.create_connection((ip_address, port), timeout=deadline.timeout())
+    if server_hostname is None:
+        return tcp_socket
+
+    try:
+        return ssl.create_default_context().wrap_socket(tcp_socket, server_hostname=server_hostname)
+    except OSError:
+        tcp_socket.close()
+        raise
+
+
+def exchange(ip_address, pipelined, deadline, port=http_port, max_size=default_max_body_size, connection=1,
+             server_hostname=None):
+    """
+    Sends all requests at once over one TCP connection and reads the pipelined responses.
+
+    Args:
+        ip_address (str): IP address of the server.
+        pipelined (list): PipelinedRequest objects, sent in the order of the list.
+        deadline (Deadline): Deadline of the exchange.
+        port (int, optional): Port of the server. Defaults to 80.
+        max_size (int, optional): Maximum number of received bytes, the reading stops after them.
+        connection (int, optional): Number of the connection, stored in the responses.
+        server_hostname (str, optional): Host name of the server for a TLS connection, None for plain TCP.
+
+    Returns:
+        list: PipelinedResponse objects of the answered requests, in the order of the requests. The list is
+        shorter than the list of the requests if the server closed the connection earlier.
+
+    Raises:
+        TimeoutError: If the deadline passes before the connection is established.
+        OSError: If the connection fails.
+    """
+    responses = []
+    data = b''
+    position = 0
+    closed = False
+
+    with open_connection(ip_address, port, deadline, server_hostname) as tcp_socket:
+        send_time = time.monotonic()
+        tcp_socket.sendall(b''.join(request.data for request in pipelined))
+
+        while len(responses) < len(pipelined):
+            if not closed and len(data) < max_size:
+                try:
+                    tcp_socket.settimeout(deadline.timeout(idle_timeout))
+                    chunk = tcp_socket.recv(receive_size)
+                except (TimeoutError, ConnectionResetError, ssl.SSLError):
+                    # The server stopped answering or closed the TLS connection without closing it properly,
+                    # the connection is handled as closed
+                    chunk = b''
+                data += chunk
+                closed = not chunk
+            else:
+                # Nothing more will be read, the incomplete response is taken as it is
+                closed = True
+
+            # Take every response completed by the received bytes
+            while len(responses) < len(pipelined) and position < len(data):
+                parsed = parse_response(data, position, closed)
+                if parsed is None:
+                    break
+                status, end = parsed
+                responses.append(PipelinedResponse(pipelined[len(responses)].label, connection, status,
+                                                   data[position:end], time.monotonic() - send_time))
+                position = end
+
+            if closed:
+                break
+
+    return responses
+
+
+def pipeline(ip_address, pipelined, deadline, port=http_port, max_size=default_max_body_size, server_hostname=None):
+    """
+    Sends the requests pipelined over one TCP connection. Servers often close the connection after answering
+    an invalid request, the unanswered requests are then sent again over a new connection.
+
+    Args:
+        ip_address (str): IP address of the server.
+        pipelined (list): PipelinedRequest objects.
+        deadline (Deadline): Deadline of the exchange.
+        port (int, optional): Port of the server. Defaults to 80.
+        max_size (int, optional): Maximum number of received bytes of one connection.
+        server_hostname (str, optional): Host name of the server for TLS connections, None for plain TCP.
+
+    Returns:
+        list: PipelinedResponse objects of the answered requests, in the order of the requests.
+
+    Raises:
+        TimeoutError: If the deadline passes before the first connection is established.
+        OSError: If the first connection fails.
+    """
+    responses = []
+    connection = 1
+
+    while len(responses) < len(pipelined):
+        try:
+            answered = exchange(ip_address, pipelined[len(responses):], deadline, port, max_size, connection,
+                                server_hostname)
+        except (TimeoutError, OSError):
+            if connection == 1:
+                raise
+            break
+
+        if not answered:
+            # The server answers nothing more, another connection would not help
+            break
+        responses.extend(answered)
+        connection += 1
+
+    return responses
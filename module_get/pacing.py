@@ -0,0 +1,175 @@
+# Name: pacing.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 8, 2024
+# Description: Pacing of the tests with a global, per-host and per-IP request rate limit.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import asyncio  # Import asyncio module for waiting without blocking the event loop
+import random  # Import random module for generating the jitter
+import threading  # Import threading module for locking the shared buckets
+import time  # Import time module for time-related operations
+
+min_rate_factor = 0.05  # Lowest fraction of the configured rate the scheduler slows down to
+slowdown_factor = 0.5  # Rate is multiplied by this value when the target throttles the tests
+recovery_step = 0.1  # Rate factor is increased by this value after every successful test
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        """
+        Initializes the TokenBucket.
+
+        Args:
+            rate (float): Number of tokens added per second, 0 (or less) disables the limit.
+            burst (int, optional): Maximum number of tokens stored in the bucket. Defaults to 1.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_update = time.monotonic()
+
+    def reserve(self, rate_factor=1.0):
+        """
+        Takes one token from the bucket, the token may be borrowed from the future.
+
+        Args:
+            rate_factor (float, optional): Fraction of the rate used for refilling the bucket. Defaults to 1.0.
+
+        Returns:
+            float: Number of seconds to wait before the token may be used.
+        """
+        if self.rate <= 0:
+            # The rate is not limited
+            return 0.0
+
+        now = time.monotonic()
+        rate = self.rate * rate_factor
+
+        # Refill the bucket with tokens for the time since the last update
+        self.tokens = min(self.burst, self.tokens + (now - self.last_update) * rate)
+        self.last_update = now
+
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / rate
+
+
+class PacingScheduler:
+    def __init__(self, qps=1.0, host_qps=0.2, ip_qps=0.5, jitter=0.0):
+        """
+        Initializes the PacingScheduler.
+
+        Args:
+            qps (float, optional): Number of tests started per second in total, 0 disables the limit.
+                Defaults to 1.0.
+            host_qps (float, optional): Number of tests started per second for one destination host, 0 disables
+                the limit. Defaults to 0.2.
+            ip_qps (float, optional): Number of tests started per second for one destination IP address, 0 disables
+                the limit. Defaults to 0.5.
+            jitter (float, optional): Maximum random number of seconds added to every wait. Defaults to 0.0.
+        """
+        self.host_qps = host_qps
+        self.ip_qps = ip_qps
+        self.jitter = jitter
+
+        self.global_bucket = TokenBucket(qps)
+        self.host_buckets = {}
+        self.ip_buckets = {}
+
+        # Fraction of the configured rate currently used, lowered when the tests are throttled
+        self.global_rate_factor = 1.0
+        self.host_rate_factors = {}
+
+        self.lock = threading.Lock()
+
+    def reserve(self, host, ip_address=None):
+        """
+        Reserves a slot for starting a test of the host (and of the IP address if given).
+
+        Args:
+            host (str): Destination host of the test.
+            ip_address (str, optional): Destination IP address of the test.
+
+        Returns:
+            float: Number of seconds to wait before the test may start.
+        """
+        with self.lock:
+            if ip_address is not None:
+                # The global and per-host limits are already applied when the test of the URL starts
+                bucket = self.ip_buckets.setdefault(ip_address, TokenBucket(self.ip_qps))
+                delay = bucket.reserve()
+            else:
+                host_bucket = self.host_buckets.setdefault(host, TokenBucket(self.host_qps))
+                delay = max(self.global_bucket.reserve(self.global_rate_factor),
+                            host_bucket.reserve(self.host_rate_factors.get(host, 1.0)))
+
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        return delay
+
+    def wait(self, host, ip_address=None):
+        """
+        Waits until a test of the host (and of the IP address if given) may start.
+
+        Args:
+            host (str): Destination host of the test.
+            ip_address (str, optional): Destination IP address of the test.
+        """
+        delay = self.reserve(host, ip_address)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, host, ip_address=None):
+        """
+        Waits until a test of the host (and of the IP address if given) may start, without blocking the event loop.
+
+        Args:
+            host (str): Destination host of the test.
+            ip_address (str, optional): Destination IP address of the test.
+        """
+        delay = self.reserve(host, ip_address)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def report(self, host, throttled):
+        """
+        Adapts the rate to the outcome of a test. The rate is lowered when the target throttles the tests
+        and slowly returns back to the configured rate after successful tests.
+
+        Args:
+            host (str): Destination host of the test.
+            throttled (bool): True if the target answered with 429 or reset the connection.
+        """
+        with self.lock:
+            host_rate_factor = self.host_rate_factors.get(host, 1.0)
+
+            if throttled:
+                self.host_rate_factors[host] = max(min_rate_factor, host_rate_factor * slowdown_factor)
+                self.global_rate_factor = max(min_rate_factor, self.global_rate_factor * (1 + slowdown_factor) / 2)
+                print(f"Target {host} throttles the tests, slowing down.")
+            else:
+                self.host_rate_factors[host] = min(1.0, host_rate_factor + recovery_step)
+                self.global_rate_factor = min(1.0, self.global_rate_factor + recovery_step / 10)
+
+
+def is_throttled(result):
+    """
+    Checks if the result of a test shows that the target throttles the tests (429 or reset connection).
+
+    Args:
+        result (dict): Result of the test of one website.
+
+    Returns:
+        bool: True if the target throttles the tests, otherwise False.
+    """
+    if result is None:
+        return False
+
+    for key in ('Error', 'HTTP Status'):
+        value = str(result.get(key, ''))
+        if '429' in value or 'reset' in value.lower() or 'Connection aborted' in value:
+            return True
+    return False
@@ -0,0 +1,181 @@
+# Name: path_cache.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 20, 2024
+# Description: Persistent cache of the traced paths towards destination prefixes, shared by the runs of a vantage point.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import ipaddress  # Import ipaddress module for computing the destination prefixes
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import re  # Import re module for regular expressions
+import threading  # Import threading module for locking the cache
+from datetime import datetime, timedelta  # Import datetime classes for the age of the paths
+
+path_cache_folder = 'data/output_data/path_cache'  # Folder of the path caches of all vantage points
+confirm_hops = 3  # Number of the last hops of a cached path probed again to confirm the path
+max_path_age = timedelta(days=7)  # Age after which a cached path is traced again from the first hop
+timestamp_format = "%Y-%m-%d %H:%M:%S"
+
+
+def destination_prefix(ip_address):
+    """
+    Returns the prefix of the destination sharing the path, /24 for IPv4 and /48 for IPv6 addresses.
+
+    Args:
+        ip_address (str): The IP address.
+
+    Returns:
+        str: The prefix.
+    """
+    address = ipaddress.ip_address(ip_address)
+    return str(ipaddress.ip_network(f"{address}/{24 if address.version == 4 else 48}", strict=False))
+
+
+class PathCache:
+    def __init__(self, folder, vantage):
+        """
+        Initializes the PathCache and loads the paths traced from the vantage point.
+
+        Every path is stored as the addresses of the answering routers keyed by TTL (without the destination
+        itself, other addresses of the prefix share the path) and the TTL on which the destination answered.
+        Updated paths are appended to the file of the vantage point, so all processes of a run can share it,
+        the last path of a prefix wins.
+
+        Args:
+            folder (str): Folder of the path caches.
+            vantage (str): Name of the vantage point (e.g. the host name of the measuring machine).
+        """
+        self.folder = folder
+        self.vantage = vantage
+        self.path = os.path.join(folder, re.sub(r'[^\w.-]', '_', vantage) + '.jsonl')
+        self.paths = {}  # Cached paths keyed by destination prefix
+
+        self.lock = threading.Lock()
+        self.load()
+
+    def __getstate__(self):
+        # Every worker process loads the cache from the file
+        return {'folder': self.folder, 'vantage': self.vantage}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'], state['vantage'])
+
+    def load(self):
+        """
+        Loads the cached paths which are not older than `max_path_age`.
+        """
+        if not os.path.exists(self.path):
+            return
+
+        oldest = (datetime.now() - max_path_age).strftime(timestamp_format)
+        with open(self.path, 'r', encoding='utf-8') as cache_file:
+            for line in cache_file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be incomplete if the run crashed while writing it
+                    continue
+                if entry['Updated'] >= oldest:
+                    self.paths[entry['Prefix']] = entry
+                else:
+                    self.paths.pop(entry['Prefix'], None)
+
+    def compact(self):
+        """
+        Rewrites the file with one line per cached path, the replaced and expired paths are dropped.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+
+        with self.lock:
+            temporary_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'w', encoding='utf-8') as cache_file:
+                for entry in self.paths.values():
+                    cache_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(temporary_path, self.path)
+
+    def get(self, ip_address):
+        """
+        Returns the cached path towards the prefix of an IP address.
+
+        Args:
+            ip_address (str): The IP address.
+
+        Returns:
+            dict: The cached path, or None if there is no path of the prefix.
+        """
+        with self.lock:
+            return self.paths.get(destination_prefix(ip_address))
+
+    def put(self, ip_address, hops, destination_ttl):
+        """
+        Caches the path towards the prefix of an IP address.
+
+        Args:
+            ip_address (str): The IP address.
+            hops (dict): Addresses of the answering routers keyed by TTL.
+            destination_ttl (int): TTL on which the destination answered, or None.
+        """
+        entry = {
+            'Prefix': destination_prefix(ip_address),
+            'Vantage': self.vantage,
+            'Hops': {str(ttl): addresses for ttl, addresses in sorted(hops.items())},
+            'Destination TTL': destination_ttl,
+            'Updated': datetime.now().strftime(timestamp_format)
+        }
+
+        os.makedirs(self.folder, exist_ok=True)
+        with self.lock:
+            self.paths[entry['Prefix']] = entry
+            # One short line is appended with one write, so the processes of the run can share the file
+            with open(self.path, 'a', encoding='utf-8') as cache_file:
+                cache_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def tail_ttls(entry):
+    """
+    Returns the TTLs probed again to confirm a cached path, the last `confirm_hops` TTLs up to the destination
+    (or up to the last answering router if the destination did not answer).
+
+    Args:
+        entry (dict): The cached path.
+
+    Returns:
+        list: The TTLs.
+    """
+    last_ttl = entry['Destination TTL'] or max(map(int, entry['Hops']), default=confirm_hops)
+    return list(range(max(1, last_ttl - confirm_hops + 1), last_ttl + 1))
+
+
+def is_confirmed(entry, hops, destination_ttl):
+    """
+    Checks if the tail of a cached path was confirmed. The destination must answer on the same TTL and every
+    router of the tail must be one of the cached routers of its TTL.
+
+    Args:
+        entry (dict): The cached path.
+        hops (dict): Addresses of the routers answering the probes of the tail keyed by TTL.
+        destination_ttl (int): TTL on which the destination answered, or None.
+
+    Returns:
+        bool: True if the path did not change, otherwise False.
+    """
+    if destination_ttl != entry['Destination TTL'] or (destination_ttl is None and not hops):
+        return False
+    return all(set(addresses) <= set(entry['Hops'].get(str(ttl), [])) for ttl, addresses in hops.items())
+
+
+def hops_below(entry, first_ttl):
+    """
+    Returns the cached hops of a confirmed path below the probed tail. Their round trip time is not known.
+
+    Args:
+        entry (dict): The cached path.
+        first_ttl (int): First probed TTL.
+
+    Returns:
+        list: Tuples with the IP address of the hop and 'N/A'.
+    """
+    return [(address, "N/A") for ttl, addresses in sorted(entry['Hops'].items(), key=lambda item: int(item[0]))
+            if int(ttl) < first_ttl for address in addresses]
@@ -0,0 +1,164 @@
+# Name: probe_graph.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 7, 2024
+# Description: Running probes of one website in parallel according to their dependencies.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # Import tools for running probes in threads
+
+
+class Skipped:
+    """
+    Marker of a probe that was not run because one of its dependencies was not available.
+    """
+
+    def __repr__(self):
+        return "SKIPPED"
+
+
+SKIPPED = Skipped()  # Value stored for skipped probes
+
+
+class Probe:
+    def __init__(self, name, inputs, function, after=None):
+        """
+        Initializes the Probe.
+
+        Args:
+            name (str): Name of the probe, its result is stored under this name.
+            inputs (list): Names of the values the probe needs. The values are passed to the function as
+                positional arguments in the same order.
+            function (callable): Function performing the probe.
+            after (list, optional): Names of the probes which must finish before this probe starts. Their
+                results are not passed to the function.
+        """
+        self.name = name
+        self.inputs = inputs
+        self.function = function
+        self.after = after or []
+
+    def dependencies(self):
+        """
+        Returns names of all values the probe waits for.
+
+        Returns:
+            list: Names of the inputs and of the probes the probe runs after.
+        """
+        return self.inputs + self.after
+
+    def run(self, context):
+        """
+        Runs the probe with its inputs taken from the context.
+
+        Args:
+            context (dict): Already known values (initial values and results of finished probes).
+
+        Returns:
+            object: Result of the probe.
+        """
+        return self.function(*[context[name] for name in self.inputs])
+
+
+def check_probe_graph(probes, initial_names):
+    """
+    Checks that every dependency of every probe is provided by the initial values or by another probe.
+
+    Args:
+        probes (list): List of Probe objects.
+        initial_names (iterable): Names of the initial values.
+
+    Raises:
+        ValueError: If a dependency is not provided or the probes depend on each other in a cycle.
+    """
+    known = set(initial_names)
+    remaining = list(probes)
+
+    while remaining:
+        ready = [probe for probe in remaining if all(name in known for name in probe.dependencies())]
+        if not ready:
+            missing = {probe.name: [name for name in probe.dependencies() if name not in known]
+                       for probe in remaining}
+            raise ValueError(f"Probe dependencies cannot be satisfied: {missing}")
+
+        for probe in ready:
+            known.add(probe.name)
+            remaining.remove(probe)
+
+
+def select_probes(probes, names):
+    """
+    Selects probes by name together with all probes they depend on.
+
+    Args:
+        probes (list): List of Probe objects.
+        names (iterable): Names of the selected probes.
+
+    Returns:
+        list: Selected Probe objects and their dependencies, in the order of the list.
+    """
+    probes_by_name = {probe.name: probe for probe in probes}
+    selected = set()
+    stack = list(names)
+
+    while stack:
+        name = stack.pop()
+        if name in selected or name not in probes_by_name:
+            continue
+        selected.add(name)
+        stack.extend(probes_by_name[name].dependencies())
+
+    return [probe for probe in probes if probe.name in selected]
+
+
+def run_probe_graph(probes, initial_values):
+    """
+    Runs probes in parallel. A probe is started as soon as all of its dependencies are known.
+
+    If any dependency of a probe is SKIPPED, the probe is not run and SKIPPED is stored as its result.
+
+    Args:
+        probes (list): List of Probe objects.
+        initial_values (dict): Values available before any probe runs (e.g. the tested address).
+
+    Returns:
+        dict: Initial values together with the results of all probes, keyed by name.
+    """
+    check_probe_graph(probes, initial_values)
+
+    context = dict(initial_values)
+    waiting = list(probes)
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max(len(probes), 1)) as executor:
+        while waiting or running:
+            # Start every probe whose dependencies are known, unless another probe already failed
+            for probe in list(waiting):
+                if error is None and all(name in context for name in probe.dependencies()):
+                    waiting.remove(probe)
+                    if any(context[name] is SKIPPED for name in probe.dependencies()):
+                        context[probe.name] = SKIPPED
+                    else:
+                        running[executor.submit(probe.run, context)] = probe
+
+            if not running:
+                # Either everything is finished or a probe failed and nothing else is running
+                if error is None and waiting:
+                    continue
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                probe = running.pop(future)
+                try:
+                    context[probe.name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+    if error is not None:
+        raise error
+
+    return context
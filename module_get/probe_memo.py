@@ -0,0 +1,156 @@
+# Name: probe_memo.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 19, 2024
+# Description: Memo of the results of the IP level probes shared by the URLs resolving to the same IP address.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import threading  # Import threading module for locking the shared memo
+import time  # Import time module for time-related operations
+
+default_freshness = 300  # Number of seconds for which a probe result is shared with other URLs
+
+
+def is_reusable(value, deadline=None):
+    """
+    Checks if a probe result may be shared. Results of probes which failed or ran out of time (e.g. because
+    the deadline of their URL passed) are not shared. A probe which returned after the deadline of its URL passed
+    may have been cut short without reporting it (e.g. a trace with the hops answered until then), so its result
+    is not shared either.
+
+    Args:
+        value: Result of the probe.
+        deadline (Deadline, optional): Deadline of the test of the URL the probe ran for.
+
+    Returns:
+        bool: True if the result may be shared, otherwise False.
+    """
+    if deadline is not None and deadline.expired():
+        return False
+    if isinstance(value, tuple):
+        return len(value) > 0 and value[0] != "N/A"
+    return value != "N/A"
+
+
+class ProbeMemo:
+    def __init__(self, freshness=default_freshness):
+        """
+        Initializes the ProbeMemo.
+
+        Results are shared for `freshness` seconds. When several URLs run the same probe at once, only one probe
+        runs and the others wait for its result until their own deadline.
+
+        Args:
+            freshness (float, optional): Number of seconds for which a result is shared, 0 disables the memo.
+                Defaults to 300.
+        """
+        self.freshness = freshness
+        self.entries = {}  # Expiration time and result keyed by the probe name and its key
+        self.in_flight = {}  # Events of the running probes keyed by the probe name and its key
+
+        self.shared_results = 0
+
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Every worker process gets an empty memo of its own
+        return {'freshness': self.freshness}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, key, function, deadline=None):
+        """
+        Returns the fresh result of a probe, or runs the probe and remembers its result.
+
+        Args:
+            key (tuple): Name of the probe and the values it depends on (e.g. the IP address).
+            function (callable): Function running the probe without arguments.
+            deadline (Deadline, optional): Deadline of the test of the URL the probe runs for.
+
+        Returns:
+            tuple: The result of the probe and True if the result was shared, otherwise False.
+        """
+        if self.freshness <= 0:
+            return function(), False
+
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self.shared_results += 1
+                    return entry[1], True
+
+                event = self.in_flight.get(key)
+                if event is None:
+                    event = self.in_flight[key] = threading.Event()
+                    break
+
+            # The same probe is running for another URL, wait for its result, but never past the deadline of this
+            # URL. If the other probe hangs, this URL runs the probe on its own.
+            if deadline is None:
+                event.wait()
+            elif not event.wait(deadline.remaining()):
+                return function(), False
+
+        try:
+            value = function()
+            if is_reusable(value, deadline):
+                with self.lock:
+                    self.entries[key] = (time.monotonic() + self.freshness, value)
+            return value, False
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            event.set()
+
+    def summary(self):
+        """
+        Returns the statistics of the memo.
+
+        Returns:
+            dict: Number of probe results shared with other URLs.
+        """
+        with self.lock:
+            return {'Shared probe results': self.shared_results}
+
+    def add_summary(self, summary):
+        """
+        Adds statistics of another memo (e.g. of a worker process) to the statistics of this memo.
+
+        Args:
+            summary (dict): Statistics returned by ProbeMemo.summary().
+        """
+        with self.lock:
+            self.shared_results += summary['Shared probe results']
+
+    def print_summary(self):
+        """
+        Prints the number of shared probe results.
+        """
+        print(f"Probe memo summary: {self.summary()['Shared probe results']} probe results shared between URLs.")
+
+
+def memoized(name, function, key=lambda ip_address, *args: ip_address):
+    """
+    Wraps a probe function so its result is shared by the URLs with the same key. The wrapped function takes
+    the memo and the list of the shared probes of the URL before the arguments of the probe. The last argument
+    of every wrapped probe is the deadline of the URL.
+
+    Args:
+        name (str): Name of the probe, it is added to the list of the shared probes of the URL.
+        function (callable): The probe function.
+        key (callable, optional): Function returning the key from the arguments of the probe. Defaults to the
+            first argument (the IP address).
+
+    Returns:
+        callable: The wrapped function.
+    """
+    def run(probe_memo, shared_probes, *args):
+        value, shared = probe_memo.get((name, key(*args)), lambda: function(*args), args[-1])
+        if shared:
+            shared_probes.append(name)
+        return value
+
+    return run
@@ -0,0 +1,167 @@
+# Name: retry_queue.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 9, 2024
+# Description: Queue of URLs deferred because their domain answered with 429 Too Many Requests.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import heapq  # Import heapq module for ordering deferred URLs by time
+import itertools  # Import itertools module for generating the order of deferred URLs
+import threading  # Import threading module for locking the shared queue
+import time  # Import time module for time-related operations
+
+
+def is_rate_limited(result):
+    """
+    Checks if the test of a website failed with 429 Too Many Requests.
+
+    Args:
+        result (dict): Result of the test of one website.
+
+    Returns:
+        bool: True if the 429 error occurred, otherwise False.
+    """
+    return result is not None and '429' in str(result.get('Error', ''))
+
+
+class RetryQueue:
+    def __init__(self, max_retries=5, base_delay=5):
+        """
+        Initializes the RetryQueue.
+
+        Args:
+            max_retries (int, optional): Maximum number of retries of one URL. Defaults to 5.
+            base_delay (int, optional): Base of the exponential delay, the n-th retry waits base_delay ** n seconds.
+                Defaults to 5.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+        self.heap = []  # Deferred URLs as (not before time, order, position, website, attempt, deferred at)
+        self.order = itertools.count()
+        self.domain_not_before = {}  # Time before which no URL of the domain is tested
+
+        self.retries = 0
+        self.give_ups = 0
+        self.deferred_time = 0.0
+
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
+
+    def is_domain_ready(self, domain):
+        """
+        Checks if URLs of the domain may be tested now.
+
+        Args:
+            domain (str): Domain of the URL.
+
+        Returns:
+            bool: True if the domain is not deferred, otherwise False.
+        """
+        with self.lock:
+            return self.domain_not_before.get(domain, 0) <= time.monotonic()
+
+    def postpone(self, position, website, domain, attempt=0):
+        """
+        Puts a URL aside until its deferred domain may be tested again. It is not counted as a retry.
+
+        Args:
+            position (int): Position of the URL in the URL list.
+            website (str): The website URL.
+            domain (str): Domain of the URL.
+            attempt (int, optional): Number of retries of the URL so far. Defaults to 0.
+        """
+        with self.lock:
+            not_before = self.domain_not_before.get(domain, 0)
+            heapq.heappush(self.heap, (not_before, next(self.order), position, website, attempt, time.monotonic()))
+
+    def defer(self, position, website, domain, attempt):
+        """
+        Defers a rate limited URL and every other URL of its domain.
+
+        Args:
+            position (int): Position of the URL in the URL list.
+            website (str): The website URL.
+            domain (str): Domain of the URL.
+            attempt (int): Number of retries of the URL so far.
+
+        Returns:
+            bool: True if the URL was deferred, False if it reached the maximum number of retries.
+        """
+        with self.lock:
+            if attempt >= self.max_retries:
+                self.give_ups += 1
+                return False
+
+            now = time.monotonic()
+            delay = self.base_delay ** (attempt + 1)
+            not_before = max(self.domain_not_before.get(domain, 0), now + delay)
+            self.domain_not_before[domain] = not_before
+
+            self.retries += 1
+            heapq.heappush(self.heap, (not_before, next(self.order), position, website, attempt + 1, now))
+
+        print(f"Received 429 error, {website} deferred for {delay} seconds...")
+        return True
+
+    def pop_ready(self):
+        """
+        Takes the deferred URL which waited the longest and may be tested now.
+
+        Returns:
+            tuple: Position, website and number of retries of the URL, or None if no URL is ready.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if not self.heap or self.heap[0][0] > now:
+                return None
+
+            _, _, position, website, attempt, deferred_at = heapq.heappop(self.heap)
+            self.deferred_time += now - deferred_at
+            return position, website, attempt
+
+    def time_to_next(self):
+        """
+        Returns the time until the next deferred URL may be tested.
+
+        Returns:
+            float: Number of seconds to wait, or None if no URL is deferred.
+        """
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0.0, self.heap[0][0] - time.monotonic())
+
+    def summary(self):
+        """
+        Returns the retry statistics of the queue.
+
+        Returns:
+            dict: Number of retries, number of given up URLs and seconds spent by URLs in the queue.
+        """
+        with self.lock:
+            return {'Retries': self.retries, 'Give-ups': self.give_ups, 'Deferred time': self.deferred_time}
+
+    def add_summary(self, summary):
+        """
+        Adds retry statistics of another queue (e.g. of a worker process) to the statistics of this queue.
+
+        Args:
+            summary (dict): Retry statistics returned by RetryQueue.summary().
+        """
+        with self.lock:
+            self.retries += summary['Retries']
+            self.give_ups += summary['Give-ups']
+            self.deferred_time += summary['Deferred time']
+
+    def print_summary(self):
+        """
+        Prints the number of retries, give-ups and time spent by URLs in the queue.
+        """
+        summary = self.summary()
+        print(f"Retry summary: {summary['Retries']} retries, {summary['Give-ups']} URLs given up, "
+              f"{round(summary['Deferred time'], 2)} s deferred in total.")
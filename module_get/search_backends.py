@@ -0,0 +1,240 @@
+# Name: search_backends.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 23, 2024
+# Description: Interchangeable search engine backends of the search probe.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import abc  # Import abc module for the interface of the search backends
+import html  # Import html module for unescaping the links of the result pages
+import re  # Import re module for regular expressions
+import threading  # Import threading module for limiting the concurrent searches
+import time  # Import time module for time-related operations
+from urllib.parse import urlencode, urlparse, parse_qs  # Import URL functions for the search and result URLs
+import requests  # Import requests module for making HTTP requests
+from googlesearch import search  # Import the googlesearch package for searching on Google
+from requests.adapters import HTTPAdapter  # Import HTTPAdapter for sizing the connection pool
+from module_get.pacing import TokenBucket, min_rate_factor, slowdown_factor, recovery_step  # Import token bucket
+# and rate adaptation settings for limiting the search rate
+
+result_count = 10  # Number of results of one search
+google_search_pause = 2  # Pause between requests of the googlesearch package in seconds
+default_search_url = 'https://www.google.com/search'  # Search page used by the HTTP backend
+default_search_qps = 0.5  # Number of searches sent per second by the HTTP backend
+default_search_concurrency = 4  # Maximum number of searches sent at the same time by the HTTP backend
+search_user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) ' \
+                    'Chrome/124.0 Safari/537.36'
+
+link_pattern = re.compile(r'<a[^>]+href="([^"]+)"', re.IGNORECASE)
+
+search_backend = None  # Backend used by the search probe of this process
+search_backend_lock = threading.Lock()
+
+
+class SearchBackend(abc.ABC):
+    """
+    Search engine used by the search probe. Backends return the URLs of the first results of a query.
+    """
+    @abc.abstractmethod
+    def search(self, query, deadline):
+        """
+        Searches the query.
+
+        Args:
+            query (str): The search query.
+            deadline (Deadline): Deadline of the search.
+
+        Returns:
+            list: URLs of the results.
+
+        Raises:
+            TimeoutError: If the deadline passes before the search is finished.
+        """
+
+
+class GoogleSearchBackend(SearchBackend):
+    """
+    Google search through the googlesearch package, with a fixed pause before every request.
+    """
+    def search(self, query, deadline):
+        # The googlesearch package has no timeout of its own, so the deadline is checked before every request
+        # (each request starts with the pause) and between the results
+        results = []
+
+        if deadline.remaining() < google_search_pause:
+            raise TimeoutError("Not enough time left for the search.")
+
+        for result in search(query, num=result_count, stop=result_count, pause=google_search_pause):
+            deadline.timeout()
+            results.append(result)
+
+        return results
+
+
+class HttpSearchBackend(SearchBackend):
+    def __init__(self, search_url=default_search_url, qps=default_search_qps,
+                 concurrency=default_search_concurrency):
+        """
+        Initializes the HttpSearchBackend.
+
+        The result page of the search engine is requested directly and the links of the results are taken from it.
+        Searches of different probes run at the same time, their rate is limited by a token bucket. When the search
+        engine answers with 429, the rate is lowered and it slowly returns back after successful searches.
+
+        Args:
+            search_url (str, optional): URL of the search page, the query is sent in the `q` parameter.
+                Defaults to the Google search page.
+            qps (float, optional): Number of searches sent per second, 0 disables the limit. Defaults to 0.5.
+            concurrency (int, optional): Maximum number of searches sent at the same time. Defaults to 4.
+        """
+        self.search_url = search_url
+        self.qps = qps
+        self.concurrency = concurrency
+
+        self.bucket = TokenBucket(qps) if qps > 0 else None
+        self.rate_factor = 1.0
+        self.slots = threading.BoundedSemaphore(concurrency)
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = search_user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Every worker process gets a backend of its own with the same settings
+        return {'search_url': self.search_url, 'qps': self.qps, 'concurrency': self.concurrency}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def wait_for_slot(self, deadline):
+        """
+        Waits until the next search may be sent.
+
+        Args:
+            deadline (Deadline): Deadline of the search.
+
+        Raises:
+            TimeoutError: If the search may not be sent before the deadline.
+        """
+        if self.bucket is None:
+            return
+
+        with self.lock:
+            delay = self.bucket.reserve(self.rate_factor)
+        if delay > deadline.remaining():
+            raise TimeoutError("Not enough time left for the search.")
+        if delay > 0:
+            time.sleep(delay)
+
+    def report(self, throttled):
+        """
+        Adapts the search rate to the answer of the search engine.
+
+        Args:
+            throttled (bool): True if the search engine answered with 429.
+        """
+        with self.lock:
+            if throttled:
+                self.rate_factor = max(min_rate_factor, self.rate_factor * slowdown_factor)
+            else:
+                self.rate_factor = min(1.0, self.rate_factor + recovery_step)
+
+    def search(self, query, deadline):
+        self.wait_for_slot(deadline)
+
+        if not self.slots.acquire(timeout=deadline.timeout()):
+            raise TimeoutError("Not enough time left for the search.")
+        try:
+            response = self.session.get(self.search_url + '?' + urlencode({'q': query, 'num': result_count}),
+                                        timeout=deadline.timeout())
+        finally:
+            self.slots.release()
+
+        self.report(response.status_code == 429)
+        # A 429 error is passed to the retry queue of the tester
+        response.raise_for_status()
+
+        return parse_result_links(response.text, urlparse(self.search_url).hostname)
+
+
+def parse_result_links(page, search_host):
+    """
+    Takes the URLs of the results from a result page. Redirect links of the search engine (/url?q=...)
+    are resolved to their targets, links to the search engine itself are left out.
+
+    Args:
+        page (str): HTML of the result page.
+        search_host (str): Host name of the search engine.
+
+    Returns:
+        list: At most `result_count` URLs of the results.
+    """
+    results = []
+    for link in link_pattern.findall(page):
+        link = html.unescape(link)
+        if link.startswith('/url?'):
+            link = parse_qs(urlparse(link).query).get('q', [''])[0]
+
+        host = urlparse(link).hostname
+        if not link.startswith(('http://', 'https://')) or host is None or host == search_host or \
+                host.endswith('.' + search_host):
+            continue
+
+        if link not in results:
+            results.append(link)
+            if len(results) == result_count:
+                break
+
+    return results
+
+
+def set_search_backend(backend):
+    """
+    Sets the backend used by the search probe of this process.
+
+    Args:
+        backend (SearchBackend): The backend.
+    """
+    global search_backend
+
+    with search_backend_lock:
+        search_backend = backend
+
+
+def get_search_backend():
+    """
+    Returns the backend used by the search probe of this process.
+
+    Returns:
+        SearchBackend: The backend set for the run, or the Google search backend.
+    """
+    global search_backend
+
+    with search_backend_lock:
+        if search_backend is None:
+            search_backend = GoogleSearchBackend()
+        return search_backend
+
+
+def create_search_backend(name, search_url=default_search_url, qps=default_search_qps,
+                          concurrency=default_search_concurrency):
+    """
+    Creates a backend by its name.
+
+    Args:
+        name (str): 'google' for the googlesearch package, 'http' for the HTTP backend.
+        search_url (str, optional): URL of the search page of the HTTP backend.
+        qps (float, optional): Number of searches sent per second by the HTTP backend.
+        concurrency (int, optional): Maximum number of searches sent at the same time by the HTTP backend.
+
+    Returns:
+        SearchBackend: The backend.
+    """
+    if name == 'http':
+        return HttpSearchBackend(search_url, qps, concurrency)
+    return GoogleSearchBackend()
@@ -0,0 +1,216 @@
+# Name: search_cache.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 22, 2024
+# Description: Persistent cache of the search results of the keywords, shared by the URLs of the same site.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import re  # Import re module for regular expressions
+import threading  # Import threading module for locking the shared cache
+import time  # Import time module for time-related operations
+from datetime import datetime  # Import datetime class from datetime module
+
+search_cache_folder = 'data/output_data/search_cache'  # Folder of the search caches of all vantage points
+default_search_ttl = 24 * 60 * 60  # Number of seconds for which the search results of a keyword are cached
+
+
+class SearchFlight:
+    """
+    Search of a keyword being sent, the callers asking for the same keyword wait for its results.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class SearchCache:
+    def __init__(self, folder, vantage, ttl=default_search_ttl):
+        """
+        Initializes the SearchCache and loads the fresh results of the vantage point.
+
+        The results are keyed by the keyword, the vantage point and the day of the search, so the results of
+        a keyword are searched again every day at the latest. When several URLs ask for the same keyword at once,
+        only one search is sent and the others wait for its results. Failed searches are not cached.
+
+        Args:
+            folder (str): Folder of the search caches.
+            vantage (str): Name of the vantage point (e.g. the host name of the measuring machine).
+            ttl (float, optional): Number of seconds for which the results are cached, 0 disables the cache.
+                Defaults to one day.
+        """
+        self.folder = folder
+        self.vantage = vantage
+        self.ttl = ttl
+        self.path = os.path.join(folder, re.sub(r'[^\w.-]', '_', vantage) + '.jsonl')
+        self.entries = {}  # Search time and results keyed by (keyword, vantage, day)
+        self.in_flight = {}  # Searches being sent keyed by (keyword, vantage, day)
+
+        self.searches_sent = 0
+        self.cache_hits = 0
+
+        self.lock = threading.Lock()
+        self.load()
+
+    def __getstate__(self):
+        # Every worker process loads the cache from the file
+        return {'folder': self.folder, 'vantage': self.vantage, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def load(self):
+        """
+        Loads the fresh results of today from the file of the vantage point. Results of the past days are never
+        used again, as the day is a part of the key.
+        """
+        if self.ttl <= 0 or not os.path.exists(self.path):
+            return
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        with open(self.path, 'r', encoding='utf-8') as cache_file:
+            for line in cache_file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be incomplete if the run crashed while writing it
+                    continue
+                if entry['Day'] == today and entry['Time'] + self.ttl > time.time():
+                    key = (entry['Keyword'], entry['Vantage'], entry['Day'])
+                    self.entries[key] = (entry['Time'], entry['Results'])
+
+    def compact(self):
+        """
+        Rewrites the file with one line per cached keyword, the replaced, expired and past days' results
+        are dropped.
+        """
+        if self.ttl <= 0:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+
+        with self.lock:
+            temporary_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'w', encoding='utf-8') as cache_file:
+                for (keyword, vantage, day), (search_time, results) in self.entries.items():
+                    entry = {'Keyword': keyword, 'Vantage': vantage, 'Day': day, 'Time': search_time,
+                             'Results': results}
+                    cache_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(temporary_path, self.path)
+
+    def key(self, keyword):
+        """
+        Returns the key of the results of a keyword searched today.
+
+        Args:
+            keyword (str): The keyword.
+
+        Returns:
+            tuple: The keyword, the vantage point and the day.
+        """
+        return keyword.lower(), self.vantage, datetime.now().strftime("%Y-%m-%d")
+
+    def get(self, keyword, search, timeout=None):
+        """
+        Returns the fresh results of a keyword, or searches the keyword and caches its results.
+
+        Args:
+            keyword (str): The keyword.
+            search (callable): Function searching the keyword, it returns the list of the results.
+            timeout (float, optional): Maximum time of waiting for the search of another caller in seconds.
+
+        Returns:
+            list: The search results.
+
+        Raises:
+            TimeoutError: If the search of another caller did not finish in time.
+            Exception: The exception of the failed search, also for the callers waiting for it.
+        """
+        key = self.key(keyword)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] + self.ttl > time.time():
+                self.cache_hits += 1
+                return entry[1]
+
+            flight = self.in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self.in_flight[key] = SearchFlight()
+
+        if not owner:
+            # The same keyword is being searched for another URL, wait for its results
+            if not flight.done.wait(timeout):
+                raise TimeoutError("Search of the keyword did not finish in time.")
+            if flight.error is not None:
+                raise flight.error
+            with self.lock:
+                self.cache_hits += 1
+            return flight.results
+
+        try:
+            flight.results = search()
+            self.put(key, flight.results)
+            return flight.results
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.searches_sent += 1
+                del self.in_flight[key]
+            flight.done.set()
+
+    def put(self, key, results):
+        """
+        Caches the results of a keyword and appends them to the file of the vantage point.
+
+        Args:
+            key (tuple): The keyword, the vantage point and the day.
+            results (list): The search results.
+        """
+        if self.ttl <= 0:
+            return
+
+        search_time = time.time()
+        entry = {'Keyword': key[0], 'Vantage': key[1], 'Day': key[2], 'Time': search_time, 'Results': results}
+
+        os.makedirs(self.folder, exist_ok=True)
+        with self.lock:
+            self.entries[key] = (search_time, results)
+            # One short line is appended with one write, so the processes of the run can share the file
+            with open(self.path, 'a', encoding='utf-8') as cache_file:
+                cache_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def summary(self):
+        """
+        Returns the statistics of the cache.
+
+        Returns:
+            dict: Number of searches sent and number of results taken from the cache or from another search.
+        """
+        with self.lock:
+            return {'Searches': self.searches_sent, 'Search cache hits': self.cache_hits}
+
+    def add_summary(self, summary):
+        """
+        Adds statistics of another cache (e.g. of a worker process) to the statistics of this cache.
+
+        Args:
+            summary (dict): Statistics returned by SearchCache.summary().
+        """
+        with self.lock:
+            self.searches_sent += summary['Searches']
+            self.cache_hits += summary['Search cache hits']
+
+    def print_summary(self):
+        """
+        Prints the number of sent searches and results taken from the cache.
+        """
+        summary = self.summary()
+        print(f"Search summary: {summary['Searches']} searches sent, {summary['Search cache hits']} results "
+              f"taken from the cache.")
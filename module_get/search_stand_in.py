@@ -0,0 +1,154 @@
+# Name: search_stand_in.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 23, 2024
+# Description: Local stand-in of the search engine serving canned result pages to the HTTP search backend.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import argparse  # Import argparse module for parsing command-line arguments
+import html  # Import html module for escaping the links of the result pages
+import json  # Import JSON module for loading the canned results
+import threading  # Import threading module for the request counters
+import time  # Import time module for the latency and the rate limit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Import HTTP server classes
+from urllib.parse import urlencode, urlparse, parse_qs  # Import URL functions for the queries and result links
+from module_get.pacing import TokenBucket  # Import token bucket for the rate limit of the stand-in
+
+default_port = 8089  # Port of the stand-in server
+
+
+def generated_results(query):
+    """
+    Returns results of a query without canned results, the first result is the site of the keyword.
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        list: URLs of the results.
+    """
+    keyword = query.lower().replace(' ', '')
+    return [f"https://www.{keyword}.com/", f"https://en.wikipedia.org/wiki/{keyword}",
+            f"https://www.{keyword}.org/about", f"https://news.example.com/{keyword}"]
+
+
+def result_page(results):
+    """
+    Returns a result page with the results as redirect links of the search engine (/url?q=...).
+
+    Args:
+        results (list): URLs of the results.
+
+    Returns:
+        str: HTML of the page.
+    """
+    links = ''.join(f'<div class="g"><a href="{html.escape("/url?" + urlencode({"q": result, "sa": "U"}))}">'
+                    f'{html.escape(result)}</a></div>\n' for result in results)
+    return f'<html><body>\n<a href="/search?q=next">Next</a>\n{links}</body></html>\n'
+
+
+class StandInSearchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, canned_results=None, latency=0.0, max_qps=0.0):
+        """
+        Initializes the StandInSearchServer.
+
+        Args:
+            address (tuple): Host and port to listen on.
+            canned_results (dict, optional): Result URLs keyed by the lower-case query, other queries get
+                generated results.
+            latency (float, optional): Delay of every answer in seconds. Defaults to 0.
+            max_qps (float, optional): Number of searches answered per second, searches above the rate are answered
+                with 429. 0 disables the limit. Defaults to 0.
+        """
+        super().__init__(address, StandInSearchHandler)
+        self.canned_results = {query.lower(): results for query, results in (canned_results or {}).items()}
+        self.latency = latency
+        self.bucket = TokenBucket(max_qps) if max_qps > 0 else None
+
+        self.answered = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def is_throttled(self):
+        """
+        Checks if a search exceeds the rate limit of the server.
+
+        Returns:
+            bool: True if the search must be answered with 429, otherwise False.
+        """
+        with self.lock:
+            if self.bucket is not None and self.bucket.reserve() > 0:
+                # The rejected search does not use the token
+                self.bucket.tokens += 1
+                self.throttled += 1
+                return True
+            self.answered += 1
+            return False
+
+
+class StandInSearchHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query).get('q', [''])[0]
+        if url.path != '/search' or not query:
+            self.send_error(404)
+            return
+
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+
+        if self.server.is_throttled():
+            self.send_error(429)
+            return
+
+        results = self.server.canned_results.get(query.lower(), generated_results(query))
+        body = result_page(results).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Searches are counted instead of logging every request
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the search engine for the http search backend.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Specify the address to listen on.')
+    parser.add_argument('--port', type=int, default=default_port, help='Specify the port to listen on.')
+    parser.add_argument('--results', type=str,
+                        help='Specify a JSON file with the result URLs keyed by the query. Other queries get '
+                             'generated results.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Specify the delay of every answer in seconds.')
+    parser.add_argument('--max-qps', type=float, default=0.0,
+                        help='Specify the number of searches answered per second, the others are answered with 429. '
+                             '0 disables the limit.')
+    args = parser.parse_args()
+
+    canned_results = None
+    if args.results:
+        with open(args.results, 'r', encoding='utf-8') as results_file:
+            canned_results = json.load(results_file)
+
+    server = StandInSearchServer((args.host, args.port), canned_results, args.latency, args.max_qps)
+    print(f"Search stand-in listening on http://{args.host}:{server.server_address[1]}/search")
+    start_time = time.time()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        duration = time.time() - start_time
+        print(f"Search stand-in summary: {server.answered} searches answered, {server.throttled} answered with 429, "
+              f"{server.answered / duration:.2f} searches per second.")
+
+
+if __name__ == '__main__':
+    main()
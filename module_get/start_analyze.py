@@ -6,60 +6,270 @@
 
 
 # Import necessary libraries
+import asyncio  # Import asyncio module for running tests concurrently
+from collections import deque  # Import deque for the queue of URLs waiting for the test
+from concurrent.futures import ThreadPoolExecutor  # Import ThreadPoolExecutor for running blocking tests in threads
 from datetime import datetime  # Import datetime module for datetime operations
-import os  # Import os module for operating system related functionalities
-import random  # Import random module for generating random numbers
+import socket  # Import socket module for the default name of the vantage point
 import time  # Import time module for time-related operations
 from requests.structures import CaseInsensitiveDict  # Import CaseInsensitiveDict from requests.structures module
 from module_get import analyze_web_connection, analyze_google_search, analyze_middle_box, analyze_dns  # Import
 # functions for web connection analysis
+from module_get.probe_graph import Probe, run_probe_graph, select_probes, SKIPPED  # Import probe graph for running
+# probes in parallel
+from module_get.pacing import PacingScheduler, is_throttled  # Import pacing scheduler for limiting the request rate
+from module_get.retry_queue import RetryQueue, is_rate_limited  # Import retry queue for deferring rate limited URLs
+from module_get.http_transport import HttpTransport  # Import shared HTTP transport for the HTTP based probes
+from module_get.icmp_engine import IcmpEngine  # Import shared ICMP engine for the ping probes
+from module_get.search_cache import SearchCache, search_cache_folder  # Import search cache for sharing the search
+# results of the keywords
+from module_get.probe_memo import ProbeMemo, memoized  # Import probe memo for sharing the IP level probe results
 from utils import reformat_url, ip_address_operations  # Import reformat_url function from the utils module
+from utils.deadline import Deadline  # Import Deadline class for limiting the time of the test of a URL
+from utils.result_values import NOT_RUN  # Import value recorded for probes which were not run
+from utils.result_log import to_record  # Import to_record function for reading the results of the first phase
 
+default_url_budget = 300  # Maximum time of the test of one URL in seconds
 
-def timeout():
+
+def print_run_summary(url_count, duration):
+    """
+    Prints a summary of the run with the achieved throughput.
+
+    Args:
+        url_count (int): Number of tested URLs.
+        duration (float): Duration of the run in seconds.
+    """
+    urls_per_second = url_count / duration if duration > 0 else 0.0
+    print(f"Run summary: {url_count} URLs tested in {round(duration, 2)} s ({round(urls_per_second, 4)} URLs/s).")
+
+
+def select_ip_address(dns_result, ip_type, pacer):
+    """
+    Selects the IP address used by the network probes from the DNS result and waits until the IP address
+    may be tested.
+
+    Args:
+        dns_result (tuple): Result of the DNS lookup.
+        ip_type (str): Preferred Ip address (IPv4 or IPv6)
+        pacer (PacingScheduler): Scheduler limiting the request rate.
+
+    Returns:
+        str: Selected IP address, or SKIPPED if the DNS lookup failed and no other probe should run.
+    """
+    if dns_result[0] != "OK":
+        return SKIPPED
+
+    ip_address = ip_address_operations.get_ip_address(dns_result[1], ip_type)
+    pacer.wait(None, ip_address=ip_address)
+    return ip_address
+
+
+def tcp_handshake(ip_address, deadline):
+    """
+    Performs a TCP handshake with the HTTP port of the IP address.
+
+    Args:
+        ip_address (str): The IP address to connect to.
+        deadline (Deadline): Deadline of the test of the URL.
+
+    Returns:
+        tuple: Result of the TCP handshake.
+    """
+    return analyze_web_connection.tcp_handshake(ip_address, deadline=deadline)
+
+
+def trace_if_ping_failed(ip_address, ping_result, icmp_engine, deadline):
+    """
+    Performs a traceroute only if the ping test did not succeed.
+
+    Args:
+        ip_address (str): The IP address to trace the route to.
+        ping_result (tuple): Result of the ping test.
+        icmp_engine (IcmpEngine): Shared ICMP engine of the run.
+        deadline (Deadline): Deadline of the test of the URL.
+
+    Returns:
+        list or str: Result of the traceroute, or 'N/A' if the ping test succeeded.
+    """
+    if ping_result[0] != "OK":
+        return analyze_web_connection.perform_trace(ip_address, icmp_engine, deadline)
+    return "N/A"
+
+
+def trace_key(ip_address, ping_result, *args):
+    """
+    Returns the key of a shared trace result, the trace of an IP address depends on the result of its ping.
+    """
+    return ip_address, ping_result[0]
+
+
+def certificate_key(ip_address, address, *args):
+    """
+    Returns the key of a shared certificate, the certificate depends on the IP address and the server name.
+    """
+    return ip_address, reformat_url.extract_domain(address)
+
+
+# Probes performed for every website. Each probe starts as soon as the values it depends on are known, the probes
+# testing only the address wait for a successful DNS lookup. Every probe gets the deadline of the test of the URL
+# and limits its own blocking operations by it. The certificate probe waits for the HTTP probe, which captures
+# the certificate of its HTTPS connection. The results of the IP level probes are shared by the URLs resolving
+# to the same IP address. Both middle box probes are evaluated from one pipelined exchange of crafted requests.
+WEBSITE_PROBES = [
+    Probe('dns', ['address', 'ip_type', 'dns_cache', 'deadline'], analyze_web_connection.dns_lookup),
+    Probe('ip_address', ['dns', 'ip_type', 'pacer'], select_ip_address),
+    Probe('tcp', ['probe_memo', 'shared_probes', 'ip_address', 'deadline'],
+          memoized('tcp', tcp_handshake)),
+    Probe('ping', ['probe_memo', 'shared_probes', 'ip_address', 'icmp_engine', 'deadline'],
+          memoized('ping', analyze_web_connection.ping_test)),
+    Probe('trace', ['probe_memo', 'shared_probes', 'ip_address', 'ping', 'icmp_engine', 'deadline'],
+          memoized('trace', trace_if_ping_failed, key=trace_key)),
+    Probe('http', ['address', 'ip_type', 'transport', 'deadline'], analyze_web_connection.http_get_request,
+          after=['ip_address']),
+    Probe('certificate', ['probe_memo', 'shared_probes', 'ip_address', 'address', 'transport', 'deadline'],
+          memoized('certificate', analyze_web_connection.get_https_certificate, key=certificate_key), after=['http']),
+    Probe('middle_box', ['address', 'ip_address', 'deadline'], analyze_middle_box.pipelined_exchange),
+    Probe('middle_box_header', ['middle_box'], analyze_middle_box.http_header_manipulation),
+    Probe('middle_box_invalid_request', ['middle_box'], analyze_middle_box.invalid_request_line),
+    Probe('dns_repeated_query', ['address', 'dns_cache', 'deadline'], analyze_dns.detect_dns_repeated_query,
+          after=['ip_address']),
+    Probe('dns_hijacking', ['address', 'dns_cache', 'deadline'], analyze_dns.detect_dns_hijacking,
+          after=['ip_address']),
+    Probe('search', ['address', 'search_cache', 'deadline'], analyze_google_search.is_domain_in_results,
+          after=['ip_address']),
+]
+
+# Tests which can be selected for a run and the probes performing them. The DNS lookup is always performed,
+# the other probes wait for the IP address.
+PROBE_REGISTRY = {
+    'dns': ['dns', 'ip_address'],
+    'tcp': ['tcp'],
+    'ping': ['ping'],
+    'trace': ['trace'],
+    'http': ['http'],
+    'certificate': ['certificate'],
+    'middle_box': ['middle_box', 'middle_box_header', 'middle_box_invalid_request'],
+    'dns_manipulation': ['dns_repeated_query', 'dns_hijacking'],
+    'search': ['search'],
+}
+
+# Named sets of tests, e.g. the fast profile for rechecking the connectivity only
+PROBE_PROFILES = {
+    'fast': ['dns', 'tcp', 'http'],
+    'network': ['dns', 'tcp', 'ping', 'trace', 'http', 'certificate'],
+    'full': list(PROBE_REGISTRY),
+}
+default_profile = 'full'
+
+
+def select_website_probes(tests):
     """
-    Simulates a timeout by waiting for a random amount of time between 25 and 70 seconds.
+    Selects the probes performing the tests, together with the probes they depend on.
+
+    Args:
+        tests (iterable): Names of the tests (keys of PROBE_REGISTRY).
+
+    Returns:
+        list: Selected Probe objects of WEBSITE_PROBES.
+
+    Raises:
+        ValueError: If a test is not known.
     """
+    unknown = [test for test in tests if test not in PROBE_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown probes: {', '.join(unknown)}. Known probes: {', '.join(PROBE_REGISTRY)}.")
 
-    # Generate a random timeout value between 25 and 70 seconds
-    timeout_random = random.randint(25, 70)
+    names = list(PROBE_REGISTRY['dns'])
+    for test in tests:
+        names.extend(PROBE_REGISTRY[test])
+    return select_probes(WEBSITE_PROBES, names)
 
-    # Wait for the randomly generated timeout
-    time.sleep(timeout_random)
+
+def first_phase_values(record):
+    """
+    Returns the probe values measured by the first phase of a two-phase run, which are not measured again.
+    The TCP and HTTP probes are recorded as not run and their fields are taken from the first phase record,
+    the DNS answer is reused unless the lookup failed.
+
+    Args:
+        record (dict): Record of the URL from the first phase.
+
+    Returns:
+        dict: Probe values keyed by the name of the probe.
+    """
+    values = {name: NOT_RUN for test in PROBE_PROFILES['fast'] for name in PROBE_REGISTRY[test]
+              if name not in PROBE_REGISTRY['dns']}
+    if record.get('DNS Status') == "OK":
+        values['dns'] = (record['DNS Status'], record['DNS IPs'])
+    return values
+
+
+def not_run_items(count):
+    """
+    Returns the items of the result of a probe which was not run.
+    """
+    return (NOT_RUN,) * count
 
 
 class WebConnectivityTester:
-    def __init__(self, url_list, output_content_folder, ip_type):
+    def __init__(self, url_list, content_store, ip_type, pacer=None, retry_queue=None, journal=None,
+                 url_budget=default_url_budget, transport=None, icmp_engine=None, probe_memo=None,
+                 search_cache=None, tests=None, first_phase=None):
         """
         Initializes the WebConnectivityTester.
 
         Args:
             url_list (list): List of URLs to test.
-            output_content_folder (str): Folder where HTML content will be saved.
+            content_store (ContentStore): Store where HTML content will be saved.
             ip_type (str): Preferred Ip address (IPv4 or IPv6)
+            pacer (PacingScheduler, optional): Scheduler limiting the request rate. Share one scheduler between
+                testers of the same run, otherwise a scheduler with the default limits is created.
+            retry_queue (RetryQueue, optional): Queue of URLs deferred because of 429 errors. Share one queue
+                between testers of the same run to keep the deferred domains and the retry statistics of the run.
+            journal (RunJournal, optional): Journal where the results of every finished URL are recorded.
+            url_budget (float, optional): Maximum time of the test of one URL in seconds, no probe runs longer.
+                Defaults to 300 seconds.
+            transport (HttpTransport, optional): HTTP transport keeping the connections of the HTTP probes alive.
+                Its DNS cache is used by all probes. Share one transport between testers of the same run,
+                otherwise a transport with the default pool size and a new DNS cache is created.
+            icmp_engine (IcmpEngine, optional): ICMP engine with the raw sockets of the ping probes. Share one
+                engine between testers of the same run, otherwise an engine with the default settings is created.
+            probe_memo (ProbeMemo, optional): Memo sharing the results of the IP level probes (TCP, ping, trace
+                and certificate) between URLs. Share one memo between testers of the same run, otherwise a memo
+                of the tester is created.
+            search_cache (SearchCache, optional): Cache of the search results shared by the URLs of the same site.
+                Share one cache between testers of the same run, otherwise the tester only shares the searches
+                running at the same time.
+            tests (list, optional): Names of the tests performed for every website (keys of PROBE_REGISTRY),
+                the results of the other tests are recorded as not run. Defaults to all tests.
+            first_phase (RunJournal, optional): Journal of the first phase of a two-phase run. The probes of the fast
+                profile are not repeated for the URLs recorded there, their results are merged into the record.
         """
         self.urls = url_list
-        self.output_content_folder = output_content_folder
+        self.content_store = content_store
         self.ip_type = ip_type
-
-    def save_html_content(self, filename, content):
-        """
-        Saves HTML content to a file.
-
-        Args:
-            filename (str): Name of the output file.
-            content (str): HTML content to save.
-        """
-        # Create the output folder if it doesn't exist
-        os.makedirs(self.output_content_folder, exist_ok=True)
-
-        with open(os.path.join(self.output_content_folder, filename), 'w', encoding='utf-8') as content_file:
-            content_file.write(content)
+        self.pacer = pacer if pacer is not None else PacingScheduler()
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue()
+        self.journal = journal
+        self.url_budget = url_budget
+        self.transport = transport if transport is not None else HttpTransport()
+        self.icmp_engine = icmp_engine if icmp_engine is not None else IcmpEngine()
+        self.probe_memo = probe_memo if probe_memo is not None else ProbeMemo()
+        self.search_cache = search_cache if search_cache is not None \
+            else SearchCache(search_cache_folder, socket.gethostname(), ttl=0)
+        self.probes = select_website_probes(tests) if tests is not None else WEBSITE_PROBES
+        self.first_phase = first_phase
+        self.in_flight = 0
 
     def test_website(self, address):
         """
         Tests a website for connectivity.
 
+        'Content Length' and 'Content Hash' describe the whole body as it was received. 'HTML Content' is the hash
+        of the stored content, which is only the first `max_body_size` bytes of a longer body: the two hashes
+        are the same unless 'Content Truncated' is True, which is also recorded in the index of the content store.
+
         Args:
             address (str): The website URL to test.
 
@@ -69,38 +279,53 @@ class WebConnectivityTester:
         print(f"Testing {address}...")
         try:
             start_time = time.time()
-            dns_result = analyze_web_connection.dns_lookup(address, self.ip_type)
-
-            if dns_result[0] == "OK":
-                ip_address = ip_address_operations.get_ip_address(dns_result[1], self.ip_type)
-                tcp_result = analyze_web_connection.tcp_handshake(ip_address)
-                ping_result = analyze_web_connection.ping_test(ip_address)
-
-                if ping_result[0] != "OK":
-                    trace_hop = analyze_web_connection.perform_trace(ip_address)
-                else:
-                    trace_hop = "N/A"
+            initial_values = {'address': address, 'ip_type': self.ip_type, 'pacer': self.pacer,
+                              'transport': self.transport, 'dns_cache': self.transport.dns_cache,
+                              'icmp_engine': self.icmp_engine, 'probe_memo': self.probe_memo,
+                              'shared_probes': [], 'search_cache': self.search_cache,
+                              'deadline': Deadline(self.url_budget)}
 
-                redirect = analyze_web_connection.detect_redirect(address, self.ip_type)
+            # The probes measured by the first phase are not run again
+            first_phase_results = self.first_phase.get_url_results(address) if self.first_phase is not None \
+                else None
+            first_phase_record = to_record(first_phase_results) if first_phase_results else None
+            if first_phase_record is not None:
+                initial_values.update(first_phase_values(first_phase_record))
+            probes = [probe for probe in self.probes if probe.name not in initial_values]
 
-                http_status, content_length, headers, html_content = analyze_web_connection.http_get_request(address)
-                certificate = analyze_web_connection.get_https_certificate(ip_address, address)
+            probe_results = run_probe_graph(probes, initial_values)
+            # Probes which were not selected are recorded explicitly
+            for probe in WEBSITE_PROBES:
+                probe_results.setdefault(probe.name, NOT_RUN)
 
-                middle_box_header = analyze_middle_box.http_header_manipulation(address)
-                middle_box_invalid_request = analyze_middle_box.invalid_request_line(address)
-
-                dns_manipulation1 = analyze_dns.detect_dns_repeated_query(address)
-                dns_manipulation2 = analyze_dns.detect_dns_hijacking(address)
-
-                search_results = analyze_google_search.is_domain_in_results(address)
+            if probe_results['ip_address'] is not SKIPPED:
+                dns_result = probe_results['dns']
+                tcp_result = probe_results['tcp'] if probe_results['tcp'] is not NOT_RUN else not_run_items(2)
+                ping_result = probe_results['ping'] if probe_results['ping'] is not NOT_RUN else not_run_items(3)
+                http_probe_result = probe_results['http'] if probe_results['http'] is not NOT_RUN \
+                    else (not_run_items(3), not_run_items(3), not_run_items(5), NOT_RUN)
+                redirect, http_result, body, redirect_chain = http_probe_result
+                http_status, headers, http_connection = http_result
+                html_content, content_length, content_hash, content_charset, content_truncated = body
+                certificate = probe_results['certificate'] if probe_results['certificate'] is not NOT_RUN \
+                    else not_run_items(2)
+                middle_box = probe_results['middle_box']
 
                 end_time = time.time()
 
                 duration = round(end_time - start_time, 2)
-                output_content = reformat_url.extract_domain(address) + '_content.html'
-                self.save_html_content(output_content, html_content)
+                # The stored content is referenced by its hash, a truncated content has another hash than the body
+                output_content = "N/A"
+                if isinstance(html_content, bytes):
+                    output_content = self.content_store.save(address, html_content, content_truncated is True)
+
+                # The exact bytes of the middle box responses are stored in the same way
+                middle_box_responses = middle_box_content = "N/A" if middle_box is not NOT_RUN else NOT_RUN
+                if isinstance(middle_box, list):
+                    middle_box_responses = [response.to_record() for response in middle_box]
+                    middle_box_content = self.content_store.put(b''.join(response.data for response in middle_box))
 
-                return CaseInsensitiveDict({
+                record = CaseInsensitiveDict({
                     'Time': duration,
                     'URL': str(address),
                     'DNS Status': dns_result[0],
@@ -109,24 +334,40 @@ class WebConnectivityTester:
                     'TCP Remote IP': tcp_result[1],
                     'PING Status': ping_result[0],
                     'PING IP': ping_result[1],
-                    'Trace hop IP': trace_hop,
+                    'PING Statistics': ping_result[2],
+                    'Trace hop IP': probe_results['trace'],
+                    'Shared Probes': probe_results['shared_probes'],
                     'Redirected Status': redirect[0],
                     'Redirected Location': redirect[1],
                     'Redirected Location IPs': redirect[2],
+                    'Redirect Chain': redirect_chain,
                     'HTTP Status': http_status,
                     'Content Length': content_length,
+                    'Content Hash': content_hash,
+                    'Content Charset': content_charset,
+                    'Content Truncated': content_truncated,
                     'Headers': headers,
+                    'HTTP Connection': http_connection,
                     'HTML Content': output_content,
                     'Cert Status': certificate[0],
                     'Cert Content': certificate[1],
-                    'Middle box - header manipulation test': middle_box_header,
-                    'Middle box - invalid request line': middle_box_invalid_request,
-                    'DNS manipulation - repeated query': dns_manipulation1,
-                    'DNS manipulation - hijacking detect': dns_manipulation2,
-                    'Is domain in G search': search_results,
+                    'Middle box - header manipulation test': probe_results['middle_box_header'],
+                    'Middle box - invalid request line': probe_results['middle_box_invalid_request'],
+                    'Middle box - responses': middle_box_responses,
+                    'Middle box - response content': middle_box_content,
+                    'DNS manipulation - repeated query': probe_results['dns_repeated_query'],
+                    'DNS manipulation - hijacking detect': probe_results['dns_hijacking'],
+                    'Is domain in G search': probe_results['search'],
                     'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 })
 
+                # The fields of the probes which were not run again come from the first phase
+                if first_phase_record is not None:
+                    for key, value in first_phase_record.items():
+                        if record.get(key) == NOT_RUN:
+                            record[key] = value
+                return record
+
         except Exception as e:
             print(f"Error testing {address}: {e}")
             return {
@@ -134,35 +375,158 @@ class WebConnectivityTester:
                 'Error': str(e)
             }
 
-    def run_tests(self):
+    def next_url(self, pending):
         """
-        Runs connectivity tests for all specified URLs.
+        Takes the next URL to test. Deferred URLs ready for the retry go first, URLs of a deferred domain
+        are put aside until the domain may be tested again.
+
+        Args:
+            pending (deque): Positions and URLs not tested yet.
+
+        Returns:
+            tuple: Position, website and number of retries of the URL, or None if no URL may be tested now.
+        """
+        while True:
+            item = self.retry_queue.pop_ready()
+            if item is None:
+                if not pending:
+                    return None
+                position, website = pending.popleft()
+                item = (position, website, 0)
+
+            position, website, attempt = item
+            domain = reformat_url.extract_domain(website)
+            if self.retry_queue.is_domain_ready(domain):
+                return item
+            self.retry_queue.postpone(position, website, domain, attempt)
+
+    def finish_url(self, position, website, attempt, result):
+        """
+        Handles the result of a test. A URL rate limited with 429 error is deferred for a retry.
+
+        Args:
+            position (int): Position of the URL in the URL list.
+            website (str): The website URL.
+            attempt (int): Number of retries of the URL so far.
+            result (dict): Result of the test, or None if the test did not give a result.
+
+        Returns:
+            list: Results recorded for the URL (the first item is a placeholder with the URL only),
+            or None if the URL was deferred.
+        """
+        domain = reformat_url.extract_domain(website)
+        self.pacer.report(domain, is_throttled(result))
+
+        url_results = [{'URL': str(website)}]
+        if is_rate_limited(result):
+            if self.retry_queue.defer(position, website, domain, attempt):
+                return None
+            print("Failed to test website after multiple retries.")
+        elif result is not None:
+            url_results.append(result)
+        else:
+            # Handle the case where result is None
+            print(f"Failed to get a result for {website}, skipping...")
+
+        if self.journal is not None:
+            self.journal.record_url(website, url_results)
+        return url_results
+
+    def run_tests(self, on_result=None):
+        """
+        Runs connectivity tests for all specified URLs. URLs deferred because of 429 errors wait in the retry queue
+        while the other URLs are tested, the run waits for them only when no other URL is left.
+
+        Args:
+            on_result (callable, optional): Function called with the position and results of each finished URL.
 
         Returns:
             list: A list of dictionaries containing test results.
         """
-        results = []
-
-        timeout()
-
-        for website in self.urls:
-            timeout()
-            results.append({'URL': str(website)})
-            retry_count = 0
-            while retry_count < 6:  # Retry for a maximum of 5 times
-                result = self.test_website(website)
-                # Check if result is not None before proceeding
-                if result is not None and '429' in str(result.get('Error', '')):  # If 429 error occurred
-                    retry_count += 1
-                    print(f"Received 429 error, retrying in {5 ** retry_count} seconds...")
-                    time.sleep(5 ** retry_count)  # Exponential backoff
-                elif result is not None:
-                    results.append(result)
-                    break
-                else:
-                    # Handle the case where result is None
-                    print(f"Failed to get a result for {website}, skipping...")
-                    break
-            else:
-                print("Failed to test website after multiple retries.")
-        return results
+        pending = deque(enumerate(self.urls))
+        url_results = {}
+
+        while pending or len(self.retry_queue):
+            item = self.next_url(pending)
+            if item is None:
+                # Only deferred URLs are left, wait for the first of them
+                time.sleep(self.retry_queue.time_to_next() or 0)
+                continue
+
+            position, website, attempt = item
+            self.pacer.wait(reformat_url.extract_domain(website))
+            results = self.finish_url(position, website, attempt, self.test_website(website))
+            if results is not None:
+                url_results[position] = results
+                if on_result is not None:
+                    on_result(position, results)
+
+        return [result for position in sorted(url_results) for result in url_results[position]]
+
+    async def run_url_worker(self, pending, url_results, on_result):
+        """
+        Tests URLs one after another in a worker thread until no URL is left.
+
+        Args:
+            pending (deque): Positions and URLs not tested yet.
+            url_results (dict): Results of the finished URLs keyed by their position.
+            on_result (callable): Function called with the position and results of the URL, or None.
+        """
+        while pending or len(self.retry_queue) or self.in_flight:
+            item = self.next_url(pending)
+            if item is None:
+                # Wait for a deferred URL, or for the URLs in flight which may still be deferred
+                time_to_next = self.retry_queue.time_to_next()
+                await asyncio.sleep(min(time_to_next, 1) if time_to_next is not None else 1)
+                continue
+
+            position, website, attempt = item
+            self.in_flight += 1
+            try:
+                await self.pacer.wait_async(reformat_url.extract_domain(website))
+                result = await asyncio.to_thread(self.test_website, website)
+                results = self.finish_url(position, website, attempt, result)
+            finally:
+                self.in_flight -= 1
+
+            if results is not None:
+                url_results[position] = results
+                if on_result is not None:
+                    on_result(position, results)
+
+    async def run_tests_async(self, concurrency, on_result=None):
+        """
+        Runs connectivity tests for all specified URLs with at most `concurrency` URLs in flight.
+
+        Args:
+            concurrency (int): Maximum number of URLs tested at the same time.
+            on_result (callable, optional): Function called with the position and results of each finished URL.
+
+        Returns:
+            list: A list with the results of each URL, in the order of the URL list.
+        """
+        # Every URL in flight needs its own thread for the blocking probes
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+
+        pending = deque(enumerate(self.urls))
+        url_results = {}
+        await asyncio.gather(*[self.run_url_worker(pending, url_results, on_result) for _ in range(concurrency)])
+
+        return [url_results[position] for position in sorted(url_results)]
+
+    def run_tests_concurrently(self, concurrency, on_result=None):
+        """
+        Runs connectivity tests for all specified URLs concurrently and prints the run summary.
+
+        Args:
+            concurrency (int): Maximum number of URLs tested at the same time.
+            on_result (callable, optional): Function called with the position and results of each finished URL.
+
+        Returns:
+            list: A list with the results of each URL, in the order of the URL list.
+        """
+        start_time = time.time()
+        url_results = asyncio.run(self.run_tests_async(concurrency, on_result))
+        print_run_summary(len(self.urls), time.time() - start_time)
+        self.retry_queue.print_summary()
+        return url_results
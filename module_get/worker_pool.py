@@ -0,0 +1,162 @@
+# Name: worker_pool.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 10, 2024
+# Description: Testing groups of URLs in a pool of worker processes.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import multiprocessing  # Import multiprocessing module for the start method and sharing the worker counter
+from concurrent.futures import ProcessPoolExecutor, as_completed  # Import tools for running tests in processes
+import os  # Import os module for operating system related functionalities
+import socket  # Import socket module for the default name of the vantage point
+from module_get import start_analyze  # Import start_analyze module for testing the URLs
+from module_get.http_transport import HttpTransport  # Import shared HTTP transport for the HTTP based probes
+from module_get.icmp_engine import IcmpEngine  # Import shared ICMP engine for the ping probes
+from module_get.probe_memo import ProbeMemo  # Import probe memo for sharing the IP level probe results
+from module_get.search_cache import SearchCache, search_cache_folder  # Import search cache for sharing the search
+# results of the keywords
+from module_get.search_backends import set_search_backend  # Import set_search_backend for the search probe
+from module_get.pacing import PacingScheduler  # Import pacing scheduler for limiting the request rate
+from module_get.retry_queue import RetryQueue  # Import retry queue for deferring rate limited URLs
+from utils import ip_address_operations  # Import ip_address_operations for assigning ICMP identifiers
+from utils.journal import RunJournal  # Import journal for recording the finished URLs
+
+worker_state = {}  # Tester settings and shared objects of the current worker process
+
+
+def init_worker(worker_counter, workers, content_store, ip_type, pacing, concurrency, journal_path,
+                url_budget, transport, icmp_engine, probe_memo, search_cache, search_backend, tests,
+                first_phase_path):
+    """
+    Initializes a worker process. Every worker gets its own range of ICMP identifiers and its own part
+    of the global request rate.
+
+    Args:
+        worker_counter (multiprocessing.Value): Counter used for numbering the workers.
+        workers (int): Number of worker processes.
+        content_store (ContentStore): Store where HTML content will be saved.
+        ip_type (str): Preferred Ip address (IPv4 or IPv6)
+        pacing (tuple): Global, per-host and per-IP number of tests started per second and the jitter.
+        concurrency (int): Number of URLs tested at the same time by one worker, or None.
+        journal_path (str): Folder of the journal of the run, or None.
+        url_budget (float): Maximum time of the test of one URL in seconds.
+        transport (HttpTransport): HTTP transport of the run, the worker gets its own transport and DNS cache
+            with the same settings, or None for the defaults.
+        icmp_engine (IcmpEngine): ICMP engine of the run, the worker gets its own engine and raw sockets
+            with the same settings, or None for the defaults.
+        probe_memo (ProbeMemo): Memo of the IP level probe results of the run, the worker gets its own memo
+            with the same freshness, or None for the default.
+        search_cache (SearchCache): Search cache of the run, the worker loads its own cache from the same file,
+            or None for no persistent cache.
+        search_backend (SearchBackend): Search backend of the run, the worker gets its own backend with the same
+            settings, or None for the Google search backend.
+        tests (list): Names of the tests performed for every website, or None for all tests.
+        first_phase_path (str): Folder of the journal of the first phase of a two-phase run, or None.
+    """
+    with worker_counter.get_lock():
+        worker_index = worker_counter.value
+        worker_counter.value += 1
+
+    # Split the 16-bit ICMP identifier space between the workers
+    identifier_count = 0x10000 // workers
+    ip_address_operations.set_icmp_identifier_space(worker_index * identifier_count, identifier_count)
+
+    qps, host_qps, ip_qps, jitter = pacing
+    worker_state['content_store'] = content_store
+    worker_state['ip_type'] = ip_type
+    worker_state['concurrency'] = concurrency
+    worker_state['url_budget'] = url_budget
+    worker_state['tests'] = tests
+    worker_state['pacer'] = PacingScheduler(qps / workers, host_qps, ip_qps, jitter)
+    worker_state['retry_queue'] = RetryQueue()
+    worker_state['journal'] = RunJournal(journal_path) if journal_path is not None else None
+    worker_state['first_phase'] = RunJournal(first_phase_path) if first_phase_path is not None else None
+    worker_state['transport'] = transport if transport is not None else HttpTransport()
+    worker_state['icmp_engine'] = icmp_engine if icmp_engine is not None else IcmpEngine()
+    worker_state['probe_memo'] = probe_memo if probe_memo is not None else ProbeMemo()
+    worker_state['search_cache'] = search_cache if search_cache is not None \
+        else SearchCache(search_cache_folder, socket.gethostname(), ttl=0)
+    if search_backend is not None:
+        set_search_backend(search_backend)
+
+
+def test_batch(batch_item):
+    """
+    Tests one group of URLs in the worker process.
+
+    Args:
+        batch_item (tuple): Index of the first URL of the group in the input file and the list of URLs.
+
+    Returns:
+        tuple: Index of the group, list of test results, process ID of the worker and its retry and DNS statistics.
+    """
+    batch_index, batch = batch_item
+
+    tester = start_analyze.WebConnectivityTester(batch, worker_state['content_store'],
+                                                 worker_state['ip_type'], worker_state['pacer'],
+                                                 worker_state['retry_queue'], worker_state['journal'],
+                                                 worker_state['url_budget'], worker_state['transport'],
+                                                 worker_state['icmp_engine'], worker_state['probe_memo'],
+                                                 worker_state['search_cache'], worker_state['tests'],
+                                                 worker_state['first_phase'])
+    if worker_state['concurrency']:
+        url_results = tester.run_tests_concurrently(worker_state['concurrency'])
+        results = [result for results_of_url in url_results for result in results_of_url]
+    else:
+        results = tester.run_tests()
+
+    summary = {**worker_state['retry_queue'].summary(), **worker_state['transport'].dns_cache.summary(),
+               **worker_state['probe_memo'].summary(), **worker_state['search_cache'].summary()}
+    return batch_index, results, os.getpid(), summary
+
+
+def run_batches_in_workers(batches, workers, content_store, ip_type, pacing, concurrency=None,
+                           journal_path=None, url_budget=start_analyze.default_url_budget,
+                           transport=None, icmp_engine=None, probe_memo=None, search_cache=None,
+                           search_backend=None, tests=None, first_phase_path=None):
+    """
+    Tests groups of URLs in a pool of worker processes. The results are yielded as soon as a group is finished,
+    not in the order of the groups.
+
+    Args:
+        batches (list): List of tuples with the index of the first URL of the group and the list of URLs.
+        workers (int): Number of worker processes.
+        content_store (ContentStore): Store where HTML content will be saved.
+        ip_type (str): Preferred Ip address (IPv4 or IPv6)
+        pacing (tuple): Global, per-host and per-IP number of tests started per second and the jitter.
+        concurrency (int, optional): Number of URLs tested at the same time by one worker.
+        journal_path (str, optional): Folder of the journal of the run.
+        url_budget (float, optional): Maximum time of the test of one URL in seconds. Defaults to 300 seconds.
+        transport (HttpTransport, optional): HTTP transport of the run, every worker gets its own transport
+            and DNS cache with the same settings. Defaults to a transport with the default settings.
+        icmp_engine (IcmpEngine, optional): ICMP engine of the run, every worker gets its own engine with
+            the same settings. Defaults to an engine with the default settings.
+        probe_memo (ProbeMemo, optional): Memo of the IP level probe results of the run, every worker gets its own
+            memo with the same freshness. Defaults to a memo with the default freshness.
+        search_cache (SearchCache, optional): Search cache of the run, every worker loads its own cache from
+            the same file. Defaults to no persistent cache.
+        search_backend (SearchBackend, optional): Search backend of the run, every worker gets its own backend
+            with the same settings. Defaults to the Google search backend.
+        tests (list, optional): Names of the tests performed for every website. Defaults to all tests.
+        first_phase_path (str, optional): Folder of the journal of the first phase of a two-phase run, the probes
+            of the fast profile are not repeated for the URLs recorded there.
+
+    Yields:
+        tuple: Index of the group, list of test results, process ID of the worker and its retry and DNS statistics.
+    """
+    # The workers are spawned, not forked: the shared objects of the run are pickled for every worker, so each
+    # worker builds its own sockets, sessions, logs and statistics, and no thread of the run (e.g. the uploader)
+    # is forked in an unknown state
+    context = multiprocessing.get_context('spawn')
+    worker_counter = context.Value('i', 0)
+
+    # A crashed worker breaks the executor instead of leaving the run waiting forever
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                             initargs=(worker_counter, workers, content_store, ip_type, pacing,
+                                       concurrency, journal_path, url_budget, transport,
+                                       icmp_engine, probe_memo, search_cache, search_backend,
+                                       tests, first_phase_path)) as executor:
+        futures = [executor.submit(test_batch, batch_item) for batch_item in batches]
+        for future in as_completed(futures):
+            yield future.result()
@@ -7,6 +7,7 @@
 
 # Import necessary libraries
 import json  # Module for working with JSON data
+from utils.result_values import NOT_RUN  # Value recorded for probes which were not run
 
 
 def count_keys_with_no_results(data1, data2):
@@ -34,7 +35,8 @@ def count_keys_with_no_results(data1, data2):
 
 def filter_details(details, ignore_keys):
     """
-    Filter details dictionary by ignoring specified keys.
+    Filter details dictionary by ignoring specified keys. The keys are ignored also in lists of dictionaries
+    (e.g. in every hop of the redirect chain).
 
     Args:
         details (dict): Details dictionary to filter.
@@ -43,7 +45,12 @@ def filter_details(details, ignore_keys):
     Returns:
         dict: Filtered details dictionary.
     """
-    return {key: value for key, value in details.items() if key not in ignore_keys}
+    def filter_value(value):
+        if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+            return [filter_details(item, ignore_keys) for item in value]
+        return value
+
+    return {key: filter_value(value) for key, value in details.items() if key not in ignore_keys}
 
 
 def compare_headers(headers1, headers2, ignore_header_items):
@@ -97,7 +104,8 @@ def compare_files(data1, data2, ignore_keys=None, ignore_header_items=None):
         tuple: Differences between datasets, count of sites with differences, count of sites without differences.
     """
     if ignore_keys is None:
-        ignore_keys = ['Time', 'Timestamp', 'HTML Content']
+        ignore_keys = ['Time', 'Timestamp', 'HTML Content', 'HTTP Connection', 'PING Statistics', 'Shared Probes',
+                       'Middle box - response content']
     if ignore_header_items is None:
         ignore_header_items = []
 
@@ -114,7 +122,8 @@ def compare_files(data1, data2, ignore_keys=None, ignore_header_items=None):
             details2_filtered = filter_details(details2, ignore_keys)
 
             headers_differences = {}
-            if 'Headers' in details1_filtered and 'Headers' in details2_filtered:
+            if 'Headers' in details1_filtered and 'Headers' in details2_filtered \
+                    and NOT_RUN not in (details1_filtered['Headers'], details2_filtered['Headers']):
                 headers1 = details1_filtered['Headers']
                 headers2 = details2_filtered['Headers']
                 if not isinstance(headers1, dict):
@@ -122,11 +131,13 @@ def compare_files(data1, data2, ignore_keys=None, ignore_header_items=None):
 
                 headers_differences = compare_headers(headers1, headers2, ignore_header_items)
 
-            # Compare the remaining keys
+            # Compare the remaining keys, results of probes not run in one of the runs are not compared
             key_differences = False
             for key in details1_filtered:
                 if key == 'Headers' or key not in details2_filtered:
                     continue
+                if NOT_RUN in (details1_filtered[key], details2_filtered[key]):
+                    continue
                 if details1_filtered[key] != details2_filtered[key]:
                     if url not in differences:
                         differences[url] = {}
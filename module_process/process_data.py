@@ -11,6 +11,7 @@ import json  # Module for working with JSON data
 import re  # Module for regular expressions
 
 from module_process import compare_data, define_censorship, geolocation, statistics  # Custom modules for data processing
+from utils import result_log  # Module for reading the result log
 
 
 def match_filename(filename1, filename2):
@@ -43,6 +44,44 @@ def match_filename(filename1, filename2):
     return False
 
 
+def process_two_logs(folder1, folder2):
+    """
+    Processes two folders containing result log segments. The records of the first folder are read one after
+    another, the matching record of the second folder is looked up in the index of its segments.
+
+    Args:
+        folder1 (str): Path to the first folder.
+        folder2 (str): Path to the second folder.
+
+    Returns:
+        tuple: A tuple containing diffs dictionary, total count of different keys, total count of same keys,
+               and total count of failed address records.
+    """
+    diff_log = {}
+    different_keys_count_total = 0
+    same_keys_count_total = 0
+    fail_address_records_total = 0
+
+    log2 = result_log.ResultLogReader(folder2)
+
+    for url, record1 in result_log.ResultLogReader(folder1):
+        record2 = log2.get(url)
+        if record2 is None:
+            continue
+
+        json_data1 = {url: record1}
+        json_data2 = {url: record2}
+
+        fail_address_records_total += compare_data.count_keys_with_no_results(json_data1, json_data2)
+
+        diff_single, different_keys_count, same_keys_count = compare_data.compare_files(json_data1, json_data2)
+        diff_log.update(diff_single)
+        different_keys_count_total += different_keys_count
+        same_keys_count_total += same_keys_count
+
+    return {'results_log': diff_log}, different_keys_count_total, same_keys_count_total, fail_address_records_total
+
+
 def process_two_files(folder1, folder2):
     """
     Processes two folders containing JSON files.
@@ -93,8 +132,12 @@ def run_processing_data(folder1, folder2):
     """
     # Find differences in each test
     print("Finding differences in each test.")
-    diffs, different_keys_count_total, same_keys_count_total, fail_address_records_total = process_two_files(folder1,
-                                                                                                             folder2)
+    if result_log.has_segments(folder1) and result_log.has_segments(folder2):
+        diffs, different_keys_count_total, same_keys_count_total, fail_address_records_total = process_two_logs(
+            folder1, folder2)
+    else:
+        diffs, different_keys_count_total, same_keys_count_total, fail_address_records_total = process_two_files(
+            folder1, folder2)
 
     # Save differences to a file
     with open('clean_diff.json', 'w') as diff_file1:
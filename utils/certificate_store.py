@@ -0,0 +1,156 @@
+# Name: certificate_store.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 21, 2024
+# Description: Deduplicated table of TLS certificates referenced from the results by their fingerprint.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import hashlib  # Import hashlib module for the certificate fingerprints
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import ssl  # Import ssl module for converting the certificates to PEM
+import threading  # Import threading module for locking the captured certificates
+from utils import ip_address_operations  # Import ip_address_operations for normalizing the IP addresses
+
+certificate_store_folder = 'data/output_data/certificates'  # Folder of the certificate table
+
+
+def peer_certificate_chain(ssl_socket):
+    """
+    Returns the certificate chain sent by the server, the server certificate first.
+
+    Args:
+        ssl_socket (ssl.SSLSocket): Socket after the TLS handshake.
+
+    Returns:
+        list: Certificates of the chain in DER, only the server certificate if the chain is not available.
+    """
+    if hasattr(ssl_socket, 'get_unverified_chain'):
+        # Public since Python 3.13
+        return list(ssl_socket.get_unverified_chain())
+
+    ssl_object = getattr(ssl_socket, '_sslobj', None)
+    if ssl_object is not None and hasattr(ssl_object, 'get_unverified_chain'):
+        return [certificate.public_bytes(ssl._ssl.ENCODING_DER) for certificate in ssl_object.get_unverified_chain()]
+
+    return [ssl_socket.getpeercert(binary_form=True)]
+
+
+class CertificateStore:
+    def __init__(self, folder):
+        """
+        Initializes the CertificateStore.
+
+        Every certificate is stored once in a file named by the SHA-256 fingerprint of the server certificate,
+        with the decoded server certificate and the whole chain in PEM. The certificates captured during the run
+        are also remembered by the IP address and the server name (SNI) of the connection.
+
+        Args:
+            folder (str): Folder of the certificate table.
+        """
+        self.folder = folder
+        self.captured = {}  # Fingerprints of the captured certificates keyed by (IP address, server name)
+
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Every worker process remembers the certificates captured by itself
+        return {'folder': self.folder}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'])
+
+    def certificate_path(self, fingerprint):
+        """
+        Returns the path of the stored certificate.
+
+        Args:
+            fingerprint (str): SHA-256 fingerprint of the server certificate.
+
+        Returns:
+            str: Path of the certificate.
+        """
+        return os.path.join(self.folder, fingerprint[:2], fingerprint + '.json')
+
+    def put(self, certificate, chain):
+        """
+        Stores a certificate, unless it is already stored.
+
+        Args:
+            certificate (dict): The decoded server certificate (see ssl.SSLSocket.getpeercert).
+            chain (list): Certificates of the chain in DER, the server certificate first.
+
+        Returns:
+            str: SHA-256 fingerprint of the server certificate.
+        """
+        fingerprint = hashlib.sha256(chain[0]).hexdigest()
+        path = self.certificate_path(fingerprint)
+        if os.path.exists(path):
+            return fingerprint
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            'Fingerprint': fingerprint,
+            'Certificate': certificate,
+            'Chain': [ssl.DER_cert_to_PEM_cert(der_certificate) for der_certificate in chain]
+        }
+
+        # Write to a temporary file first, so a certificate is never seen incomplete
+        temporary_path = f"{path}.{os.getpid()}_{threading.get_ident()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as certificate_file:
+            json.dump(record, certificate_file, ensure_ascii=False)
+        os.replace(temporary_path, path)
+
+        return fingerprint
+
+    def capture(self, ip_address, server_name, ssl_socket):
+        """
+        Stores the certificate of a TLS connection and remembers it for the IP address and the server name.
+
+        Args:
+            ip_address (str): IP address of the server.
+            server_name (str): Server name sent in the handshake (SNI).
+            ssl_socket (ssl.SSLSocket): Socket after the TLS handshake.
+
+        Returns:
+            str: SHA-256 fingerprint of the server certificate.
+        """
+        fingerprint = self.put(ssl_socket.getpeercert(), peer_certificate_chain(ssl_socket))
+
+        key = (ip_address_operations.extract_ipv4_from_mapped_ipv6(ip_address), server_name.lower())
+        with self.lock:
+            self.captured[key] = fingerprint
+        return fingerprint
+
+    def lookup(self, ip_address, server_name):
+        """
+        Returns the fingerprint of the certificate captured for the IP address and the server name.
+
+        Args:
+            ip_address (str): IP address of the server.
+            server_name (str): Server name (SNI).
+
+        Returns:
+            str: The fingerprint, or None if no certificate was captured.
+        """
+        key = (ip_address_operations.extract_ipv4_from_mapped_ipv6(ip_address), server_name.lower())
+        with self.lock:
+            return self.captured.get(key)
+
+    def get(self, fingerprint):
+        """
+        Reads a stored certificate.
+
+        Args:
+            fingerprint (str): SHA-256 fingerprint of the server certificate.
+
+        Returns:
+            dict: The fingerprint, the decoded server certificate and the chain in PEM, or None if it is not stored.
+        """
+        path = self.certificate_path(fingerprint)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r', encoding='utf-8') as certificate_file:
+            return json.load(certificate_file)
@@ -0,0 +1,132 @@
+# Name: content_store.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 16, 2024
+# Description: Content addressed store of compressed HTML content with an index of the URLs of every run.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import gzip  # Import gzip module for compressing the stored content
+import hashlib  # Import hashlib module for hashing the stored content
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import threading  # Import threading module for naming the temporary files of the threads
+
+content_store_folder = 'data/output_data/content_store'  # Folder of the content store
+
+
+class ContentStore:
+    def __init__(self, folder, run_id):
+        """
+        Initializes the ContentStore.
+
+        Every content is stored once in a compressed blob named by the SHA-256 hash of the content, so identical
+        pages of different URLs and runs are stored only once and no blob is ever overwritten by another content.
+        The index of every run maps the URLs to the hashes of their content.
+
+        Args:
+            folder (str): Folder of the content store.
+            run_id (str): Identifier of the run, used as the name of the index.
+        """
+        self.folder = folder
+        self.run_id = run_id
+        self.index_path = os.path.join(folder, 'index', run_id + '.jsonl')
+
+    def blob_path(self, content_hash):
+        """
+        Returns the path of the blob with the content.
+
+        Args:
+            content_hash (str): SHA-256 hash of the content.
+
+        Returns:
+            str: Path of the blob.
+        """
+        return os.path.join(self.folder, 'blobs', content_hash[:2], content_hash + '.gz')
+
+    def put(self, content):
+        """
+        Stores the content, unless the same content is already stored.
+
+        Args:
+            content (bytes): The content.
+
+        Returns:
+            str: SHA-256 hash of the content.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        blob_path = self.blob_path(content_hash)
+        if os.path.exists(blob_path):
+            return content_hash
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        # Write to a temporary file first, so a blob is never seen incomplete
+        temporary_path = f"{blob_path}.{os.getpid()}_{threading.get_ident()}.tmp"
+        with open(temporary_path, 'wb') as blob_file:
+            blob_file.write(gzip.compress(content))
+        os.replace(temporary_path, blob_path)
+
+        return content_hash
+
+    def save(self, url, content, truncated=False):
+        """
+        Stores the content of a URL and records it in the index of the run.
+
+        Args:
+            url (str): The URL.
+            content (bytes): The content.
+            truncated (bool, optional): True if the content is only the beginning of the body of the URL (cut off
+                at the maximum body size), the index records it. Defaults to False.
+
+        Returns:
+            str: SHA-256 hash of the content.
+        """
+        content_hash = self.put(content)
+
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        line = json.dumps({'URL': str(url), 'Hash': content_hash, 'Truncated': truncated}, ensure_ascii=False) + '\n'
+        # One short line is appended with one write, so the processes and threads of the run can share the index
+        with open(self.index_path, 'a', encoding='utf-8') as index_file:
+            index_file.write(line)
+
+        return content_hash
+
+    def get(self, content_hash):
+        """
+        Reads a stored content.
+
+        Args:
+            content_hash (str): SHA-256 hash of the content.
+
+        Returns:
+            bytes: The content, or None if it is not stored.
+        """
+        blob_path = self.blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            return None
+
+        with open(blob_path, 'rb') as blob_file:
+            return gzip.decompress(blob_file.read())
+
+    def read_index(self):
+        """
+        Reads the index of the run. The last content of a URL wins.
+
+        Returns:
+            dict: Hashes of the content keyed by URL.
+        """
+        index = {}
+        if not os.path.exists(self.index_path):
+            return index
+
+        with open(self.index_path, 'r', encoding='utf-8') as index_file:
+            for line in index_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be incomplete if the run crashed while writing it
+                    continue
+                index[record['URL']] = record['Hash']
+
+        return index
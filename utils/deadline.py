@@ -0,0 +1,87 @@
+# Name: deadline.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 14, 2024
+# Description: Time budget of a test shared by the probes instead of signal based timeouts.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import time  # Import time module for time-related operations
+
+
+class Deadline:
+    def __init__(self, budget):
+        """
+        Initializes the Deadline.
+
+        Args:
+            budget (float): Number of seconds from now until the deadline.
+        """
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        """
+        Returns the time left until the deadline.
+
+        Returns:
+            float: Number of seconds left, 0 if the deadline has passed.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """
+        Checks if the deadline has passed.
+
+        Returns:
+            bool: True if the deadline has passed, otherwise False.
+        """
+        return self.remaining() <= 0
+
+    def limit(self, budget):
+        """
+        Creates a deadline which expires after the budget, but never later than this deadline.
+
+        Args:
+            budget (float): Maximum number of seconds from now.
+
+        Returns:
+            Deadline: The new deadline.
+        """
+        deadline = Deadline(budget)
+        deadline.expires_at = min(deadline.expires_at, self.expires_at)
+        return deadline
+
+    def timeout(self, cap=None):
+        """
+        Returns the timeout for a single blocking operation (socket, HTTP request or DNS query).
+
+        Args:
+            cap (float, optional): Maximum timeout of the operation in seconds.
+
+        Returns:
+            float: Number of seconds the operation may take.
+
+        Raises:
+            TimeoutError: If the deadline has already passed.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise TimeoutError("Deadline exceeded.")
+        return min(remaining, cap) if cap is not None else remaining
+
+
+def probe_deadline(deadline, budget):
+    """
+    Returns the deadline of one probe. The probe gets at most the budget, but never more than the time left
+    for the whole test of the URL.
+
+    Args:
+        deadline (Deadline): Deadline of the test of the URL, or None if the probe runs on its own.
+        budget (float): Maximum number of seconds for the probe.
+
+    Returns:
+        Deadline: Deadline of the probe.
+    """
+    if deadline is None:
+        return Deadline(budget)
+    return deadline.limit(budget)
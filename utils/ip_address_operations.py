@@ -8,6 +8,44 @@
 # Import necessary libraries
 from scapy.all import *  # Import all from scapy.all module for packet manipulation
 
+# Range of ICMP identifiers owned by this process, worker processes get disjoint ranges
+icmp_identifier_start = os.getpid() & 0xFFFF
+icmp_identifier_count = 1
+
+
+def set_icmp_identifier_space(start, count):
+    """
+    Sets the range of ICMP identifiers used by this process. Processes sending ICMP packets at the same time
+    must use disjoint ranges, otherwise they cannot tell their replies apart.
+
+    Args:
+        start (int): First identifier of the range.
+        count (int): Number of identifiers in the range.
+    """
+    global icmp_identifier_start, icmp_identifier_count
+    icmp_identifier_start = start & 0xFFFF
+    icmp_identifier_count = max(1, count)
+
+
+def get_icmp_identifier():
+    """
+    Returns the ICMP identifier used by this process.
+
+    Returns:
+        int: The ICMP identifier.
+    """
+    return icmp_identifier_start
+
+
+def get_icmp_identifier_space():
+    """
+    Returns the range of ICMP identifiers owned by this process.
+
+    Returns:
+        tuple: First identifier of the range and number of identifiers in the range.
+    """
+    return icmp_identifier_start, icmp_identifier_count
+
 
 def check_ip_address_type(ip_address):
     """
@@ -113,27 +151,35 @@ def calculate_checksum(data):
     return ch_sum
 
 
-def create_icmp4_echo_request():
+def create_icmp4_echo_request(icmp_id=None, icmp_seq=1):
     """
     Create an ICMPv4 Echo Request packet.
+
+    Args:
+        icmp_id (int, optional): Identifier of the request, defaults to the identifier of this process.
+        icmp_seq (int, optional): Sequence number of the request. Defaults to 1.
     """
     icmp_checksum = 0
-    icmp_id = os.getpid() & 0xFFFF  # Process ID for identification
-    icmp_seq = 1  # Packet sequence number
+    if icmp_id is None:
+        icmp_id = get_icmp_identifier()  # Identifier of this process
     icmp_packet = struct.pack('!BBHHH', 8, 0, icmp_checksum, icmp_id, icmp_seq)
     icmp_checksum = calculate_checksum(icmp_packet)
     return struct.pack('!BBHHH', 8, 0, socket.htons(icmp_checksum), icmp_id, icmp_seq)
 
 
-def create_icmp6_echo_request():
+def create_icmp6_echo_request(icmp6_id=None, icmp6_seq=1):
     """
     Create an ICMPv6 Echo Request packet.
+
+    Args:
+        icmp6_id (int, optional): Identifier of the request, defaults to the identifier of this process.
+        icmp6_seq (int, optional): Sequence number of the request. Defaults to 1.
     """
     icmp6_type = 128  # Echo Request
     icmp6_code = 0
     icmp6_checksum = 0
-    icmp6_id = os.getpid() & 0xFFFF
-    icmp6_seq = 1
+    if icmp6_id is None:
+        icmp6_id = get_icmp_identifier()
     payload = b'abcdefghijklmnopqrstuvwabcdefghi'  # Payload data
     pseudo_header = struct.pack('!BBHHH', icmp6_type, icmp6_code, icmp6_checksum, icmp6_id, icmp6_seq)
     icmp6_checksum = calculate_checksum(pseudo_header + payload)
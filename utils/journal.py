@@ -0,0 +1,146 @@
+# Name: journal.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 11, 2024
+# Description: Append-only journal of finished URLs for resuming an interrupted run.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import threading  # Import threading module for locking the journal file
+from datetime import datetime  # Import datetime class from datetime module
+from utils import save_to_JSON  # Import save_to_JSON module for converting results to standard dictionaries
+
+journal_folder = 'data/output_data/journal'  # Folder with the journals of the runs
+
+
+class RunJournal:
+    def __init__(self, journal_path):
+        """
+        Initializes the RunJournal and loads the records of a previous interrupted run, if there are any.
+
+        Every process appends to its own part file in the journal folder, so worker processes never write
+        to the same file.
+
+        Args:
+            journal_path (str): Folder of the journal of the run.
+        """
+        self.journal_path = journal_path
+        self.part_path = os.path.join(journal_path, f"part_{os.getpid()}.jsonl")
+
+        self.url_results = {}  # Results of the finished URLs keyed by URL
+        self.saved_batches = {}  # Names of the saved output files keyed by the index of the group of URLs
+
+        self.lock = threading.Lock()
+
+        os.makedirs(journal_path, exist_ok=True)
+        self.run_id = self.load_run_id()
+        self.load()
+
+    def load_run_id(self):
+        """
+        Loads the identifier of the run, or creates it when the run starts. A resumed run keeps its identifier.
+
+        Returns:
+            str: Identifier of the run (name of the journal and the start time of the run).
+        """
+        run_id_path = os.path.join(self.journal_path, 'run_id')
+        if not os.path.exists(run_id_path):
+            date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+            with open(run_id_path, 'w', encoding='utf-8') as run_id_file:
+                run_id_file.write(os.path.basename(os.path.normpath(self.journal_path)) + "_" + date_time)
+
+        with open(run_id_path, 'r', encoding='utf-8') as run_id_file:
+            return run_id_file.read().strip()
+
+    def load(self):
+        """
+        Loads the records from all part files of the journal.
+        """
+        for part_name in sorted(os.listdir(self.journal_path)):
+            if not part_name.endswith('.jsonl'):
+                continue
+
+            with open(os.path.join(self.journal_path, part_name), 'r', encoding='utf-8') as part_file:
+                for line in part_file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may be incomplete if the run crashed while writing it
+                        continue
+
+                    if record['Type'] == 'URL':
+                        self.url_results[record['URL']] = record['Results']
+                    elif record['Type'] == 'Batch':
+                        self.saved_batches[record['Index']] = record['File']
+
+    def append(self, record):
+        """
+        Appends a record to the part file of this process and writes it to the disk immediately.
+
+        Args:
+            record (dict): The record to append.
+        """
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+
+        with self.lock:
+            with open(self.part_path, 'a', encoding='utf-8') as part_file:
+                part_file.write(line)
+                part_file.flush()
+                os.fsync(part_file.fileno())
+
+    def record_url(self, website, url_results):
+        """
+        Records the results of a finished URL.
+
+        Args:
+            website (str): The website URL.
+            url_results (list): Results recorded for the URL.
+        """
+        url_results = [{k: save_to_JSON.convert_to_dict(v) for k, v in result.items()} for result in url_results]
+        self.append({'Type': 'URL', 'URL': str(website), 'Results': url_results})
+        self.url_results[str(website)] = url_results
+
+    def record_batch(self, batch_index, output_filename):
+        """
+        Records that the results of a group of URLs were saved to an output file.
+
+        Args:
+            batch_index (int): Index of the first URL of the group in the input file.
+            output_filename (str): Name of the output file.
+        """
+        self.append({'Type': 'Batch', 'Index': batch_index, 'File': output_filename})
+        self.saved_batches[batch_index] = output_filename
+
+    def get_url_results(self, website):
+        """
+        Returns the results of a finished URL.
+
+        Args:
+            website (str): The website URL.
+
+        Returns:
+            list: Results recorded for the URL, or None if the URL was not finished yet.
+        """
+        return self.url_results.get(str(website))
+
+    def is_batch_saved(self, batch_index):
+        """
+        Checks if the results of a group of URLs were already saved.
+
+        Args:
+            batch_index (int): Index of the first URL of the group in the input file.
+
+        Returns:
+            bool: True if the group was saved, otherwise False.
+        """
+        return batch_index in self.saved_batches
+
+    def complete(self):
+        """
+        Marks the run as finished by renaming the journal folder, so the next run of the same input file
+        starts from the beginning.
+        """
+        date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        os.rename(self.journal_path, self.journal_path + "_done_" + date_time)
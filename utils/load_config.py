@@ -9,6 +9,17 @@
 import json  # Import JSON module for JSON operations
 
 
+def load_config():
+    """
+    Load the whole JSON configuration file.
+
+    Returns:
+        dict: The configuration.
+    """
+    with open(f'config.json') as f:
+        return json.load(f)  # Load JSON data from the file
+
+
 def load_credentials(credentials_type):
     """
     Load credentials from a JSON configuration file.
@@ -0,0 +1,398 @@
+# Name: result_log.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 13, 2024
+# Description: Segmented log of test results with one compact record per URL.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import json  # Import JSON module for JSON operations
+import os  # Import os module for operating system related functionalities
+import re  # Import re module for regular expressions
+import struct  # Import struct module for packing record lengths and the footer
+import threading  # Import threading module for locking the log
+import zlib  # Import zlib module for compressing the records
+from datetime import datetime  # Import datetime class from datetime module
+from utils import save_to_JSON  # Import save_to_JSON module for converting results to standard dictionaries
+
+segment_magic = b'WCTLOG01'  # Start of every segment file
+footer_magic = b'WCTIDX01'  # End of every closed segment file
+segment_extension = '.seg'  # Extension of segment files
+
+# A segment consists of a header (magic and compression flag), records (4-byte length and the record) and a footer
+# (JSON index with the offset of every record, 8-byte offset of the index and the footer magic). A segment without
+# the footer (e.g. after a crash) can still be read record by record.
+header_size = len(segment_magic) + 1
+footer_size = 8 + len(footer_magic)
+
+# Segment names: results_<name of the input file>_<sequence number>_<date and time>.seg
+segment_name_pattern = re.compile(r"results_(.*)_(\d+)_\d{2}-\d{2}-\d{4}_\d{2}-\d{2}-\d{2}" +
+                                  re.escape(segment_extension) + "$")
+
+
+def to_record(url_results):
+    """
+    Converts the results recorded for a URL to the record stored in the log. The last result of the URL
+    wins, in the same way as in the JSON output files.
+
+    Args:
+        url_results (list): Results recorded for the URL.
+
+    Returns:
+        dict: The record of the URL.
+    """
+    return {k: save_to_JSON.convert_to_dict(v) for k, v in url_results[-1].items()}
+
+
+class SegmentedResultLog:
+    def __init__(self, folder, name, max_segment_size=64 * 1024 * 1024, compress=False, on_segment_closed=None):
+        """
+        Initializes the SegmentedResultLog. The first segment is created with the first record.
+
+        Args:
+            folder (str): Folder where the segments will be saved.
+            name (str): Name of the input file, used in the names of the segments.
+            max_segment_size (int, optional): Size in bytes after which the segment is closed and a new one
+                is started. Defaults to 64 MB.
+            compress (bool, optional): Compress every record with zlib. Defaults to False.
+            on_segment_closed (callable, optional): Function called with the path of every closed segment.
+        """
+        self.folder = folder
+        self.name = name
+        self.max_segment_size = max_segment_size
+        self.compress = compress
+        self.on_segment_closed = on_segment_closed
+
+        self.segment_file = None
+        self.segment_path = None
+        self.segment_index = {}
+        self.sequence = self.find_last_sequence() + 1
+
+        self.lock = threading.Lock()
+
+        self.finalize_segments()
+
+    def find_last_sequence(self):
+        """
+        Finds the highest sequence number of the existing segments of the input file, so segments of
+        an interrupted run are never overwritten.
+
+        Returns:
+            int: The highest sequence number, or -1 if there is no segment.
+        """
+        pattern = re.compile(r"results_" + re.escape(self.name) + r"_(\d+)_.*" + re.escape(segment_extension) + "$")
+        sequences = [int(match.group(1)) for match in map(pattern.match, os.listdir(self.folder)) if match] \
+            if os.path.isdir(self.folder) else []
+        return max(sequences, default=-1)
+
+    def finalize_segments(self):
+        """
+        Closes the segments of the input file left without the footer by an interrupted run. The new run starts
+        a new segment, so without this the segments would never be closed and handed to `on_segment_closed`.
+        """
+        if not os.path.isdir(self.folder):
+            return
+
+        for filename in sorted(os.listdir(self.folder), key=segment_order):
+            if segment_order(filename)[0] != self.name or not filename.endswith(segment_extension):
+                continue
+
+            path = os.path.join(self.folder, filename)
+            if finalize_segment(path):
+                print("Closed result log segment of the interrupted run: " + path)
+                if self.on_segment_closed is not None:
+                    self.on_segment_closed(path)
+
+    def open_segment(self):
+        """
+        Creates a new segment file.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+
+        date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        segment_name = "results_" + self.name + "_" + str(self.sequence) + "_" + date_time + segment_extension
+        self.sequence += 1
+
+        self.segment_path = os.path.join(self.folder, segment_name)
+        self.segment_file = open(self.segment_path, 'wb')
+        self.segment_file.write(segment_magic + (b'\x01' if self.compress else b'\x00'))
+        self.segment_index = {}
+
+    def append(self, record):
+        """
+        Appends the record of one URL to the current segment.
+
+        Args:
+            record (dict): The record of the URL, it must contain the 'URL' key.
+
+        Returns:
+            str: Path of the segment the record was written to.
+        """
+        data = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if self.compress:
+            data = zlib.compress(data)
+
+        with self.lock:
+            if self.segment_file is None:
+                self.open_segment()
+
+            offset = self.segment_file.tell()
+            self.segment_file.write(struct.pack('!I', len(data)) + data)
+            self.segment_file.flush()
+            self.segment_index[record['URL']] = [offset, len(data)]
+            segment_path = self.segment_path
+
+            if self.segment_file.tell() >= self.max_segment_size:
+                self.close_segment()
+
+        return segment_path
+
+    def close_segment(self):
+        """
+        Writes the index footer to the current segment and closes it.
+        """
+        if self.segment_file is None:
+            return
+
+        index_offset = self.segment_file.tell()
+        index = json.dumps(self.segment_index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.segment_file.write(index + struct.pack('!Q', index_offset) + footer_magic)
+        self.segment_file.close()
+        self.segment_file = None
+
+        print("Closed result log segment: " + self.segment_path)
+        if self.on_segment_closed is not None:
+            self.on_segment_closed(self.segment_path)
+
+    def close(self):
+        """
+        Closes the log, the current segment gets its index footer.
+        """
+        with self.lock:
+            self.close_segment()
+
+
+def read_segment_header(segment_file):
+    """
+    Reads the header of a segment.
+
+    Args:
+        segment_file (file): Segment file opened in binary mode.
+
+    Returns:
+        bool: True if the records of the segment are compressed, otherwise False.
+    """
+    segment_file.seek(0)
+    header = segment_file.read(header_size)
+    if header[:len(segment_magic)] != segment_magic:
+        raise ValueError("Not a result log segment: " + segment_file.name)
+    return header[-1:] == b'\x01'
+
+
+def scan_segment(segment_file):
+    """
+    Builds the index of a segment by reading it record by record. Used for segments without the footer.
+
+    Args:
+        segment_file (file): Segment file opened in binary mode.
+
+    Returns:
+        dict: Offset and length of every complete record keyed by URL.
+    """
+    compressed = read_segment_header(segment_file)
+    index = {}
+
+    while True:
+        offset = segment_file.tell()
+        length_bytes = segment_file.read(4)
+        if len(length_bytes) < 4:
+            break
+        length = struct.unpack('!I', length_bytes)[0]
+        data = segment_file.read(length)
+        if len(data) < length:
+            # The last record was not written completely
+            break
+        try:
+            index[decode_record(data, compressed)['URL']] = [offset, length]
+        except (ValueError, zlib.error, KeyError):
+            break
+
+    return index
+
+
+def read_segment_index(path):
+    """
+    Reads the index of a segment from its footer, or by scanning the segment if it has no footer.
+
+    Args:
+        path (str): Path of the segment.
+
+    Returns:
+        dict: Offset and length of every record keyed by URL.
+    """
+    with open(path, 'rb') as segment_file:
+        read_segment_header(segment_file)
+
+        segment_file.seek(0, os.SEEK_END)
+        size = segment_file.tell()
+        if size >= header_size + footer_size:
+            segment_file.seek(size - footer_size)
+            footer = segment_file.read(footer_size)
+            if footer[8:] == footer_magic:
+                index_offset = struct.unpack('!Q', footer[:8])[0]
+                segment_file.seek(index_offset)
+                return json.loads(segment_file.read(size - footer_size - index_offset))
+
+        return scan_segment(segment_file)
+
+
+def has_footer(segment_file):
+    """
+    Checks if a segment ends with the index footer.
+
+    Args:
+        segment_file (file): Segment file opened in binary mode.
+
+    Returns:
+        bool: True if the segment was closed, otherwise False.
+    """
+    segment_file.seek(0, os.SEEK_END)
+    size = segment_file.tell()
+    if size < header_size + footer_size:
+        return False
+    segment_file.seek(size - footer_size)
+    return segment_file.read(footer_size)[8:] == footer_magic
+
+
+def finalize_segment(path):
+    """
+    Writes the index footer to a segment left without it, e.g. after a crash. An incompletely written last record
+    is cut off before the footer is written.
+
+    Args:
+        path (str): Path of the segment.
+
+    Returns:
+        bool: True if the footer was written, False if the segment already had it.
+    """
+    with open(path, 'r+b') as segment_file:
+        if has_footer(segment_file):
+            return False
+
+        index = scan_segment(segment_file)
+        index_offset = max((offset + 4 + length for offset, length in index.values()), default=header_size)
+        segment_file.truncate(index_offset)
+        segment_file.seek(index_offset)
+        index = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        segment_file.write(index + struct.pack('!Q', index_offset) + footer_magic)
+        return True
+
+
+def decode_record(data, compressed):
+    """
+    Decodes one stored record.
+
+    Args:
+        data (bytes): The stored record without its length.
+        compressed (bool): True if the record is compressed.
+
+    Returns:
+        dict: The record of the URL.
+    """
+    if compressed:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def read_record(path, offset):
+    """
+    Reads one record of a segment.
+
+    Args:
+        path (str): Path of the segment.
+        offset (int): Offset of the record from the index of the segment.
+
+    Returns:
+        dict: The record of the URL.
+    """
+    with open(path, 'rb') as segment_file:
+        compressed = read_segment_header(segment_file)
+        segment_file.seek(offset)
+        length = struct.unpack('!I', segment_file.read(4))[0]
+        return decode_record(segment_file.read(length), compressed)
+
+
+def segment_order(filename):
+    """
+    Returns the key ordering the segments by the name of their input file and their sequence number. The sequence
+    numbers are not padded, so the names themselves do not sort in the order the segments were written.
+
+    Args:
+        filename (str): Name of the segment file.
+
+    Returns:
+        tuple: Name of the input file and the sequence number of the segment.
+    """
+    match = segment_name_pattern.match(filename)
+    if match is None:
+        return filename, -1
+    return match.group(1), int(match.group(2))
+
+
+def has_segments(folder):
+    """
+    Checks if the folder contains result log segments.
+
+    Args:
+        folder (str): The folder to check.
+
+    Returns:
+        bool: True if there is at least one segment in the folder, otherwise False.
+    """
+    return any(filename.endswith(segment_extension) for filename in os.listdir(folder))
+
+
+class ResultLogReader:
+    def __init__(self, folder):
+        """
+        Initializes the ResultLogReader and reads the indexes of all segments in the folder. Records are read
+        from the disk only when they are requested. Segments are read in the order they were written, so the last
+        record of a URL (e.g. of a retried or resumed URL) wins.
+
+        Args:
+            folder (str): Folder with the segments.
+        """
+        self.index = {}  # Path of the segment and offset of the record keyed by URL
+        for filename in sorted(os.listdir(folder), key=segment_order):
+            if filename.endswith(segment_extension):
+                path = os.path.join(folder, filename)
+                for url, (offset, _) in read_segment_index(path).items():
+                    self.index[url] = (path, offset)
+
+    def __iter__(self):
+        """
+        Reads the records one after another.
+
+        Yields:
+            tuple: URL and its record.
+        """
+        for url in self.index:
+            yield url, self.get(url)
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def get(self, url):
+        """
+        Reads the record of a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            dict: The record of the URL, or None if the URL is not in the log.
+        """
+        if url not in self.index:
+            return None
+        path, offset = self.index[url]
+        return read_record(path, offset)
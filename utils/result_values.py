@@ -0,0 +1,8 @@
+# Name: result_values.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 28, 2024
+# Description: Special values recorded in the results, shared by the testing and the processing of the results.
+# Python Version: 3.12.3
+
+
+NOT_RUN = "Not run"  # Value recorded for probes which were not selected for the run
@@ -6,32 +6,291 @@
 
 # Import necessary libraries
 import paramiko  # Importing Paramiko library for SSH functionality
+import json  # Importing JSON module for the records of the outbox
 import os  # Importing os module for system-related operations
+import queue  # Importing queue module for the files waiting for the upload
+import threading  # Importing threading module for the background upload
+import time  # Importing time module for the backoff of the retries
 
 from utils import load_config  # Importing load_config function from the utils module
 
+outbox_folder = 'data/output_data/outbox'  # Folder of the outbox of the files waiting for the upload
+keepalive_interval = 30  # Number of seconds between keepalive packets of the kept SSH connection
+connect_timeout = 30  # Maximum time of connecting and authenticating in seconds
+base_retry_delay = 2  # Delay before the first retry of a failed upload in seconds
+max_retry_delay = 300  # Maximum delay between the retries in seconds
+known_hosts_path = os.path.join("~", ".ssh", "known_hosts")  # Known host keys of the SSH servers
+# Policies for a server whose host key is not known: rejecting the connection, connecting with a warning
+# or adding the key to the known keys of the run
+host_key_policies = {
+    'reject': paramiko.RejectPolicy,
+    'warning': paramiko.WarningPolicy,
+    'auto_add': paramiko.AutoAddPolicy
+}
 
-def send_file_via_ssh(local_path, remote_path):
-    """
-    Sends a file via SSH using Paramiko library.
-
-    Args:
-        local_path (str): Local path of the file to be sent.
-        remote_path (str): Remote path where the file will be sent.
-    """
-    # Establish SSH connection
-    ssh = paramiko.SSHClient()
-    ssh.load_host_keys(os.path.expanduser(os.path.join("~", ".ssh", "known_hosts")))
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    # Connect to the SSH server
-    ssh.connect(
-        load_config.load_credentials("ftp_server"),
-        username=load_config.load_credentials("ftp_username"),
-        key_filename=load_config.load_credentials("ssh_private_key_path")
-    )
-
-    sftp = ssh.open_sftp()
-    sftp.put(local_path, remote_path)
-
-    sftp.close()
-    ssh.close()
+
+class SftpUploader:
+    def __init__(self, server, username, key_filename, remote_folder, folder=outbox_folder, port=22,
+                 host_key_policy='reject', known_hosts=known_hosts_path):
+        """
+        Initializes the SftpUploader and loads the files left in the outbox by the previous runs.
+
+        One authenticated SSH connection with an SFTP session is kept for all files. The files are uploaded
+        by a background thread, so the tests never wait for the upload. Every queued file is recorded
+        in the outbox before it is uploaded, files which were not uploaded are uploaded by the next run.
+        A failed upload is retried over a new connection after an exponentially growing delay. The host key
+        of the server is checked against the known hosts file, a server with an unknown key is rejected unless
+        another policy is set.
+
+        Args:
+            server (str): Host name of the SSH server.
+            username (str): User name on the SSH server.
+            key_filename (str): Path of the private key.
+            remote_folder (str): Remote folder of the uploaded files.
+            folder (str, optional): Folder of the outbox.
+            port (int, optional): Port of the SSH server. Defaults to 22.
+            host_key_policy (str, optional): Policy for an unknown host key, one of `host_key_policies`.
+                Defaults to 'reject'.
+            known_hosts (str, optional): Path of the known hosts file. Defaults to ~/.ssh/known_hosts.
+
+        Raises:
+            ValueError: If the host key policy is unknown.
+        """
+        if host_key_policy not in host_key_policies:
+            raise ValueError(f"Unknown host key policy: {host_key_policy}")
+
+        self.server = server
+        self.username = username
+        self.key_filename = key_filename
+        self.remote_folder = remote_folder
+        self.port = port
+        self.host_key_policy = host_key_policy
+        self.known_hosts = os.path.expanduser(known_hosts)
+        self.outbox_path = os.path.join(folder, 'outbox.jsonl')
+
+        self.ssh = None
+        self.sftp = None
+        self.pending = queue.Queue()  # Local and remote paths of the files waiting for the upload
+        self.thread = None
+        self.closing = threading.Event()
+
+        self.uploaded = 0
+        self.retries = 0
+        self.connections = 0
+
+        self.lock = threading.Lock()
+
+        os.makedirs(folder, exist_ok=True)
+        for local_path, remote_path in self.load():
+            self.pending.put((local_path, remote_path))
+
+    @classmethod
+    def from_config(cls, folder=outbox_folder):
+        """
+        Creates the uploader with the server and the credentials from the configuration file. The policy for
+        an unknown host key is taken from the optional "ssh_host_key_policy" setting.
+
+        Args:
+            folder (str, optional): Folder of the outbox.
+
+        Returns:
+            SftpUploader: The uploader.
+        """
+        config_data = load_config.load_config()
+        return cls(config_data["ftp_server"], config_data["ftp_username"], config_data["ssh_private_key_path"],
+                   config_data["server_path_for_files"], folder, config_data.get("ftp_port", 22),
+                   config_data.get("ssh_host_key_policy", 'reject'))
+
+    def load(self):
+        """
+        Loads the files which were queued, but not uploaded, and rewrites the outbox with them only.
+
+        Returns:
+            list: Local and remote paths of the files, in the order in which they were queued.
+        """
+        waiting = {}
+        if os.path.exists(self.outbox_path):
+            with open(self.outbox_path, 'r', encoding='utf-8') as outbox_file:
+                for line in outbox_file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # The last line may be incomplete if the run crashed while writing it
+                        continue
+                    if record['Type'] == 'Queued':
+                        waiting[record['Local']] = record['Remote']
+                    else:
+                        waiting.pop(record['Local'], None)
+
+        # Files deleted since they were queued cannot be uploaded anymore
+        waiting = {local_path: remote_path for local_path, remote_path in waiting.items()
+                   if os.path.exists(local_path)}
+
+        temporary_path = f"{self.outbox_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as outbox_file:
+            for local_path, remote_path in waiting.items():
+                outbox_file.write(json.dumps({'Type': 'Queued', 'Local': local_path, 'Remote': remote_path},
+                                             ensure_ascii=False) + '\n')
+        os.replace(temporary_path, self.outbox_path)
+
+        return list(waiting.items())
+
+    def append(self, record):
+        """
+        Appends a record to the outbox and writes it to the disk immediately.
+
+        Args:
+            record (dict): The record to append.
+        """
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+
+        with self.lock:
+            with open(self.outbox_path, 'a', encoding='utf-8') as outbox_file:
+                outbox_file.write(line)
+                outbox_file.flush()
+                os.fsync(outbox_file.fileno())
+
+    def start(self):
+        """
+        Starts the background thread uploading the queued files.
+        """
+        self.thread = threading.Thread(target=self.run, name='sftp-uploader', daemon=True)
+        self.thread.start()
+
+    def enqueue(self, local_path):
+        """
+        Queues a file for the upload to the remote folder. The call does not wait for the upload.
+
+        Args:
+            local_path (str): Local path of the file.
+        """
+        remote_path = self.remote_folder + os.path.basename(local_path)
+        self.append({'Type': 'Queued', 'Local': local_path, 'Remote': remote_path})
+        self.pending.put((local_path, remote_path))
+
+    def connect(self):
+        """
+        Opens the SSH connection and the SFTP session, unless the kept connection is still active.
+        """
+        if self.sftp is not None and self.ssh.get_transport() is not None and self.ssh.get_transport().is_active():
+            return
+
+        self.disconnect()
+        ssh = paramiko.SSHClient()
+        if os.path.exists(self.known_hosts):
+            ssh.load_host_keys(self.known_hosts)
+        ssh.set_missing_host_key_policy(host_key_policies[self.host_key_policy]())
+        ssh.connect(self.server, port=self.port, username=self.username, key_filename=self.key_filename,
+                    timeout=connect_timeout, banner_timeout=connect_timeout, auth_timeout=connect_timeout)
+        ssh.get_transport().set_keepalive(keepalive_interval)
+
+        self.ssh = ssh
+        self.sftp = ssh.open_sftp()
+        with self.lock:
+            self.connections += 1
+
+    def disconnect(self):
+        """
+        Closes the SFTP session and the SSH connection.
+        """
+        if self.sftp is not None:
+            try:
+                self.sftp.close()
+            except (OSError, EOFError, paramiko.SSHException):
+                pass
+        if self.ssh is not None:
+            self.ssh.close()
+        self.ssh = None
+        self.sftp = None
+
+    def upload(self, local_path, remote_path):
+        """
+        Uploads one file over the kept connection, the connection is opened again if it was lost.
+
+        Args:
+            local_path (str): Local path of the file.
+            remote_path (str): Remote path of the file.
+
+        Raises:
+            OSError, EOFError, paramiko.SSHException: If the upload failed.
+        """
+        self.connect()
+        try:
+            self.sftp.put(local_path, remote_path)
+        except (OSError, EOFError, paramiko.SSHException):
+            # The connection may be broken, the next attempt starts with a new one
+            self.disconnect()
+            raise
+
+    def run(self):
+        """
+        Uploads the queued files one after another until the uploader is closed.
+        """
+        delay = base_retry_delay
+
+        while not self.closing.is_set():
+            try:
+                local_path, remote_path = self.pending.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            while True:
+                try:
+                    # A file deleted since it was queued is dropped from the outbox
+                    if os.path.exists(local_path):
+                        self.upload(local_path, remote_path)
+                        with self.lock:
+                            self.uploaded += 1
+                    self.append({'Type': 'Done', 'Local': local_path})
+                    delay = base_retry_delay
+                    break
+                except (OSError, EOFError, paramiko.SSHException) as e:
+                    print(f"Upload of {os.path.basename(local_path)} failed, retrying in {delay} s: {e}")
+                    with self.lock:
+                        self.retries += 1
+                    # The file stays in the outbox if the uploader is closed while waiting
+                    if self.closing.wait(delay):
+                        self.disconnect()
+                        return
+                    delay = min(delay * 2, max_retry_delay)
+
+            self.pending.task_done()
+
+        self.disconnect()
+
+    def close(self, timeout=60):
+        """
+        Waits until the queued files are uploaded, at most for the timeout, and stops the background thread.
+        Files which were not uploaded stay in the outbox for the next run.
+
+        Args:
+            timeout (float, optional): Maximum time of waiting for the upload in seconds. Defaults to 60.
+        """
+        end_time = time.monotonic() + timeout
+        while self.pending.unfinished_tasks and time.monotonic() < end_time and self.thread is not None \
+                and self.thread.is_alive():
+            time.sleep(0.1)
+
+        self.closing.set()
+        if self.thread is not None:
+            self.thread.join(max(0.0, end_time - time.monotonic()) + 1)
+
+    def summary(self):
+        """
+        Returns the statistics of the uploader.
+
+        Returns:
+            dict: Number of uploaded files, retries, opened connections and files left in the outbox.
+        """
+        with self.lock:
+            return {'Uploaded files': self.uploaded, 'Upload retries': self.retries,
+                    'SSH connections': self.connections, 'Files in outbox': self.pending.unfinished_tasks}
+
+    def print_summary(self):
+        """
+        Prints the number of uploaded files, retries, opened connections and files left in the outbox.
+        """
+        summary = self.summary()
+        print(f"Upload summary: {summary['Uploaded files']} files uploaded over {summary['SSH connections']} "
+              f"connections, {summary['Upload retries']} retries, {summary['Files in outbox']} files left "
+              f"in the outbox.")
@@ -0,0 +1,197 @@
+# Name: sftp_stand_in.py
+# Author: Dalibor Kyjovský (xkyjov03)
+# Date: May 27, 2024
+# Description: Local stand-in of the SFTP server receiving the result files, for testing the uploader.
+# Python Version: 3.12.3
+
+
+# Import necessary libraries
+import argparse  # Import argparse module for parsing command-line arguments
+import os  # Import os module for operating system related functionalities
+import socket  # Import socket module for accepting the SSH connections
+import threading  # Import threading module for serving the connections
+import paramiko  # Import Paramiko library for the SSH and SFTP server
+
+default_port = 2222  # Port of the stand-in server
+
+
+class StandInServer(paramiko.ServerInterface):
+    """
+    SSH server accepting any user with any public key and allowing only the SFTP subsystem.
+    """
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'publickey'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class StandInSftpHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        return paramiko.SFTP_OK
+
+
+class StandInSftpServer(paramiko.SFTPServerInterface):
+    """
+    SFTP server storing the files under the root folder of the stand-in.
+    """
+    def __init__(self, server, root):
+        super().__init__(server)
+        self.root = root
+
+    def local_path(self, path):
+        """
+        Returns the local path of a remote path, the remote paths never leave the root folder.
+        """
+        return os.path.join(self.root, os.path.normpath('/' + path).lstrip('/'))
+
+    def open(self, path, flags, attr):
+        local_path = self.local_path(path)
+        try:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            descriptor = os.open(local_path, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+        mode = 'wb' if flags & os.O_WRONLY else 'r+b' if flags & os.O_RDWR else 'rb'
+        if flags & os.O_APPEND:
+            mode = 'ab'
+        handle = StandInSftpHandle(flags)
+        handle.readfile = handle.writefile = os.fdopen(descriptor, mode)
+        return handle
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.local_path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        return self.stat(path)
+
+    def list_folder(self, path):
+        local_path = self.local_path(path)
+        try:
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local_path, name)), name)
+                    for name in os.listdir(local_path)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def remove(self, path):
+        try:
+            os.remove(self.local_path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, old_path, new_path):
+        try:
+            os.replace(self.local_path(old_path), self.local_path(new_path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def posix_rename(self, old_path, new_path):
+        return self.rename(old_path, new_path)
+
+    def mkdir(self, path, attr):
+        try:
+            os.makedirs(self.local_path(path), exist_ok=True)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class SftpStandIn:
+    def __init__(self, root, host='127.0.0.1', port=default_port, host_key=None):
+        """
+        Initializes the SftpStandIn.
+
+        Args:
+            root (str): Folder where the uploaded files are stored.
+            host (str, optional): Address to listen on. Defaults to 127.0.0.1.
+            port (int, optional): Port to listen on, 0 for any free port. Defaults to 2222.
+            host_key (paramiko.PKey, optional): Host key of the server. Defaults to a new RSA key.
+        """
+        self.root = root
+        self.host_key = host_key if host_key is not None else paramiko.RSAKey.generate(2048)
+
+        self.listener = socket.create_server((host, port))
+        self.address = self.listener.getsockname()[:2]
+        self.transports = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def serve_forever(self):
+        """
+        Accepts the SSH connections until the stand-in is closed.
+        """
+        while True:
+            try:
+                client_socket, _ = self.listener.accept()
+            except OSError:
+                break
+
+            transport = paramiko.Transport(client_socket)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, StandInSftpServer, self.root)
+            transport.start_server(server=StandInServer())
+            with self.lock:
+                self.transports.append(transport)
+                self.connections += 1
+
+    def start(self):
+        """
+        Accepts the SSH connections in a background thread.
+        """
+        threading.Thread(target=self.serve_forever, name='sftp-stand-in', daemon=True).start()
+
+    def drop_connections(self):
+        """
+        Closes all open SSH connections, e.g. to test the reconnection of the uploader.
+        """
+        with self.lock:
+            transports, self.transports = self.transports, []
+        for transport in transports:
+            transport.close()
+
+    def close(self):
+        """
+        Stops accepting the connections and closes the open ones.
+        """
+        self.listener.close()
+        self.drop_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the SFTP server receiving the result files.')
+    parser.add_argument('--root', type=str, required=True, help='Specify the folder of the uploaded files.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Specify the address to listen on.')
+    parser.add_argument('--port', type=int, default=default_port, help='Specify the port to listen on.')
+    args = parser.parse_args()
+
+    stand_in = SftpStandIn(args.root, args.host, args.port)
+    print(f"SFTP stand-in listening on {stand_in.address[0]}:{stand_in.address[1]}, files are stored in "
+          f"{args.root}")
+    try:
+        stand_in.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in.close()
+        print(f"SFTP stand-in summary: {stand_in.connections} connections accepted.")
+
+
+if __name__ == '__main__':
+    main()